@@ -0,0 +1,80 @@
+import argparse
+import os
+import time
+import logging
+import pandas as pd
+from healthcare_etl_chunked_fixed import HealthcareETL
+from etl_bulk_load import BulkLoader
+
+# Configure logging
+logging.basicConfig(
+    filename='benchmark_bulk_load.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def transformed_chunks(csv_file, rows, chunksize):
+    """Transform the sample dataset once and repeat its chunks until `rows` rows are produced."""
+    etl = HealthcareETL(csv_file, db_name=':memory:', chunksize=chunksize)
+    etl.extract()
+    base = [etl.transform(chunk) for chunk in etl.chunk_iter]
+    chunks = []
+    produced = 0
+    while produced < rows:
+        for chunk in base:
+            chunk = chunk.iloc[:rows - produced].copy()
+            # Fresh ids so repeated chunks do not collide on the primary key
+            chunk['record_id'] = [f"{produced + i}" for i in range(len(chunk))]
+            chunks.append(chunk)
+            produced += len(chunk)
+            if produced >= rows:
+                break
+    return chunks
+
+
+def fresh_etl(db_name, **kwargs):
+    """Create an ETL with an empty healthcare table in db_name."""
+    if os.path.exists(db_name):
+        os.remove(db_name)
+    etl = HealthcareETL(None, db_name=db_name, **kwargs)
+    etl.create_table()
+    return etl
+
+
+def benchmark(csv_file='healthcare_dataset.csv', rows=1_000_000, chunksize=10000, commit_every=10,
+              db_name='benchmark_bulk_load.db'):
+    """Compare rows/second of the per-chunk to_sql path and the bulk loader."""
+    chunks = transformed_chunks(csv_file, rows, chunksize)
+    results = {}
+
+    etl = fresh_etl(db_name)
+    start = time.perf_counter()
+    for chunk in chunks:
+        etl.load(chunk)
+    results['to_sql'] = rows / (time.perf_counter() - start)
+
+    fresh_etl(db_name)
+    start = time.perf_counter()
+    with BulkLoader(db_name, commit_every=commit_every) as loader:
+        for chunk in chunks:
+            loader.load(chunk)
+    results['bulk'] = rows / (time.perf_counter() - start)
+    os.remove(db_name)
+
+    print(f"Rows: {rows}, chunksize: {chunksize}, commit every {commit_every} chunks")
+    print(f"to_sql per chunk: {results['to_sql']:,.0f} rows/second")
+    print(f"Bulk loader: {results['bulk']:,.0f} rows/second")
+    print(f"Speedup: {results['bulk'] / results['to_sql']:.1f}x")
+    logging.info(f"Bulk load benchmark on {rows} rows: {results}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bulk loader against DataFrame.to_sql.")
+    parser.add_argument('--csv', default='healthcare_dataset.csv')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunksize', type=int, default=10000)
+    parser.add_argument('--commit-every', type=int, default=10)
+    args = parser.parse_args()
+    benchmark(csv_file=args.csv, rows=args.rows, chunksize=args.chunksize, commit_every=args.commit_every)
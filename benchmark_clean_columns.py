@@ -0,0 +1,75 @@
+import argparse
+import re
+import time
+import logging
+import numpy as np
+import pandas as pd
+from healthcare_etl import HealthcareETL
+
+# Configure logging
+logging.basicConfig(
+    filename='benchmark_clean_columns.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def legacy_clean_specific_columns(chunk):
+    """Row-by-row column cleaning as it was implemented before the vectorized engine."""
+    chunk['gender'] = chunk['gender'].apply(lambda x: x.capitalize() if x.lower() in ['male', 'female'] else 'Unknown')
+    valid_blood_types = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+    chunk['blood_type'] = chunk['blood_type'].apply(lambda x: x if x in valid_blood_types else 'Unknown')
+    chunk['medical_condition'] = chunk['medical_condition'].str.title()
+    valid_test_results = ['Normal', 'Abnormal', 'Inconclusive']
+    chunk['test_results'] = chunk['test_results'].apply(lambda x: x if x in valid_test_results else 'Inconclusive')
+    chunk['name'] = chunk['name'].apply(lambda x: re.sub(r'^(Dr\.|Mrs\.|Mr\.|Ms\.|MD|DVM|DDS)\s+', '', x).strip())
+    return chunk
+
+
+def build_chunk(csv_file='healthcare_dataset.csv', rows=1_000_000, seed=42):
+    """Build a chunk of the given size from the sample dataset, with messy values mixed in."""
+    source = pd.read_csv(csv_file, dtype=str)
+    source.columns = [col.lower().replace(' ', '_') for col in source.columns]
+    rng = np.random.default_rng(seed)
+    chunk = source.iloc[rng.integers(0, len(source), rows)].reset_index(drop=True)
+    messy = rng.random(rows) < 0.1
+    chunk.loc[messy, 'gender'] = chunk.loc[messy, 'gender'].str.upper()
+    chunk.loc[messy, 'blood_type'] = chunk.loc[messy, 'blood_type'].str.lower()
+    chunk.loc[messy, 'test_results'] = 'Pending'
+    chunk.loc[messy, 'name'] = 'Dr. ' + chunk.loc[messy, 'name']
+    return chunk
+
+
+def benchmark(rows=1_000_000, repeat=3):
+    """Time legacy and vectorized cleaning on the same chunk and check the outputs match."""
+    chunk = build_chunk(rows=rows)
+    etl = HealthcareETL(None, db_name=':memory:')
+    timings = {}
+    results = {}
+    for label, clean in [('legacy', legacy_clean_specific_columns), ('vectorized', etl.clean_specific_columns)]:
+        best = float('inf')
+        for _ in range(repeat):
+            data = chunk.copy()
+            start = time.perf_counter()
+            results[label] = clean(data)
+            best = min(best, time.perf_counter() - start)
+        timings[label] = best
+    etl.close_connection()
+
+    pd.testing.assert_frame_equal(results['legacy'], results['vectorized'])
+    speedup = timings['legacy'] / timings['vectorized']
+    print(f"Rows: {rows}")
+    print(f"Legacy (row-wise apply): {timings['legacy']:.3f}s")
+    print(f"Vectorized (per distinct value): {timings['vectorized']:.3f}s")
+    print(f"Speedup: {speedup:.1f}x")
+    logging.info(f"clean_specific_columns benchmark on {rows} rows: legacy {timings['legacy']:.3f}s, "
+                 f"vectorized {timings['vectorized']:.3f}s, speedup {speedup:.1f}x")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean_specific_columns implementations.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    benchmark(rows=args.rows, repeat=args.repeat)
@@ -0,0 +1,91 @@
+import argparse
+import os
+import re
+import time
+import logging
+import tracemalloc
+from healthcare_etl_chunked_fixed import HealthcareETL
+
+# Configure logging
+logging.basicConfig(
+    filename='benchmark_compact_dtypes.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# The first field of every data line
+NAME_FIELD = re.compile(rb'^([^,\n]+)', re.MULTILINE)
+
+
+def scale_csv(csv_file, scaled_file, factor):
+    """Write the rows of csv_file `factor` times into scaled_file (one header).
+
+    Each copy's names get a copy number, so the copies are not dropped as duplicates.
+    Assumes the first column (Name) is never quoted.
+    """
+    with open(csv_file, 'rb') as f:
+        header = f.readline()
+        body = f.read()
+    if not body.endswith(b'\n'):
+        body += b'\n'
+    with open(scaled_file, 'wb') as out:
+        out.write(header)
+        for copy in range(factor):
+            out.write(NAME_FIELD.sub(rb'\1 ' + str(copy).encode(), body) if copy else body)
+
+
+def measure(csv_file, compact_dtypes, chunksize):
+    """Extract and transform csv_file, returning the rows and the in-memory bytes of the transformed chunks."""
+    etl = HealthcareETL(csv_file, db_name=':memory:', chunksize=chunksize, compact_dtypes=compact_dtypes)
+    etl.extract()
+    rows = 0
+    chunk_bytes = 0
+    for chunk in etl.chunk_iter:
+        chunk = etl.transform(chunk)
+        rows += len(chunk)
+        chunk_bytes += int(chunk.memory_usage(deep=True).sum())
+    return rows, chunk_bytes
+
+
+def measure_mode(csv_file, compact_dtypes, chunksize):
+    """Time one untraced pass, then take the peak traced memory of a second pass."""
+    start = time.perf_counter()
+    rows, chunk_bytes = measure(csv_file, compact_dtypes, chunksize)
+    seconds = time.perf_counter() - start
+    # tracemalloc slows allocation-heavy code several times over, so it is not timed
+    tracemalloc.start()
+    try:
+        measure(csv_file, compact_dtypes, chunksize)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'rows': rows, 'peak_bytes': peak, 'bytes_per_row': chunk_bytes / max(rows, 1), 'seconds': seconds}
+
+
+def benchmark(csv_file='healthcare_dataset.csv', factor=1000, chunksize=100_000,
+              scaled_file='benchmark_compact_dtypes.csv'):
+    """Compare peak memory of the default and compact dtypes on the dataset scaled `factor` times."""
+    scale_csv(csv_file, scaled_file, factor)
+    try:
+        results = {mode: measure_mode(scaled_file, mode == 'compact', chunksize) for mode in ('default', 'compact')}
+    finally:
+        os.remove(scaled_file)
+
+    default, compact = results['default'], results['compact']
+    print(f"Rows: {default['rows']}, chunksize: {chunksize}")
+    for mode, result in results.items():
+        print(f"{mode}: peak {result['peak_bytes'] / 2**20:.1f} MB, "
+              f"{result['bytes_per_row']:.0f} bytes/row transformed, {result['seconds']:.1f}s")
+    print(f"Peak memory: {compact['peak_bytes'] / default['peak_bytes']:.0%} of default; "
+          f"transformed chunk size: {compact['bytes_per_row'] / default['bytes_per_row']:.0%} of default")
+    logging.info(f"Compact dtypes benchmark at {factor}x: {results}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of compact dtypes against the default ones.")
+    parser.add_argument('--csv', default='healthcare_dataset.csv')
+    parser.add_argument('--factor', type=int, default=1000)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+    benchmark(csv_file=args.csv, factor=args.factor, chunksize=args.chunksize)
@@ -0,0 +1,112 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import time
+import logging
+from benchmark_bulk_load import transformed_chunks, fresh_etl
+from etl_bulk_load import BulkLoader
+from etl_storage import DimensionEncoder, keyed_aggregate_sql
+from setup_doctors_table import setup_doctors_table
+
+# Configure logging
+logging.basicConfig(
+    filename='benchmark_encoded_storage.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Queries in the style of the query_*.py scripts, run against each storage layout
+QUERIES = {
+    'group_by_condition': """
+        SELECT medical_condition, ROUND(AVG(billing_amount), 2) AS average_billing
+        FROM healthcare
+        GROUP BY medical_condition
+        ORDER BY average_billing DESC
+    """,
+    'inner_join_doctor': """
+        SELECT h.medical_condition, h.doctor, d.specialty, COUNT(*) AS patient_count
+        FROM healthcare h
+        INNER JOIN doctors d ON h.doctor = d.doctor_name
+        GROUP BY h.medical_condition, h.doctor, d.specialty
+        ORDER BY patient_count DESC
+    """,
+    'group_by_doctor_hospital': """
+        SELECT doctor, hospital, COUNT(*) AS patient_count
+        FROM healthcare
+        GROUP BY doctor, hospital
+    """,
+    'filter_insurance_admission': """
+        SELECT COUNT(*), AVG(billing_amount)
+        FROM healthcare
+        WHERE insurance_provider = 'Medicare' AND admission_type = 'Emergency'
+    """
+}
+
+# The aggregates grouping and filtering on the integer keys, as (sql, params)
+ENCODED_QUERIES = {
+    'group_by_doctor_hospital': keyed_aggregate_sql(['doctor', 'hospital'], {'patient_count': 'COUNT(*)'}),
+    'filter_insurance_admission': keyed_aggregate_sql(
+        [], {'patients': 'COUNT(*)', 'average_billing': 'AVG(billing_amount)'},
+        {'insurance_provider': 'Medicare', 'admission_type': 'Emergency'})
+}
+
+
+def build_database(db_name, chunks, storage):
+    """Load the chunks into a fresh database with the given storage layout."""
+    etl = fresh_etl(db_name, storage=storage)
+    encoder = DimensionEncoder() if storage == 'encoded' else None
+    with BulkLoader(db_name, table=etl.table_name, encoder=encoder) as loader:
+        for chunk in chunks:
+            loader.load(chunk)
+    setup_doctors_table(db_name=db_name)
+    with sqlite3.connect(db_name) as conn:
+        conn.execute("VACUUM")
+    return os.path.getsize(db_name)
+
+
+def time_query(db_name, query, repeat, params=()):
+    """Return the median wall time of a query over `repeat` runs."""
+    timings = []
+    with sqlite3.connect(db_name) as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(query, params).fetchall()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def benchmark(csv_file='healthcare_dataset.csv', rows=10_000_000, chunksize=100_000, repeat=3):
+    """Compare database size and query time of plain and dictionary-encoded storage."""
+    chunks = transformed_chunks(csv_file, rows, chunksize)
+    results = {}
+    for storage in ('table', 'encoded'):
+        db_name = f"benchmark_storage_{storage}.db"
+        size = build_database(db_name, chunks, storage)
+        timings = {name: time_query(db_name, query, repeat) for name, query in QUERIES.items()}
+        if storage == 'encoded':
+            timings.update({f"{name} (keys)": time_query(db_name, query, repeat, params)
+                            for name, (query, params) in ENCODED_QUERIES.items()})
+        results[storage] = {'size_bytes': size, 'query_seconds': timings}
+        os.remove(db_name)
+
+    print(f"Rows: {rows}")
+    plain, encoded = results['table'], results['encoded']
+    print(f"Database size: plain {plain['size_bytes'] / 2**20:.1f} MB, "
+          f"encoded {encoded['size_bytes'] / 2**20:.1f} MB "
+          f"({encoded['size_bytes'] / plain['size_bytes']:.0%} of plain)")
+    for name, seconds in encoded['query_seconds'].items():
+        baseline = plain['query_seconds'][name.replace(' (keys)', '')]
+        print(f"{name}: plain {baseline:.3f}s, encoded {seconds:.3f}s ({baseline / seconds:.2f}x)")
+    logging.info(f"Encoded storage benchmark on {rows} rows: {results}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dictionary-encoded storage against the plain table.")
+    parser.add_argument('--csv', default='healthcare_dataset.csv')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    benchmark(csv_file=args.csv, rows=args.rows, chunksize=args.chunksize, repeat=args.repeat)
@@ -0,0 +1,193 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from generate_healthcare_data import generate_csv
+
+# ETL implementations under test, by the name used in results and baselines
+ETL_CLASSES = {
+    'cleaning': ('healthcare_etl', 'HealthcareETL'),
+    'chunked': ('healthcare_etl_chunked_fixed', 'HealthcareETL')
+}
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+CHUNKSIZES = [10_000, 100_000]
+
+# Lower is better for these metrics, higher for rows_per_second
+COST_METRICS = ['peak_rss_bytes', 'db_bytes']
+
+
+def peak_rss_bytes():
+    """Return this process's peak resident set size in bytes, or None where it cannot be measured."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def database_bytes(db_name):
+    """Size of a SQLite database including any WAL file left next to it."""
+    return sum(os.path.getsize(path) for path in (db_name, f"{db_name}-wal") if os.path.exists(path))
+
+
+def run_etl(etl, csv_file, db_name, chunksize, options):
+    """Benchmark worker: run one ETL into a fresh database and return its measurements."""
+    module_name, class_name = ETL_CLASSES[etl]
+    etl_class = getattr(__import__(module_name), class_name)
+    if os.path.exists(db_name):
+        os.remove(db_name)
+    start = time.perf_counter()
+    instance = etl_class(csv_file, db_name=db_name, chunksize=chunksize, **options)
+    instance.run()
+    seconds = time.perf_counter() - start
+    report = instance.metrics.report()
+    result = {'seconds': seconds, 'rows_in': report['rows_in'], 'rows_out': report['rows_out'],
+              'rows_per_second': report['rows_in'] / seconds if seconds else 0.0,
+              'peak_rss_bytes': peak_rss_bytes(), 'db_bytes': database_bytes(db_name)}
+    os.remove(db_name)
+    return result
+
+
+def run_isolated(etl, csv_file, db_name, chunksize, options):
+    """Run one benchmark in a freshly spawned process so peak RSS covers that run only."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(run_etl, etl, csv_file, db_name, chunksize, options).result()
+
+
+def input_file(data_dir, rows, seed):
+    """Return a generated input CSV of `rows` rows, generating it once per (rows, seed)."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"healthcare_{rows}_seed{seed}.csv")
+    if not os.path.exists(path):
+        generate_csv(path, rows, seed=seed)
+    return path
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__, 'numpy': np.__version__}
+
+
+def run_suite(etls=tuple(ETL_CLASSES), sizes=SIZES, chunksizes=CHUNKSIZES, repeat=1, seed=0,
+              data_dir='benchmark_data', db_name='benchmark_etl.db', options=None):
+    """Run every ETL over every input size and chunksize; return the results document.
+
+    Each configuration runs `repeat` times in its own process; the median time is kept
+    and peak RSS / DB size are the largest seen. Chunk sizes above the input size are skipped.
+    """
+    options = options or {}
+    results = []
+    for rows in sizes:
+        csv_file = input_file(data_dir, rows, seed)
+        for chunksize in chunksizes:
+            if chunksize > rows and chunksize != min(chunksizes):
+                continue
+            for etl in etls:
+                runs = [run_isolated(etl, csv_file, db_name, chunksize, options) for _ in range(repeat)]
+                seconds = statistics.median(run['seconds'] for run in runs)
+                result = {'etl': etl, 'rows': rows, 'chunksize': chunksize, 'seconds': round(seconds, 6),
+                          'rows_out': runs[0]['rows_out'], 'rows_per_second': round(runs[0]['rows_in'] / seconds, 1),
+                          'peak_rss_bytes': max((run['peak_rss_bytes'] or 0) for run in runs) or None,
+                          'db_bytes': max(run['db_bytes'] for run in runs)}
+                results.append(result)
+                logging.info(f"ETL benchmark: {result}")
+                print(f"{etl:>8} rows={rows:>10,} chunksize={chunksize:>7,}: {result['rows_per_second']:>12,.0f} rows/s, "
+                      f"peak RSS {(result['peak_rss_bytes'] or 0) / 2**20:,.0f} MB, DB {result['db_bytes'] / 2**20:,.1f} MB")
+    return {'created_at': datetime.now().isoformat(timespec='seconds'), 'environment': environment(),
+            'options': options, 'seed': seed, 'repeat': repeat, 'results': results}
+
+
+def result_key(result):
+    return result['etl'], result['rows'], result['chunksize']
+
+
+def compare_results(current, baseline, tolerance=0.10):
+    """Return the regressions of `current` against `baseline` beyond `tolerance` (a fraction).
+
+    A regression is throughput below (1 - tolerance) x the baseline, or peak RSS or DB
+    size above (1 + tolerance) x the baseline, for the same ETL, row count and chunksize.
+    """
+    baseline_results = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        base = baseline_results.get(result_key(result))
+        if base is None:
+            continue
+        checks = [('rows_per_second', result['rows_per_second'] < base['rows_per_second'] * (1 - tolerance))]
+        checks += [(metric, result.get(metric) is not None and base.get(metric) is not None
+                    and result[metric] > base[metric] * (1 + tolerance)) for metric in COST_METRICS]
+        for metric, regressed in checks:
+            if regressed:
+                change = result[metric] / base[metric] - 1 if base[metric] else float('inf')
+                regressions.append({'etl': result['etl'], 'rows': result['rows'], 'chunksize': result['chunksize'],
+                                    'metric': metric, 'baseline': base[metric], 'current': result[metric],
+                                    'change': round(change, 4)})
+    return regressions
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(document, path):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    logging.info(f"Benchmark results written to {path}")
+
+
+if __name__ == "__main__":
+    # Configure logging only when run as a script; spawned benchmark workers and importers keep their own log
+    logging.basicConfig(
+        filename='benchmark_etl.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Benchmark the healthcare ETLs and compare against a baseline.")
+    parser.add_argument('--etl', nargs='+', choices=list(ETL_CLASSES), default=list(ETL_CLASSES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--chunksizes', nargs='+', type=int, default=CHUNKSIZES)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='benchmark_data', help="Where generated inputs are kept between runs")
+    parser.add_argument('--bulk-load', action='store_true')
+    parser.add_argument('--output', default='benchmark_etl_results.json')
+    parser.add_argument('--baseline', default='benchmark_etl_baseline.json')
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed fractional slowdown or growth")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    results = run_suite(etls=args.etl, sizes=args.sizes, chunksizes=args.chunksizes, repeat=args.repeat,
+                        seed=args.seed, data_dir=args.data_dir, options={'bulk_load': True} if args.bulk_load else {})
+    write_json(results, args.output)
+    if args.save_baseline:
+        write_json(results, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressions = compare_results(results, load_json(args.baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['etl']} rows={regression['rows']} chunksize={regression['chunksize']}: "
+                  f"{regression['metric']} {regression['baseline']} -> {regression['current']} ({regression['change']:+.1%})")
+        logging.info(f"ETL benchmark regressions against {args.baseline}: {regressions}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
@@ -0,0 +1,61 @@
+import argparse
+import os
+import time
+import logging
+import sqlite3
+from benchmark_bulk_load import fresh_etl, transformed_chunks
+from etl_bulk_load import BulkLoader
+from etl_indexes import HEALTHCARE_INDEXES, build_indexes
+
+# Configure logging
+logging.basicConfig(
+    filename='benchmark_indexes.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def benchmark(csv_file='healthcare_dataset.csv', rows=1_000_000, chunksize=10000, indexes=HEALTHCARE_INDEXES,
+              db_name='benchmark_indexes.db'):
+    """Compare loading with the indexes in place against loading first and indexing afterwards."""
+    chunks = transformed_chunks(csv_file, rows, chunksize)
+    results = {}
+
+    fresh_etl(db_name)
+    with sqlite3.connect(db_name) as conn:
+        build_indexes(conn, indexes)
+    conn.close()
+    start = time.perf_counter()
+    with BulkLoader(db_name) as loader:
+        for chunk in chunks:
+            loader.load(chunk)
+    results['maintained'] = time.perf_counter() - start
+
+    fresh_etl(db_name)
+    start = time.perf_counter()
+    with BulkLoader(db_name) as loader:
+        for chunk in chunks:
+            loader.load(chunk)
+    results['load'] = time.perf_counter() - start
+    with sqlite3.connect(db_name) as conn:
+        build_indexes(conn, indexes)
+    conn.close()
+    results['deferred'] = time.perf_counter() - start
+    os.remove(db_name)
+
+    print(f"Rows: {rows}, indexes: {[index.name for index in indexes]}")
+    print(f"Indexes maintained during load: {results['maintained']:.2f}s ({rows / results['maintained']:,.0f} rows/second)")
+    print(f"Load then build indexes: {results['deferred']:.2f}s ({rows / results['deferred']:,.0f} rows/second, "
+          f"of which {results['deferred'] - results['load']:.2f}s indexing)")
+    print(f"Speedup: {results['maintained'] / results['deferred']:.1f}x")
+    logging.info(f"Index build benchmark on {rows} rows: {results}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark deferred index builds against indexes maintained during the load.")
+    parser.add_argument('--csv', default='healthcare_dataset.csv')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunksize', type=int, default=10000)
+    args = parser.parse_args()
+    benchmark(csv_file=args.csv, rows=args.rows, chunksize=args.chunksize)
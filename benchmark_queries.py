@@ -0,0 +1,284 @@
+import argparse
+import contextlib
+import functools
+import importlib
+import io
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import time
+import logging
+from datetime import datetime
+import numpy as np
+from benchmark_etl import environment, input_file, peak_rss_bytes, write_json
+from healthcare_etl_chunked_fixed import HealthcareETL
+from setup_doctors_table import setup_doctors_table
+
+# Configure logging
+logging.basicConfig(
+    filename='benchmark_queries.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Query functions under test: name -> (module, function[, keyword arguments])
+QUERIES = {
+    'group_by': ('query_group_by', 'query_group_by'),
+    'having': ('query_having', 'query_having'),
+    'inner_join': ('query_inner_join', 'query_inner_join'),
+    'left_join': ('query_left_join', 'query_left_join'),
+    'right_join': ('query_right_join', 'query_right_join'),
+    'full_join': ('query_full_join', 'query_full_join'),
+    'self_join': ('query_self_join', 'query_self_join'),
+    'self_join_count': ('query_self_join', 'query_self_join', {'mode': 'count'}),
+    'self_join_sample': ('query_self_join', 'query_self_join', {'mode': 'stream', 'patients_per_condition': 1000}),
+    'union': ('query_union', 'query_union'),
+    'exists': ('query_exists', 'query_exists'),
+    'any_all': ('query_any_all', 'query_any_all'),
+    'case': ('query_case', 'query_case'),
+    'null_functions': ('query_null_functions', 'query_null_functions'),
+    'operators': ('query_operators', 'query_operators'),
+    'comments': ('query_comments', 'query_comments'),
+    'stored_procedure': ('query_stored_procedure', 'query_stored_procedure'),
+    'select_into': ('query_select_into', 'query_select_into'),
+    'insert_into_select': ('query_insert_into_select', 'query_insert_into_select')
+}
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+
+# Statements worth a query plan; DROP, PRAGMA and transaction control are skipped
+EXPLAINED_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'CREATE', 'DELETE', 'UPDATE')
+LEADING_COMMENTS = re.compile(r'^(\s*(--[^\n]*(\n|$)|/\*.*?\*/))*\s*', re.DOTALL)
+
+# Busiest generated doctors added to the doctors table so the join queries have matches
+JOINED_DOCTORS = 200
+SPECIALTIES = ['Cardiology', 'Neurology', 'Oncology', 'Pediatrics', 'General Practice']
+
+
+def build_database(rows, seed=0, data_dir='benchmark_data'):
+    """Return a healthcare database of `rows` generated rows plus the doctors table, building it once."""
+    db_name = os.path.join(data_dir, f"healthcare_{rows}_seed{seed}.db")
+    if os.path.exists(db_name):
+        return db_name
+    csv_file = input_file(data_dir, rows, seed)
+    building = f"{db_name}.building"
+    if os.path.exists(building):
+        os.remove(building)
+    start = time.perf_counter()
+    HealthcareETL(csv_file, db_name=building, chunksize=100_000, bulk_load=True).run()
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup_doctors_table(building)
+    with sqlite3.connect(building) as conn:
+        doctors = conn.execute("SELECT doctor, COUNT(*) FROM healthcare GROUP BY doctor "
+                               "ORDER BY COUNT(*) DESC, doctor LIMIT ?", (JOINED_DOCTORS,)).fetchall()
+        conn.executemany("INSERT OR IGNORE INTO doctors (doctor_name, specialty) VALUES (?, ?)",
+                         [(doctor, SPECIALTIES[i % len(SPECIALTIES)]) for i, (doctor, _) in enumerate(doctors)])
+    os.replace(building, db_name)
+    logging.info(f"Built benchmark database {db_name} with {rows} rows in {time.perf_counter() - start:.1f}s")
+    return db_name
+
+
+def query_function(name):
+    """Return the query function registered as `name`, with its keyword arguments bound."""
+    module_name, function_name, *options = QUERIES[name]
+    query = getattr(importlib.import_module(module_name), function_name)
+    return functools.partial(query, **options[0]) if options else query
+
+
+@contextlib.contextmanager
+def quiet_workdir():
+    """Run a query function in a temporary working directory with its printed output captured.
+
+    Query functions write their CSV to the working directory and print their results.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                yield output
+        finally:
+            os.chdir(cwd)
+
+
+def run_query(name, db_name, repeat, memory_limit, messages):
+    """Benchmark process: run one query function `repeat` times and report through `messages`.
+
+    Every SQL statement the function executes is sent as ('statement', sql) as soon as
+    it runs, so the plan can be captured even if the run is later stopped.
+    """
+    try:
+        if memory_limit:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        query = query_function(name)
+        seen = set()
+
+        def trace(sql):
+            if sql not in seen:
+                seen.add(sql)
+                messages.put(('statement', sql))
+
+        conn = sqlite3.connect(db_name)
+        conn.set_trace_callback(trace)
+        rss_before = peak_rss_bytes()
+        latencies = []
+        result_rows = None
+        try:
+            with quiet_workdir() as output:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    df = query(conn)
+                    latencies.append(time.perf_counter() - start)
+                    # Streaming modes return the number of rows they wrote
+                    result_rows = df if isinstance(df, int) else len(df)
+                    output.seek(0)
+                    output.truncate()
+        finally:
+            conn.close()
+        messages.put(('result', {'latencies': latencies, 'result_rows': result_rows,
+                                 'rss_before_bytes': rss_before, 'peak_rss_bytes': peak_rss_bytes()}))
+    except BaseException as e:
+        messages.put(('error', f"{type(e).__name__}: {e}"))
+
+
+def traced_statements(name, db_name):
+    """Return the statements a query function runs, traced against an empty copy of db_name's schema.
+
+    Against empty tables every query finishes at once, so this is cheap even when the
+    query itself would take minutes on the real data.
+    """
+    query = query_function(name)
+    statements = []
+    with sqlite3.connect(db_name) as source:
+        schema = source.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+                                "ORDER BY type = 'view', type = 'index'").fetchall()
+    with quiet_workdir():
+        conn = sqlite3.connect('schema.db')
+        try:
+            for (sql,) in schema:
+                conn.execute(sql)
+            conn.commit()
+            conn.set_trace_callback(lambda sql: sql in statements or statements.append(sql))
+            query(conn)
+        except Exception as e:
+            # Some queries refuse empty tables; the statements run until then are kept
+            logging.warning(f"Query {name} stopped on an empty schema: {e}")
+        finally:
+            conn.close()
+    return [sql for sql in statements
+            if LEADING_COMMENTS.sub('', sql, count=1).upper().startswith(EXPLAINED_STATEMENTS)]
+
+
+def query_plan(conn, sql):
+    """Return the EXPLAIN QUERY PLAN of a statement as indented lines, with full scans and temp B-trees."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return {'sql': sql.strip(), 'plan': lines,
+            'full_scans': [detail for *_, detail in rows if detail.startswith('SCAN') and 'INDEX' not in detail],
+            'temp_btrees': [detail for *_, detail in rows if 'TEMP B-TREE' in detail]}
+
+
+def explain_statements(db_name, statements):
+    """Capture the plan of every explainable statement a query ran."""
+    plans = []
+    with sqlite3.connect(db_name) as conn:
+        for sql in statements:
+            if not LEADING_COMMENTS.sub('', sql, count=1).upper().startswith(EXPLAINED_STATEMENTS):
+                continue
+            try:
+                plans.append(query_plan(conn, sql))
+            except sqlite3.Error as e:
+                # e.g. a SELECT on a table the query creates and drops itself
+                plans.append({'sql': sql.strip(), 'error': str(e)})
+    return plans
+
+
+def benchmark_query(name, db_name, repeat=5, timeout=300, memory_limit=None):
+    """Run one query function in its own process and return its latency, memory and plans."""
+    context = multiprocessing.get_context('spawn')
+    messages = context.Queue()
+    process = context.Process(target=run_query, args=(name, db_name, repeat, memory_limit, messages), daemon=True)
+    process.start()
+    deadline = time.monotonic() + timeout
+    statements = []
+    outcome = None
+    while outcome is None:
+        try:
+            kind, payload = messages.get(timeout=max(0.0, min(1.0, deadline - time.monotonic())))
+        except queue.Empty:
+            if time.monotonic() >= deadline:
+                outcome = ('timeout', f"No result within {timeout}s")
+            elif not process.is_alive():
+                outcome = ('error', f"Benchmark process exited with code {process.exitcode}")
+            continue
+        if kind == 'statement':
+            statements.append(payload)
+        else:
+            outcome = (kind, payload)
+    if process.is_alive():
+        process.terminate()
+    process.join()
+
+    kind, payload = outcome
+    result = {'query': name, 'status': 'ok' if kind == 'result' else kind}
+    if kind == 'result':
+        latencies = payload['latencies']
+        result.update({'runs': len(latencies), 'first_seconds': round(latencies[0], 6),
+                       'median_seconds': round(float(np.median(latencies)), 6),
+                       'p95_seconds': round(float(np.percentile(latencies, 95)), 6),
+                       'result_rows': payload['result_rows'], 'rss_before_bytes': payload['rss_before_bytes'],
+                       'peak_rss_bytes': payload['peak_rss_bytes']})
+    else:
+        result['error'] = payload
+    result['statements'] = explain_statements(db_name, statements)
+    return result
+
+
+def run_suite(queries=tuple(QUERIES), sizes=SIZES, repeat=5, timeout=300, memory_limit=None, seed=0,
+              data_dir='benchmark_data'):
+    """Benchmark every query function against databases of every size; return the results document."""
+    results = []
+    for rows in sizes:
+        db_name = build_database(rows, seed, data_dir)
+        for name in queries:
+            result = benchmark_query(name, db_name, repeat, timeout, memory_limit)
+            result['rows'] = rows
+            results.append(result)
+            logging.info(f"Query benchmark {name} at {rows} rows: "
+                         f"{ {key: value for key, value in result.items() if key != 'statements'} }")
+            flags = sorted({flag for statement in result['statements'] for flag in
+                            (['full scan'] if statement.get('full_scans') else []) +
+                            (['temp b-tree'] if statement.get('temp_btrees') else [])})
+            if result['status'] == 'ok':
+                print(f"{name:>20} rows={rows:>10,}: median {result['median_seconds'] * 1000:>10,.1f} ms, "
+                      f"p95 {result['p95_seconds'] * 1000:>10,.1f} ms, peak RSS {(result['peak_rss_bytes'] or 0) / 2**20:,.0f} MB"
+                      f"{'  [' + ', '.join(flags) + ']' if flags else ''}")
+            else:
+                print(f"{name:>20} rows={rows:>10,}: {result['status']} ({result['error']})")
+    return {'created_at': datetime.now().isoformat(timespec='seconds'), 'environment': environment(),
+            'seed': seed, 'repeat': repeat, 'timeout': timeout, 'results': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the query_*.py functions on generated databases.")
+    parser.add_argument('--queries', nargs='+', choices=list(QUERIES), default=list(QUERIES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds allowed per query and size")
+    parser.add_argument('--memory-limit', type=int, default=None, help="Address space limit per query process, in bytes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='benchmark_data', help="Where generated inputs and databases are kept")
+    parser.add_argument('--output', default='benchmark_queries_results.json')
+    args = parser.parse_args()
+    results = run_suite(queries=args.queries, sizes=args.sizes, repeat=args.repeat, timeout=args.timeout,
+                        memory_limit=args.memory_limit, seed=args.seed, data_dir=args.data_dir)
+    write_json(results, args.output)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(
+    filename='columnar_snapshot.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MANIFEST = 'manifest.json'
+
+# Null markers of the typed column files (float columns use NaN, date columns NaT)
+INTEGER_NULL = np.iinfo(np.int64).min
+CODE_NULL = -1
+
+# Values read to work out the kind of a column with no declared type, such as a view expression
+SAMPLE_ROWS = 1000
+
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?)?')
+
+
+def column_kind(declared_type):
+    """Map a declared SQLite column type to a snapshot column kind."""
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return 'integer'
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB', 'NUMERIC')):
+        return 'float'
+    if 'DATE' in declared_type or 'TIME' in declared_type:
+        return 'date'
+    return 'text'
+
+
+def sampled_kind(conn, table, column, sample_rows=SAMPLE_ROWS):
+    """Work out the kind of a column without a declared type from a sample of its values.
+
+    The day-number `healthcare` view, for one, builds its dates with datetime(...).
+    """
+    values = [row[0] for row in conn.execute(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT ?",
+                                             (sample_rows,))]
+    if not values:
+        return 'text'
+    if all(isinstance(value, int) for value in values):
+        return 'integer'
+    if all(isinstance(value, (int, float)) for value in values):
+        return 'float'
+    if all(isinstance(value, str) and ISO_DATE.fullmatch(value) for value in values):
+        return 'date'
+    return 'text'
+
+
+def source_stamp(db_name):
+    """Return the size and modification time of the database (and its WAL file)."""
+    stamp = {}
+    for path in (db_name, f"{db_name}-wal"):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stamp[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return stamp
+
+
+def read_manifest(snapshot_dir):
+    """Return the manifest of a snapshot directory, or None if there is no snapshot."""
+    path = os.path.join(snapshot_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class ColumnWriter:
+    """Append batches of one column to its binary file, dictionary-encoding text values."""
+
+    def __init__(self, name, kind, directory):
+        self.name = name
+        self.kind = kind
+        self.dtype = {'integer': 'int64', 'float': 'float64', 'date': 'datetime64[s]', 'text': 'int32'}[kind]
+        self.file_name = f"{name}.bin"
+        self.file = open(os.path.join(directory, self.file_name), 'wb')
+        self.codes = {}
+
+    def encode(self, values):
+        """Convert a list of SQLite values to this column's typed array."""
+        series = pd.Series(values, dtype=object)
+        if self.kind in ('integer', 'float'):
+            numbers = pd.to_numeric(series, errors='coerce')
+            invalid = numbers.isna() & series.notna()
+            if invalid.any():
+                logging.warning(f"Column {self.name}: {int(invalid.sum())} non-numeric values exported as null")
+            if self.kind == 'integer':
+                return numbers.astype('Int64').to_numpy('int64', na_value=INTEGER_NULL)
+            return numbers.to_numpy('float64', na_value=np.nan)
+        if self.kind == 'date':
+            return pd.to_datetime(series, errors='coerce').to_numpy('datetime64[s]')
+        # Text: factorize the batch, then map its distinct values to snapshot-wide codes
+        batch_codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        lookup = np.array([self.codes.setdefault(value, len(self.codes)) for value in uniques] + [CODE_NULL],
+                          dtype='int32')
+        return lookup[batch_codes]
+
+    def write(self, values):
+        self.file.write(self.encode(values).tobytes())
+
+    def close(self, directory):
+        """Close the column file and return its manifest entry."""
+        self.file.close()
+        entry = {'name': self.name, 'kind': self.kind, 'dtype': self.dtype, 'file': self.file_name}
+        if self.kind == 'text':
+            entry['values_file'] = f"{self.name}.values.json"
+            with open(os.path.join(directory, entry['values_file']), 'w') as f:
+                json.dump(list(self.codes), f)
+        return entry
+
+
+def export_snapshot(db_name='healthcare.db', snapshot_dir='healthcare_snapshot', table='healthcare',
+                    batch_size=100_000):
+    """Write a table (or view) as per-column binary files plus a manifest.
+
+    Each export goes into a new version directory and the manifest is swapped in
+    atomically. The version it replaces is kept until the next export, so a reader
+    that read the old manifest just before the swap can still map its files; older
+    versions are removed. A failed export removes its partial version directory.
+    """
+    version_dir, writers = None, []
+    try:
+        if not os.path.exists(db_name):
+            logging.error(f"Database file not found: {db_name}")
+            raise FileNotFoundError(f"Database file not found: {db_name}")
+        os.makedirs(snapshot_dir, exist_ok=True)
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        version_dir = os.path.join(snapshot_dir, version)
+        os.makedirs(version_dir)
+        stamp = source_stamp(db_name)
+        previous = read_manifest(snapshot_dir)
+        keep = {version, previous['version']} if previous else {version}
+
+        with sqlite3.connect(db_name) as conn:
+            schema = conn.execute(f"PRAGMA table_info({table})").fetchall()
+            if not schema:
+                raise ValueError(f"Table {table} not found in {db_name}")
+            writers += [ColumnWriter(row[1], column_kind(row[2]) if row[2] else sampled_kind(conn, table, row[1]),
+                                    version_dir)
+                       for row in schema]
+            cursor = conn.execute(f"SELECT {', '.join(w.name for w in writers)} FROM {table}")
+            rows = 0
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                for writer, values in zip(writers, zip(*batch)):
+                    writer.write(values)
+                rows += len(batch)
+
+        manifest = {
+            'table': table,
+            'source': os.path.realpath(db_name),
+            'source_stamp': stamp,
+            'version': version,
+            'rows': rows,
+            'created_at': datetime.now().isoformat(sep=' ', timespec='seconds'),
+            'columns': [writer.close(version_dir) for writer in writers]
+        }
+        manifest_tmp = os.path.join(snapshot_dir, f"{MANIFEST}.tmp")
+        with open(manifest_tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_tmp, os.path.join(snapshot_dir, MANIFEST))
+
+        for name in os.listdir(snapshot_dir):
+            path = os.path.join(snapshot_dir, name)
+            if name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        logging.info(f"Exported {rows} rows of {table} from {db_name} to {version_dir}")
+        return manifest
+    except sqlite3.Error as e:
+        logging.error(f"Database error during snapshot export: {e}")
+        discard_version(version_dir, writers)
+        raise
+    except Exception as e:
+        logging.error(f"Snapshot export failed: {e}")
+        discard_version(version_dir, writers)
+        raise
+
+
+def discard_version(version_dir, writers):
+    """Close the column files of a failed export and remove its partial version directory."""
+    for writer in writers:
+        writer.file.close()
+    if version_dir is not None:
+        shutil.rmtree(version_dir, ignore_errors=True)
+
+
+def refresh_snapshot(db_name='healthcare.db', snapshot_dir='healthcare_snapshot', table='healthcare',
+                     batch_size=100_000):
+    """Re-export the snapshot only if the database changed since it was written."""
+    manifest = read_manifest(snapshot_dir)
+    if (manifest is not None and manifest['table'] == table
+            and manifest['source'] == os.path.realpath(db_name)
+            and manifest['source_stamp'] == source_stamp(db_name)):
+        logging.info(f"Snapshot in {snapshot_dir} is up to date with {db_name}")
+        return manifest
+    return export_snapshot(db_name, snapshot_dir, table, batch_size)
+
+
+class ColumnarSnapshot:
+    """Read-only, memory-mapped view of an exported snapshot.
+
+    Column arrays are np.memmap objects over the snapshot files, all mapped when the
+    snapshot is opened so it stays readable after a later export removes its version;
+    the pages are shared through the OS page cache between processes.
+    """
+
+    def __init__(self, snapshot_dir='healthcare_snapshot'):
+        self.manifest = read_manifest(snapshot_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No snapshot manifest in {snapshot_dir}")
+        self.directory = os.path.join(snapshot_dir, self.manifest['version'])
+        self.rows = self.manifest['rows']
+        self.column_info = {entry['name']: entry for entry in self.manifest['columns']}
+        self.arrays = {name: self.map_column(entry) for name, entry in self.column_info.items()}
+        self.categories = {name: self.read_values(entry) for name, entry in self.column_info.items()
+                           if entry['kind'] == 'text'}
+
+    @property
+    def columns(self):
+        return list(self.column_info)
+
+    def map_column(self, entry):
+        """Memory-map one column file of the snapshot."""
+        if self.rows == 0:
+            return np.empty(0, dtype=entry['dtype'])
+        return np.memmap(os.path.join(self.directory, entry['file']), dtype=entry['dtype'], mode='r',
+                         shape=(self.rows,))
+
+    def read_values(self, entry):
+        """Read the value table of a text column."""
+        with open(os.path.join(self.directory, entry['values_file'])) as f:
+            return pd.Index(json.load(f), dtype=object)
+
+    def __getitem__(self, name):
+        """Return the raw typed array of a column (dictionary codes for text columns)."""
+        return self.arrays[name]
+
+    def values(self, name):
+        """Return the value table of a text column."""
+        return self.categories[name]
+
+    def column(self, name):
+        """Return a column as a pandas object: Categorical for text, nullable Int64 for integers."""
+        entry = self.column_info[name]
+        data = self[name]
+        if entry['kind'] == 'text':
+            return pd.Categorical.from_codes(data, categories=self.values(name))
+        if entry['kind'] == 'integer':
+            return pd.arrays.IntegerArray(np.asarray(data), np.asarray(data) == INTEGER_NULL)
+        return data
+
+    def to_frame(self, columns=None):
+        """Build a DataFrame of the chosen columns (this copies them into memory)."""
+        return pd.DataFrame({name: self.column(name) for name in (columns or self.columns)})
+
+
+def load_snapshot(snapshot_dir='healthcare_snapshot'):
+    """Open an exported snapshot for analytics."""
+    return ColumnarSnapshot(snapshot_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the healthcare table as a memory-mapped columnar snapshot.")
+    parser.add_argument('command', choices=['export', 'refresh'])
+    parser.add_argument('--db', default='healthcare.db')
+    parser.add_argument('--out', default='healthcare_snapshot')
+    parser.add_argument('--table', default='healthcare')
+    parser.add_argument('--batch-size', type=int, default=100_000)
+    args = parser.parse_args()
+    try:
+        command = export_snapshot if args.command == 'export' else refresh_snapshot
+        manifest = command(args.db, args.out, args.table, args.batch_size)
+        print(f"Snapshot of {manifest['rows']} rows in {args.out} (version {manifest['version']})")
+        logging.info("Script completed successfully.")
+    except Exception as e:
+        logging.error(f"Script failed: {e}")
+        print(f"Script failed: {e}")
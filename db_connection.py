@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# Per-connection tuning for analytic queries
+CONNECTION_PRAGMAS = {
+    'mmap_size': 268435456,  # 256 MB of the file read through the OS page cache
+    'cache_size': -65536,    # 64 MB page cache, negative values are KiB
+    'temp_store': 'MEMORY'
+}
+
+
+def open_connection(db_name, read_only=False, pragmas=None, check_same_thread=True, factory=sqlite3.Connection):
+    """Open a tuned SQLite connection; read-only connections cannot write by mistake."""
+    try:
+        if read_only:
+            conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_name))}?mode=ro", uri=True,
+                                   check_same_thread=check_same_thread, factory=factory)
+        else:
+            conn = sqlite3.connect(db_name, check_same_thread=check_same_thread, factory=factory)
+        for pragma, value in (CONNECTION_PRAGMAS if pragmas is None else pragmas).items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+    except sqlite3.Error as e:
+        logging.error(f"Failed to open database {db_name}: {e}")
+        raise
+
+
+class ConnectionPool:
+    """Reusable, tuned connections to one database, one per calling thread.
+
+    Each thread gets its own connection on first use and keeps it, so repeated
+    queries run against a warm page cache without reconnecting.
+    """
+
+    # sqlite3.Connection subclass the pool's connections are made from
+    connection_factory = sqlite3.Connection
+
+    def __init__(self, db_name, read_only=True, pragmas=None):
+        if not os.path.exists(db_name):
+            logging.error(f"Database file not found: {db_name}")
+            raise FileNotFoundError(f"Database file not found: {db_name}")
+        self.db_name = db_name
+        self.read_only = read_only
+        self.pragmas = pragmas
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # The thread that closes the pool may not be the one that opened the connection
+            conn = open_connection(self.db_name, self.read_only, self.pragmas, check_same_thread=False,
+                                   factory=self.connection_factory)
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+            logging.info(f"Opened pooled connection to {self.db_name} (read_only={self.read_only})")
+        return conn
+
+    def close(self):
+        """Close every connection opened by the pool."""
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+@contextmanager
+def db_connection(db, read_only=False, must_exist=True):
+    """Yield a connection for a database path, an open sqlite3 connection or a ConnectionPool.
+
+    A path gets a new tuned connection that commits on success, rolls back on error
+    and is closed afterwards, like `with sqlite3.connect(...)`. Connections and pools
+    are borrowed as they are: their transactions are left to the caller.
+    """
+    if isinstance(db, ConnectionPool):
+        conn, owned = db.connection(), False
+    elif isinstance(db, sqlite3.Connection):
+        conn, owned = db, False
+    else:
+        if must_exist and not os.path.exists(db):
+            logging.error(f"Database file not found: {db}")
+            raise FileNotFoundError(f"Database file not found: {db}")
+        conn, owned = open_connection(db, read_only), True
+    if not owned:
+        yield conn
+        return
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
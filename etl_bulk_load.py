@@ -0,0 +1,169 @@
+import sqlite3
+import logging
+import time
+import pandas as pd
+
+# PRAGMAs applied while bulk loading; the previous values are restored on close
+LOAD_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',
+    'cache_size': -262144  # 256 MB, negative values are KiB
+}
+
+
+def column_values(series):
+    """Convert a DataFrame column to a list of Python values sqlite3 can bind directly."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Same text format DataFrame.to_sql writes; formatted once per distinct date
+        codes, dates = pd.factorize(series)
+        text = pd.Index(dates.strftime('%Y-%m-%d %H:%M:%S').tolist() + [None], dtype=object)
+        return text.take(codes).tolist()
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and series.hasnans:
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def upsert_sql(table, columns, on_conflict='update', key='record_id', source=None):
+    """Build an INSERT that updates (or ignores) rows whose record_id already exists.
+
+    Rows are bound as parameters, or come from a `source` SELECT returning `columns` in order.
+    """
+    if source is None:
+        rows = f"VALUES ({', '.join('?' * len(columns))})"
+    else:
+        # The WHERE clause keeps SQLite from reading ON CONFLICT as a join constraint
+        rows = f"SELECT * FROM ({source}) WHERE true"
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) {rows} ON CONFLICT({key}) DO "
+    updates = [f"{col} = excluded.{col}" for col in columns if col != key]
+    if on_conflict == 'update' and updates:
+        return sql + "UPDATE SET " + ', '.join(updates)
+    if on_conflict in ('update', 'ignore'):
+        return sql + "NOTHING"
+    raise ValueError(f"Unsupported on_conflict value: {on_conflict}")
+
+
+def upsert_method(on_conflict='update'):
+    """Return a DataFrame.to_sql insertion method that upserts on record_id."""
+    def insert(pd_table, conn, keys, data_iter):
+        conn.executemany(upsert_sql(pd_table.name, keys, on_conflict), list(data_iter))
+        return conn.rowcount
+    return insert
+
+
+def chunk_rows(chunk):
+    """Build insert rows for a chunk straight from its column arrays."""
+    return zip(*(column_values(chunk[col]) for col in chunk.columns))
+
+
+class BulkLoader:
+    """Load transformed chunks through one long-lived connection with prepared executemany inserts."""
+
+    def __init__(self, db_name, table='healthcare', commit_every=10, pragmas=None, on_conflict='update',
+                 encoder=None):
+        """Initialize the loader; a transaction is committed every `commit_every` chunks.
+
+        Rows whose record_id already exists are updated, or skipped with on_conflict='ignore'.
+        An `encoder` (DimensionEncoder) turns dimension columns into keys before insert.
+        """
+        self.db_name = db_name
+        self.table = table
+        self.encoder = encoder
+        self.commit_every = commit_every
+        self.on_conflict = on_conflict
+        self.pragmas = dict(LOAD_PRAGMAS if pragmas is None else pragmas)
+        self.conn = None
+        self.saved_pragmas = {}
+        self.table_columns = None
+        self.insert_sql = {}
+        self.pending_chunks = 0
+        self.rows_loaded = 0
+        self.load_seconds = 0.0
+
+    def open(self):
+        """Open the connection, apply load-time PRAGMAs and validate the table schema once."""
+        try:
+            self.conn = sqlite3.connect(self.db_name)
+            for pragma, value in self.pragmas.items():
+                self.saved_pragmas[pragma] = self.conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+                self.conn.execute(f"PRAGMA {pragma} = {value}")
+            self.validate_schema()
+            logging.info(f"Bulk loader opened on {self.db_name} with PRAGMAs {self.pragmas}")
+        except sqlite3.Error as e:
+            logging.error(f"Bulk loader failed to open {self.db_name}: {e}")
+            raise
+
+    def validate_schema(self):
+        """Check the target table exists and billing_amount is declared FLOAT."""
+        schema = self.conn.execute(f"PRAGMA table_info({self.table})").fetchall()
+        if not schema:
+            raise ValueError(f"Table not found: {self.table}")
+        self.table_columns = {row[1]: row[2] for row in schema}
+        billing_type = self.table_columns.get('billing_amount')
+        if billing_type != 'FLOAT':
+            logging.error(f"Incorrect billing_amount type: {billing_type}")
+            raise ValueError(f"Incorrect billing_amount type: {billing_type}")
+
+    def get_insert_sql(self, columns):
+        """Return the prepared INSERT statement for a column layout, building it once."""
+        columns = tuple(columns)
+        if columns not in self.insert_sql:
+            unknown = [col for col in columns if col not in self.table_columns]
+            if unknown:
+                raise ValueError(f"Columns not in {self.table} table: {unknown}")
+            self.insert_sql[columns] = upsert_sql(self.table, columns, self.on_conflict)
+        return self.insert_sql[columns]
+
+    def load(self, chunk, checkpoint=None, checkpoints=None):
+        """Insert a chunk; the open transaction is committed every `commit_every` chunks.
+
+        A checkpoint is recorded through `checkpoints` in the same transaction as its rows.
+        """
+        start = time.perf_counter()
+        try:
+            if not chunk.empty:
+                if self.encoder is not None:
+                    chunk = self.encoder.encode(self.conn, chunk)
+                self.conn.executemany(self.get_insert_sql(chunk.columns), chunk_rows(chunk))
+            if checkpoint is not None:
+                checkpoints.record(self.conn, checkpoint)
+            self.pending_chunks += 1
+            if self.pending_chunks >= self.commit_every:
+                self.conn.commit()
+                self.pending_chunks = 0
+        except sqlite3.Error as e:
+            logging.error(f"Bulk load failed: {e}")
+            raise
+        self.rows_loaded += len(chunk)
+        self.load_seconds += time.perf_counter() - start
+        logging.info(f"Bulk loaded {len(chunk)} records into {self.table}")
+
+    def rows_per_second(self):
+        """Return the insert throughput measured so far."""
+        return self.rows_loaded / self.load_seconds if self.load_seconds else 0.0
+
+    def close(self, commit=True):
+        """Commit (or roll back) the open transaction, restore PRAGMAs and close the connection."""
+        if self.conn is None:
+            return
+        try:
+            if commit:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+                if self.encoder is not None:
+                    # Ids of dimension rows added since the last commit are gone with them
+                    self.encoder.reset()
+            for pragma, value in self.saved_pragmas.items():
+                self.conn.execute(f"PRAGMA {pragma} = {value}")
+            logging.info(f"Bulk loader closed: {self.rows_loaded} records at {self.rows_per_second():.0f} rows/second")
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+        return False
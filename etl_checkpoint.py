@@ -0,0 +1,166 @@
+import io
+import os
+import zlib
+import logging
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from etl_chunk_sizing import next_chunksize
+from etl_compression import BLOCK_SIZE, detect_compression, open_source, read_range, skip_bytes
+from etl_extract_backends import EXTRACT_BACKENDS
+
+# One committed chunk: byte range in the source file, cumulative row number and checksum
+ChunkCheckpoint = namedtuple('ChunkCheckpoint', 'chunk_index start_offset end_offset row_number checksum')
+
+
+def chunk_checksum(data):
+    """Return the CRC32 of a chunk's raw bytes as 8 hex digits."""
+    return f"{zlib.crc32(data):08x}"
+
+
+class CheckpointStore:
+    """Track which byte ranges of a source CSV have been committed to the database."""
+
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self.file_path = os.path.realpath(csv_file)
+
+    def ensure_table(self, conn):
+        """Create the etl_checkpoints table if needed."""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS etl_checkpoints (
+                file_path TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                start_offset INTEGER NOT NULL,
+                end_offset INTEGER NOT NULL,
+                row_number INTEGER NOT NULL,
+                checksum TEXT NOT NULL,
+                committed_at DATETIME,
+                PRIMARY KEY (file_path, chunk_index)
+            )
+        ''')
+        conn.commit()
+
+    def last_checkpoint(self, conn):
+        """Return the last committed chunk for this file, or None."""
+        row = conn.execute('''
+            SELECT chunk_index, start_offset, end_offset, row_number, checksum
+            FROM etl_checkpoints
+            WHERE file_path = ?
+            ORDER BY chunk_index DESC
+            LIMIT 1
+        ''', (self.file_path,)).fetchone()
+        return ChunkCheckpoint(*row) if row else None
+
+    def resume_point(self, conn):
+        """Return the checkpoint to resume after, or None to start from the beginning.
+
+        The bytes of the last committed chunk are re-read and compared with the stored
+        checksum; if the file was rewritten rather than appended to, its checkpoints are
+        discarded and the file is read from the start. Offsets of compressed files are
+        positions in the decompressed data.
+        """
+        last = self.last_checkpoint(conn)
+        if last is None:
+            return None
+        data = read_range(self.csv_file, last.start_offset, last.end_offset)
+        valid = len(data) == last.end_offset - last.start_offset and chunk_checksum(data) == last.checksum
+        if not valid:
+            logging.warning(f"{self.csv_file} no longer matches its checkpoints; reading it from the start")
+            conn.execute("DELETE FROM etl_checkpoints WHERE file_path = ?", (self.file_path,))
+            conn.commit()
+            return None
+        logging.info(f"Resuming {self.csv_file} after chunk {last.chunk_index} "
+                     f"(byte {last.end_offset}, row {last.row_number})")
+        return last
+
+    def record(self, conn, checkpoint):
+        """Record a chunk as committed; call inside the transaction that loads the chunk."""
+        conn.execute('''
+            INSERT OR REPLACE INTO etl_checkpoints
+            (file_path, chunk_index, start_offset, end_offset, row_number, checksum, committed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (self.file_path, *checkpoint, datetime.now().isoformat(sep=' ', timespec='seconds')))
+
+
+def complete_line_ends(block, in_quotes=0):
+    """Return the offsets just past each newline of `block` that ends a CSV record, and the quote state after it.
+
+    A newline inside a quoted field (an odd number of quotes before it) does not end a record.
+    """
+    data = np.frombuffer(block, dtype=np.uint8)
+    quoted = np.bitwise_xor.accumulate((data == ord('"')).view(np.uint8)) ^ in_quotes
+    ends = np.flatnonzero((data == ord('\n')) & (quoted == 0)) + 1
+    return ends, int(quoted[-1]) if len(quoted) else in_quotes
+
+
+def parse_csv_bytes(header, data, rows, backend, read_csv_options):
+    """Parse the records in `data` (below `header`) into one DataFrame with the named extract backend."""
+    stream = io.BufferedReader(io.BytesIO(header + data))
+    chunks = list(EXTRACT_BACKENDS[backend]().read(stream, max(rows, 1), read_csv_options))
+    chunk = chunks[0] if len(chunks) == 1 else pd.concat(chunks)
+    chunk.index = pd.RangeIndex(len(chunk))
+    return chunk
+
+
+def read_csv_resumable(csv_file, chunksize, resume_after=None, progress=None, complete=False, backend='pandas',
+                       **read_csv_options):
+    """Yield (chunk, ChunkCheckpoint) pairs, starting after the `resume_after` checkpoint.
+
+    The file is read in blocks and split on record boundaries (a newline inside quotes
+    continues the record), so each chunk maps to an exact byte range that later runs
+    can seek past; each range is then parsed by the named extract `backend`.
+    A last line without its newline, or with a quote still open, may be a row another
+    process is still appending: it is left for a later run unless the caller says the
+    file is `complete`. Compressed files are always complete.
+    `chunksize` may be a callable asked for the row count of each next chunk.
+    Compressed files are decompressed on the fly and their byte ranges are positions in
+    the decompressed data; resuming one decompresses (without parsing) up to the
+    checkpoint. The optional `progress` (ReadProgress) counts the bytes read.
+    """
+    compression = detect_compression(csv_file)
+    with open_source(csv_file, progress, compression) as f:
+        header = f.readline()
+        chunk_index, row_number = 0, 0
+        start_offset = len(header)
+        if resume_after is not None:
+            skip_bytes(f, resume_after.end_offset, start_offset)
+            chunk_index, row_number = resume_after.chunk_index + 1, resume_after.row_number
+            start_offset = resume_after.end_offset
+        first_offset = start_offset
+        buffer = bytearray()
+        ends = np.empty(0, dtype=np.int64)
+        in_quotes = 0
+        exhausted = False
+        while True:
+            size = next_chunksize(chunksize)
+            while len(ends) < size and not exhausted:
+                block = f.read(BLOCK_SIZE)
+                if not block:
+                    exhausted = True
+                    break
+                block_ends, in_quotes = complete_line_ends(block, in_quotes)
+                ends = np.concatenate([ends, block_ends + len(buffer)])
+                buffer += block
+            lines = min(len(ends), size)
+            cut = int(ends[lines - 1]) if lines else 0
+            if exhausted and lines < size and cut < len(buffer):
+                if complete or compression is not None:
+                    lines, cut = lines + 1, len(buffer)
+                else:
+                    logging.warning(f"Leaving the unfinished last line of {csv_file} ({len(buffer) - cut} bytes) "
+                                    f"for a later run")
+            if not lines:
+                return
+            data = bytes(buffer[:cut])
+            del buffer[:cut]
+            ends = ends[lines:] - cut
+            end_offset = start_offset + len(data)
+            row_number += lines
+            chunk = parse_csv_bytes(header, data, lines, backend, read_csv_options)
+            if progress is not None and compression is None:
+                progress.compressed_bytes = progress.uncompressed_bytes = end_offset - first_offset
+            yield chunk, ChunkCheckpoint(chunk_index, start_offset, end_offset, row_number, chunk_checksum(data))
+            chunk_index += 1
+            start_offset = end_offset
@@ -0,0 +1,128 @@
+import logging
+import tracemalloc
+
+# Share of the memory budget a chunk is sized to use; the rest is headroom for estimate error
+BUDGET_HEADROOM = 0.8
+
+# Without tracemalloc (pipelined runs transform in other processes), a raw chunk's
+# in-memory size is multiplied by this to estimate its peak while transformed and loaded
+PIPELINED_MEMORY_FACTOR = 4.0
+
+
+def next_chunksize(chunksize):
+    """Return the rows to read next; `chunksize` is a fixed number or a callable returning one."""
+    return chunksize() if callable(chunksize) else chunksize
+
+
+def parse_memory_budget(budget):
+    """Accept a number of bytes or a string like '512MB' / '2GB'."""
+    if isinstance(budget, str):
+        units = {'KB': 2**10, 'MB': 2**20, 'GB': 2**30, 'B': 1}
+        text = budget.strip().upper()
+        for unit, factor in units.items():
+            if text.endswith(unit):
+                return int(float(text[:-len(unit)]) * factor)
+        return int(float(text))
+    return int(budget)
+
+
+class AdaptiveChunkSizer:
+    """Pick each chunk's row count so its measured peak memory stays under a budget.
+
+    The peak memory of processing a chunk (read, transform and load) is measured with
+    tracemalloc for the first `calibration_chunks` chunks and every `trace_every`-th
+    one after that; tracing roughly doubles processing time, so other chunks are
+    estimated from their memory_usage(deep=True) and the last measured peak/size ratio.
+    From the bytes per row seen so far, the next chunk gets as many rows as fit in the
+    budget. Chunks grow at most `growth` times per step, and shrink immediately when a
+    chunk costs more per row. Pass `next_rows` as the chunksize of a reader.
+    """
+
+    def __init__(self, memory_budget, initial_rows=10000, min_rows=100, max_rows=5_000_000, growth=2.0,
+                 calibration_chunks=3, trace_every=10):
+        self.memory_budget = parse_memory_budget(memory_budget)
+        self.rows = initial_rows
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.growth = growth
+        self.calibration_chunks = calibration_chunks
+        self.trace_every = trace_every
+        self.bytes_per_row = None
+        self.peak_ratio = PIPELINED_MEMORY_FACTOR
+        self.history = []
+        self.tracing_enabled = True
+        self.started_tracing = False
+        self.traced = False
+        self.baseline = 0
+
+    def start(self):
+        """Begin measuring the first chunk."""
+        self.prepare_next_chunk()
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def prepare_next_chunk(self):
+        """Start or stop tracemalloc depending on whether the next chunk is measured."""
+        chunk_number = len(self.history)
+        trace = self.tracing_enabled and (chunk_number < self.calibration_chunks
+                                          or chunk_number % self.trace_every == 0)
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        elif not trace:
+            self.stop()
+        self.traced = tracemalloc.is_tracing()
+        if self.traced:
+            tracemalloc.reset_peak()
+            self.baseline = tracemalloc.get_traced_memory()[0]
+
+    def next_rows(self):
+        return self.rows
+
+    def observe(self, rows, chunk=None, peak_bytes=None):
+        """Record one processed chunk and size the next one.
+
+        Without `peak_bytes`, the chunk's peak is measured (or estimated) as described above.
+        """
+        if rows == 0:
+            return
+        deep_bytes = int(chunk.memory_usage(deep=True).sum()) if chunk is not None else 0
+        if peak_bytes is None:
+            if self.traced:
+                peak_bytes = max(tracemalloc.get_traced_memory()[1] - self.baseline, deep_bytes)
+                if deep_bytes:
+                    self.peak_ratio = peak_bytes / deep_bytes
+            else:
+                peak_bytes = deep_bytes * self.peak_ratio
+        observed = peak_bytes / rows
+        # Trust a larger per-row cost at once, a smaller one only gradually
+        if self.bytes_per_row is None or observed > self.bytes_per_row:
+            self.bytes_per_row = observed
+        else:
+            self.bytes_per_row = (self.bytes_per_row + observed) / 2
+        self.history.append({'rows': rows, 'peak_bytes': int(peak_bytes), 'traced': self.traced})
+
+        target = int(self.memory_budget * BUDGET_HEADROOM / max(self.bytes_per_row, 1))
+        self.rows = max(self.min_rows, min(target, int(rows * self.growth), self.max_rows))
+        logging.info(f"Chunk of {rows} rows peaked at {peak_bytes / 2**20:.1f} MB "
+                     f"({observed:.0f} B/row{'' if self.traced else ', estimated'}); next chunk {self.rows} rows")
+        self.prepare_next_chunk()
+
+    def observe_chunks(self, chunks):
+        """Observe raw chunks as they are read, estimating their peak (for pipelined runs)."""
+        self.tracing_enabled = False
+        for item in chunks:
+            chunk = item[0] if isinstance(item, tuple) else item
+            deep_bytes = int(chunk.memory_usage(deep=True).sum())
+            self.observe(len(chunk), peak_bytes=deep_bytes * PIPELINED_MEMORY_FACTOR)
+            yield item
+
+    def report(self):
+        return {
+            'memory_budget': self.memory_budget,
+            'chunk_sizes': [entry['rows'] for entry in self.history],
+            'chunk_peak_bytes': [entry['peak_bytes'] for entry in self.history]
+        }
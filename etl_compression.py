@@ -0,0 +1,151 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+import logging
+
+# Compression formats by file extension, and by leading bytes for files without one
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+COMPRESSION_MAGIC = {'gzip': b'\x1f\x8b', 'bz2': b'BZh', 'xz': b'\xfd7zXZ\x00'}
+
+# Decompressed block size, and how many blocks the decompression thread may run ahead
+BLOCK_SIZE = 1 << 20
+PREFETCH_BLOCKS = 8
+
+
+def detect_compression(path):
+    """Return 'gzip', 'bz2' or 'xz' for a compressed file, or None for plain text."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in COMPRESSION_EXTENSIONS:
+        return COMPRESSION_EXTENSIONS[extension]
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+class ReadProgress:
+    """Bytes of one source read so far, as stored on disk and after decompression."""
+
+    def __init__(self, compression=None):
+        self.compression = compression
+        self.compressed_bytes = 0
+        self.uncompressed_bytes = 0
+
+    def to_dict(self):
+        return {'compression': self.compression, 'compressed_bytes': self.compressed_bytes,
+                'uncompressed_bytes': self.uncompressed_bytes}
+
+
+class DecompressingReader(io.RawIOBase):
+    """Read-only stream of a compressed file, decompressed ahead of the reader by a thread.
+
+    The thread decompresses `block_size` blocks into a queue at most `prefetch_blocks`
+    deep; zlib, bz2 and lzma release the GIL while they work, so decompression overlaps
+    the parsing done by the thread reading this stream. `progress` is updated with the
+    compressed bytes consumed and the uncompressed bytes handed out.
+    """
+
+    def __init__(self, path, compression, progress=None, block_size=BLOCK_SIZE, prefetch_blocks=PREFETCH_BLOCKS):
+        super().__init__()
+        self.path = path
+        self.progress = progress if progress is not None else ReadProgress()
+        self.progress.compression = compression
+        self.block_size = block_size
+        self.file = open(path, 'rb')
+        self.stream = gzip.GzipFile(fileobj=self.file) if compression == 'gzip' else \
+            bz2.BZ2File(self.file) if compression == 'bz2' else lzma.LZMAFile(self.file)
+        self.blocks = queue.Queue(maxsize=prefetch_blocks)
+        self.stop_event = threading.Event()
+        self.block = b''
+        self.position = 0
+        self.finished = False
+        self.thread = threading.Thread(target=self.decompress, daemon=True)
+        self.thread.start()
+
+    def decompress(self):
+        """Decompression thread: queue (block, compressed offset) pairs, then b'' at the end."""
+        try:
+            while True:
+                block = self.stream.read(self.block_size)
+                if not self.put((block, self.file.tell())) or not block:
+                    return
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.position == len(self.block):
+            if self.finished:
+                return 0
+            item = self.blocks.get()
+            if isinstance(item, Exception):
+                logging.error(f"Decompressing {self.path} failed: {item}")
+                raise item
+            self.block, self.progress.compressed_bytes = item
+            self.position = 0
+            if not self.block:
+                self.finished = True
+                return 0
+        size = min(len(buffer), len(self.block) - self.position)
+        buffer[:size] = self.block[self.position:self.position + size]
+        self.position += size
+        self.progress.uncompressed_bytes += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stop_event.set()
+            self.thread.join()
+            self.stream.close()
+            self.file.close()
+        super().close()
+
+
+def open_source(path, progress=None, compression='infer'):
+    """Open a CSV source for binary reading, decompressing it on the fly if it is compressed.
+
+    Plain files are opened directly (seekable); `progress` is only updated for compressed ones.
+    """
+    if compression == 'infer':
+        compression = detect_compression(path)
+    if compression is None:
+        return open(path, 'rb')
+    logging.info(f"Streaming {compression}-compressed source {path}")
+    return io.BufferedReader(DecompressingReader(path, compression, progress), buffer_size=BLOCK_SIZE)
+
+
+def skip_bytes(stream, offset, position=0):
+    """Move a stream opened by open_source from `position` to `offset`, reading forward if it cannot seek."""
+    if stream.seekable():
+        stream.seek(offset)
+        return
+    remaining = offset - position
+    while remaining > 0:
+        skipped = len(stream.read(min(remaining, BLOCK_SIZE)))
+        if not skipped:
+            return
+        remaining -= skipped
+
+
+def read_range(path, start, end):
+    """Return the bytes [start, end) of a source, decompressed if it is compressed."""
+    with open_source(path) as f:
+        skip_bytes(f, start)
+        return f.read(end - start)
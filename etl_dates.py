@@ -0,0 +1,70 @@
+import logging
+import pandas as pd
+
+# Source date columns (raw CSV names) and their database names
+DATE_COLUMNS = ['Date of Admission', 'Discharge Date']
+DB_DATE_COLUMNS = ['date_of_admission', 'discharge_date']
+
+EPOCH = pd.Timestamp('1970-01-01')
+
+# With day-number storage, length of stay is plain integer arithmetic on the fact table
+LENGTH_OF_STAY_SQL = "discharge_date - date_of_admission"
+
+
+class DateParser:
+    """Parse date strings once per distinct value, reusing the results across chunks.
+
+    Real exports hold a few thousand distinct dates across millions of rows, so the
+    cache stays small; it is cleared if it ever grows past `max_cache` entries.
+    """
+
+    def __init__(self, columns=DATE_COLUMNS, format=None, dayfirst=False, max_cache=1_000_000):
+        self.columns = list(columns)
+        self.format = format
+        self.dayfirst = dayfirst
+        self.max_cache = max_cache
+        self.cache = pd.Series(dtype='datetime64[ns]')
+
+    def parse(self, values):
+        """Return a datetime64 Series; strings that are not valid dates become NaT."""
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+        distinct = pd.Index(values.dropna().unique())
+        new_values = distinct[~distinct.isin(self.cache.index)]
+        if len(new_values):
+            if len(self.cache) + len(new_values) > self.max_cache:
+                self.cache = pd.Series(dtype='datetime64[ns]')
+            parsed = pd.to_datetime(pd.Series(new_values, dtype=object), format=self.format,
+                                    dayfirst=self.dayfirst, errors='coerce')
+            self.cache = pd.concat([self.cache, pd.Series(parsed.to_numpy(), index=new_values)])
+        return values.map(self.cache).astype('datetime64[ns]')
+
+    def parse_chunk(self, chunk):
+        for col in self.columns:
+            if col in chunk.columns:
+                chunk[col] = self.parse(chunk[col])
+        return chunk
+
+
+def to_day_numbers(dates):
+    """Convert a datetime Series to Int32 days since 1970-01-01 (NaT becomes NA)."""
+    return ((dates - EPOCH) // pd.Timedelta(days=1)).astype('Int32')
+
+
+def day_number(date):
+    """Return the day number of a single date (anything pd.Timestamp accepts)."""
+    return (pd.Timestamp(date) - EPOCH).days
+
+
+def year_day_range(year):
+    """Return the [first, last] day numbers of a year, for integer range filters."""
+    return day_number(f"{year}-01-01"), day_number(f"{year}-12-31")
+
+
+def store_dates_as_day_numbers(chunk, columns=DB_DATE_COLUMNS):
+    """Replace the chunk's date columns with day numbers before loading."""
+    for col in columns:
+        if col in chunk.columns:
+            chunk[col] = to_day_numbers(chunk[col])
+    logging.info(f"Converted {', '.join(columns)} to day numbers")
+    return chunk
@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import tempfile
+import logging
+import numpy as np
+import pandas as pd
+
+
+class GlobalDeduplicator:
+    """Drop rows whose key was already seen in an earlier chunk (or, with a spill DB, an earlier run).
+
+    Keys are 64-bit hashes of the `subset` columns, kept in memory as sorted int64
+    segments (8 bytes per key). When more than `max_memory_keys` are held they are
+    moved to an indexed SQLite table in `spill_db`, so memory stays bounded however
+    many rows are read. The spill DB is committed only when the run succeeds, so a
+    failed run does not leave keys for rows that were never loaded. Without a spill DB,
+    keys spill to a temporary file that is removed on close.
+    """
+
+    def __init__(self, subset=None, max_memory_keys=10_000_000, spill_db=None, table='etl_dedup_keys'):
+        self.subset = subset
+        self.max_memory_keys = max_memory_keys
+        self.spill_db = spill_db
+        self.table = table
+        self.segments = []
+        self.memory_keys = 0
+        self.conn = None
+        self.temporary_db = None
+        self.disk_keys = 0
+        self.rows_seen = 0
+        self.dropped = 0
+
+    def open(self):
+        """Open the spill database, if any, and count keys kept from earlier runs."""
+        if self.spill_db is None:
+            return
+        try:
+            # Used from the pipeline reader thread, but only ever by one thread at a time
+            self.conn = sqlite3.connect(self.spill_db, check_same_thread=False)
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key INTEGER PRIMARY KEY)")
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS dedup_probe (key INTEGER PRIMARY KEY)")
+            self.conn.commit()
+            self.disk_keys = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            logging.info(f"Opened dedup spill table {self.table} in {self.spill_db} with {self.disk_keys} keys")
+        except sqlite3.Error as e:
+            logging.error(f"Failed to open dedup spill database {self.spill_db}: {e}")
+            raise
+
+    def open_temporary(self):
+        """Open a temporary spill database for a run without a spill_db, once memory is full."""
+        fd, self.temporary_db = tempfile.mkstemp(prefix='etl_dedup_', suffix='.db')
+        os.close(fd)
+        self.spill_db = self.temporary_db
+        self.open()
+        # Only this run reads the file, so it need not survive a crash
+        self.conn.execute("PRAGMA synchronous = OFF")
+
+    def key_hashes(self, chunk):
+        """Return the int64 key hash of every row in the chunk."""
+        keys = chunk if self.subset is None else chunk[self.subset]
+        return pd.util.hash_pandas_object(keys, index=False).to_numpy().view(np.int64)
+
+    def seen_before(self, hashes):
+        """Return a mask of hashes already recorded in memory or on disk."""
+        seen = np.zeros(len(hashes), dtype=bool)
+        for segment in self.segments:
+            positions = np.searchsorted(segment, hashes).clip(max=len(segment) - 1)
+            seen |= segment[positions] == hashes
+        if self.disk_keys:
+            candidates = np.unique(hashes[~seen])
+            self.conn.executemany("INSERT INTO temp.dedup_probe (key) VALUES (?)", ((int(k),) for k in candidates))
+            found = self.conn.execute(
+                f"SELECT key FROM temp.dedup_probe WHERE key IN (SELECT key FROM {self.table})").fetchall()
+            self.conn.execute("DELETE FROM temp.dedup_probe")
+            if found:
+                seen |= np.isin(hashes, np.fromiter((row[0] for row in found), dtype=np.int64, count=len(found)))
+        return seen
+
+    def remember(self, keys):
+        """Add new unique keys to the memory tier, spilling or merging segments as needed."""
+        if len(keys) == 0:
+            return
+        self.segments.append(np.sort(keys))
+        self.memory_keys += len(keys)
+        if self.memory_keys > self.max_memory_keys:
+            if self.conn is None:
+                self.open_temporary()
+            self.spill()
+        else:
+            # Merge neighbouring segments of similar size, keeping O(log n) segments to search
+            while len(self.segments) > 1 and len(self.segments[-2]) <= 2 * len(self.segments[-1]):
+                newest = self.segments.pop()
+                self.segments[-1] = np.sort(np.concatenate([self.segments[-1], newest]))
+
+    def spill(self):
+        """Move the in-memory keys into the spill table."""
+        for segment in self.segments:
+            self.conn.executemany(f"INSERT OR IGNORE INTO {self.table} (key) VALUES (?)",
+                                  ((int(k),) for k in segment))
+        self.disk_keys += self.memory_keys
+        logging.info(f"Spilled {self.memory_keys} dedup keys to {self.spill_db}")
+        self.segments = []
+        self.memory_keys = 0
+
+    def filter(self, chunk):
+        """Return the chunk without rows whose key was seen before."""
+        if chunk.empty:
+            return chunk
+        hashes = self.key_hashes(chunk)
+        duplicate = pd.Series(hashes).duplicated().to_numpy()
+        duplicate |= self.seen_before(hashes)
+        self.remember(hashes[~duplicate])
+        dropped = int(duplicate.sum())
+        self.rows_seen += len(chunk)
+        self.dropped += dropped
+        if dropped:
+            logging.info(f"Global dedup dropped {dropped} rows from chunk")
+            chunk = chunk.take(np.flatnonzero(~duplicate))
+        return chunk
+
+    def filter_chunks(self, chunks):
+        """Filter an iterator of chunks or (chunk, checkpoint) pairs."""
+        for item in chunks:
+            if isinstance(item, tuple):
+                chunk, checkpoint = item
+                yield self.filter(chunk), checkpoint
+            else:
+                yield self.filter(item)
+
+    def close(self, commit=True):
+        """Persist this run's keys to the spill database (or discard them on failure) and close it."""
+        logging.info(f"Global dedup dropped {self.dropped} of {self.rows_seen} rows")
+        if self.conn is None:
+            return
+        try:
+            if self.temporary_db is not None:
+                self.conn.rollback()
+            elif commit:
+                self.spill()
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+            self.conn = None
+            if self.temporary_db is not None:
+                os.remove(self.temporary_db)
+                self.spill_db = None
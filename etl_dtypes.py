@@ -0,0 +1,71 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# Low-cardinality text columns (raw CSV names) read straight into categorical dtype
+CATEGORICAL_COLUMNS = ['Gender', 'Blood Type', 'Admission Type', 'Test Results', 'Medication',
+                       'Insurance Provider', 'Hospital']
+
+# Small integer columns: nullable Int16 until cleaned (it still holds negative and
+# missing values for validation), then downcast to these dtypes
+SMALL_INTEGER_COLUMNS = ['Age', 'Room Number']
+COMPACT_INTEGER_DTYPES = {'age': 'uint8', 'room_number': 'int16'}
+
+
+def compact_read_dtypes(dtypes=None):
+    """Return read_csv dtypes with the categorical columns added and nullable integers narrowed.
+
+    Integer columns left to inference are not forced to Int16 at read time: the
+    parser is much slower producing nullable integers than converting afterwards.
+    """
+    dtypes = dict(dtypes or {})
+    dtypes.update({col: 'category' for col in CATEGORICAL_COLUMNS})
+    for col in SMALL_INTEGER_COLUMNS:
+        if col in dtypes:
+            dtypes[col] = 'Int16'
+    return dtypes
+
+
+def is_categorical(series):
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def map_categories(series, cleaner):
+    """Apply a vectorized cleaner to a categorical column's categories instead of its rows.
+
+    Categories that clean to the same value are merged; the result is categorical.
+    """
+    cleaned = pd.Series(cleaner(pd.Series(series.cat.categories, dtype=object)).to_numpy(), dtype=object)
+    categories = pd.Index(cleaned.dropna().unique())
+    new_codes = categories.get_indexer(cleaned)
+    codes = series.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, new_codes[codes], -1) if len(new_codes) else codes
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=series.index, name=series.name)
+
+
+def map_values(series, cleaner):
+    """Clean a column: per category if it is categorical, else row by row."""
+    return map_categories(series, cleaner) if is_categorical(series) else cleaner(series)
+
+
+def fill_missing(series, value):
+    """fillna that adds `value` as a category first when the column is categorical."""
+    if not series.hasnans:
+        return series
+    if is_categorical(series) and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+def downcast_integers(chunk, dtypes=COMPACT_INTEGER_DTYPES):
+    """Downcast cleaned integer columns; a column with missing or out-of-range values is left as is."""
+    for col, dtype in dtypes.items():
+        if col not in chunk.columns or chunk[col].hasnans:
+            continue
+        info = np.iinfo(dtype)
+        values = chunk[col]
+        if values.empty or (values.min() >= info.min and values.max() <= info.max):
+            chunk[col] = values.astype(dtype)
+        else:
+            logging.warning(f"{col} has values outside {dtype}; keeping {values.dtype}")
+    return chunk
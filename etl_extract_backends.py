@@ -0,0 +1,256 @@
+import csv
+import io
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from etl_chunk_sizing import next_chunksize
+from etl_compression import detect_compression, open_source
+
+# Strings read as missing values, the same set the pandas parser uses by default
+NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                       '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+
+def open_text(source, encoding):
+    """Open a path, or wrap a binary stream, as text for the csv module."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, newline='', encoding=encoding)
+    return io.TextIOWrapper(source, encoding=encoding, newline='')
+
+
+def read_header(source, encoding):
+    """Return the header fields of a path or a buffered binary stream, without consuming the stream."""
+    if isinstance(source, (str, os.PathLike)):
+        with open_text(source, encoding) as f:
+            return next(csv.reader(f), [])
+    first_line = source.peek(1 << 16).split(b'\n', 1)[0]
+    return next(csv.reader([first_line.decode(encoding)]), [])
+
+
+def convert_column(values, dtype=None):
+    """Convert a column of strings (None or NaN for missing) the way pd.read_csv would."""
+    values = values.where(values.notna(), np.nan)
+    if dtype is str or dtype == 'str' or dtype == 'object':
+        return values
+    if dtype == 'category':
+        return values.astype('category')
+    if dtype is not None:
+        return pd.to_numeric(values).astype(dtype)
+    try:
+        # Columns without a dtype are inferred: numbers if every value parses, else text
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        return values
+
+
+def convert_chunk(chunk, options):
+    """Apply the dtype and parse_dates read_csv options to a chunk of string columns."""
+    dtypes = options.get('dtype') or {}
+    parse_dates = options.get('parse_dates') or []
+    for col in chunk.columns:
+        if col in parse_dates:
+            continue
+        chunk[col] = convert_column(chunk[col], dtypes.get(col))
+    for col in parse_dates:
+        if col not in chunk.columns or chunk.empty:
+            continue
+        try:
+            if options.get('date_format'):
+                chunk[col] = pd.to_datetime(chunk[col], format=options['date_format'])
+            else:
+                chunk[col] = pd.to_datetime(chunk[col], dayfirst=options.get('dayfirst', False))
+        except (ValueError, TypeError):
+            # Like read_csv, a column that does not parse as dates stays text
+            logging.warning(f"Could not parse {col} as dates; keeping it as text")
+    return chunk
+
+
+class PandasBackend:
+    """The pandas C parser (pd.read_csv with chunksize)."""
+
+    name = 'pandas'
+
+    @staticmethod
+    def available():
+        return True
+
+    def read(self, csv_file, chunksize, options):
+        if not callable(chunksize):
+            return pd.read_csv(csv_file, chunksize=chunksize, **options)
+        return self.read_sized(csv_file, chunksize, options)
+
+    @staticmethod
+    def read_sized(csv_file, chunksize, options):
+        """Read chunks whose row count is asked from `chunksize()` before each one."""
+        with pd.read_csv(csv_file, iterator=True, **options) as reader:
+            while True:
+                try:
+                    yield reader.get_chunk(chunksize())
+                except StopIteration:
+                    return
+
+
+class PyArrowBackend:
+    """pyarrow's multithreaded streaming CSV reader, used when pyarrow is installed."""
+
+    name = 'pyarrow'
+
+    @staticmethod
+    def available():
+        try:
+            import pyarrow.csv  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def read(self, csv_file, chunksize, options):
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+
+        encoding = options.get('encoding', 'utf-8')
+        header = read_header(csv_file, encoding)
+        # Every column is read as text so the shared conversion gives the pandas schema
+        reader = pa_csv.open_csv(
+            csv_file,
+            read_options=pa_csv.ReadOptions(encoding=encoding),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=self.skip_invalid_row),
+            convert_options=pa_csv.ConvertOptions(column_types={col: pa.string() for col in header},
+                                                  null_values=list(NA_VALUES), strings_can_be_null=True)
+        )
+        start = 0
+        pending = []
+        pending_rows = 0
+        for batch in reader:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            rows = next_chunksize(chunksize)
+            while pending_rows >= rows:
+                table = pa.Table.from_batches(pending)
+                yield self.to_chunk(table.slice(0, rows), start, options)
+                start += rows
+                pending = table.slice(rows).to_batches()
+                pending_rows -= rows
+                rows = next_chunksize(chunksize)
+        if pending_rows or start == 0:
+            table = pa.Table.from_batches(pending, schema=reader.schema)
+            yield self.to_chunk(table, start, options)
+
+    @staticmethod
+    def skip_invalid_row(row):
+        logging.warning(f"Skipping malformed CSV line {row.number}: {row.text}")
+        return 'skip'
+
+    @staticmethod
+    def to_chunk(table, start, options):
+        chunk = table.to_pandas()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        return convert_chunk(chunk, options)
+
+
+class CsvModuleBackend:
+    """Pure-stdlib streaming reader built on the csv module, for minimal environments."""
+
+    name = 'csv'
+
+    @staticmethod
+    def available():
+        return True
+
+    def read(self, csv_file, chunksize, options):
+        with open_text(csv_file, options.get('encoding', 'utf-8')) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                raise pd.errors.EmptyDataError("No columns to parse from file")
+            start = 0
+            rows = []
+            size = next_chunksize(chunksize)
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) > len(header):
+                    logging.warning(f"Skipping malformed CSV line {reader.line_num}: "
+                                    f"expected {len(header)} fields, saw {len(row)}")
+                    continue
+                if len(row) < len(header):
+                    # Like pandas, the missing trailing fields are read as NaN
+                    row += [''] * (len(header) - len(row))
+                rows.append(row)
+                if len(rows) >= size:
+                    yield self.to_chunk(header, rows, start, options)
+                    start += len(rows)
+                    rows = []
+                    size = next_chunksize(chunksize)
+            if rows or start == 0:
+                yield self.to_chunk(header, rows, start, options)
+
+    @staticmethod
+    def to_chunk(header, rows, start, options):
+        columns = zip(*rows) if rows else [()] * len(header)
+        chunk = pd.DataFrame({col: pd.Series(values, dtype=object) for col, values in zip(header, columns)})
+        chunk = chunk.where(~chunk.isin(NA_VALUES), np.nan)
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        return convert_chunk(chunk, options)
+
+
+EXTRACT_BACKENDS = {backend.name: backend for backend in (PandasBackend, PyArrowBackend, CsvModuleBackend)}
+
+
+def available_backends():
+    """Return the names of the backends usable in this environment."""
+    return [name for name, backend in EXTRACT_BACKENDS.items() if backend.available()]
+
+
+def select_backend(csv_file, options, sample_rows=50_000):
+    """Time each available backend on the first `sample_rows` rows and return the fastest one's name."""
+    timings = {}
+    for name in available_backends():
+        start = time.perf_counter()
+        try:
+            chunks = read_csv_chunks(csv_file, sample_rows, options, name)
+            next(iter(chunks), None)
+            chunks.close()
+        except Exception as e:
+            logging.warning(f"Extract backend {name} failed on the sample: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+    if not timings:
+        raise RuntimeError(f"No extract backend could read {csv_file}")
+    fastest = min(timings, key=timings.get)
+    logging.info(f"Extract backend timings on {sample_rows} rows: {timings}; using {fastest}")
+    return fastest
+
+
+def read_csv_chunks(csv_file, chunksize, options, backend='pandas', progress=None):
+    """Return an iterator of DataFrame chunks from the named backend.
+
+    `chunksize` is a row count, or a callable asked for the row count of each next chunk.
+    gzip, bz2 and xz files are decompressed on the fly by a background thread; the
+    optional `progress` (ReadProgress) counts their compressed and uncompressed bytes.
+    """
+    if backend not in EXTRACT_BACKENDS:
+        raise ValueError(f"Unknown extract backend: {backend}")
+    if not EXTRACT_BACKENDS[backend].available():
+        raise ImportError(f"Extract backend {backend} is not available in this environment")
+    compression = detect_compression(csv_file)
+    if compression is None:
+        if progress is not None:
+            progress.compressed_bytes = progress.uncompressed_bytes = os.path.getsize(csv_file)
+        return EXTRACT_BACKENDS[backend]().read(csv_file, chunksize, options)
+    stream = open_source(csv_file, progress, compression)
+    try:
+        chunks = EXTRACT_BACKENDS[backend]().read(stream, chunksize, options)
+    except Exception:
+        stream.close()
+        raise
+    return closing_chunks(chunks, stream)
+
+
+def closing_chunks(chunks, stream):
+    """Yield from chunks, closing the decompressing stream when done or abandoned."""
+    try:
+        yield from chunks
+    finally:
+        stream.close()
@@ -0,0 +1,404 @@
+import argparse
+import re
+import sqlite3
+import time
+import logging
+from db_connection import db_connection
+from etl_storage import DIMENSION_COLUMNS, FACT_TABLE
+
+# Configure logging
+logging.basicConfig(
+    filename='etl_process.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Rows read to estimate the selectivity of a hypothetical index
+SAMPLE_ROWS = 100_000
+
+# Indexes wider than this are not suggested as covering indexes
+MAX_INDEX_COLUMNS = 5
+
+CANDIDATE_INDEX = 'advisor_candidate'
+
+# A load drops and rebuilds the indexes only if it adds at least this fraction of the rows already loaded
+REBUILD_RATIO = 0.2
+
+# Words that can follow a table name in FROM / JOIN without being its alias
+SQL_KEYWORDS = {'where', 'inner', 'left', 'right', 'full', 'cross', 'outer', 'join', 'on', 'group', 'order',
+                'having', 'limit', 'union', 'natural', 'using', 'as', 'select', 'from', 'and', 'or', 'set'}
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+CLAUSE_END = r'(?=\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|\bUNION\b|;|\)|$)'
+SQL_NOISE = re.compile(r"--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'", re.DOTALL)
+GROUP_BY = re.compile(rf'\bGROUP\s+BY\b(.*?){CLAUSE_END}', re.IGNORECASE | re.DOTALL)
+ORDER_BY = re.compile(rf'\bORDER\s+BY\b(.*?){CLAUSE_END}', re.IGNORECASE | re.DOTALL)
+
+
+class Index:
+    """A secondary index on `columns` of `table`, built by build_indexes once a load has finished."""
+
+    def __init__(self, name, table, columns, unique=False):
+        if not columns:
+            raise ValueError(f"Index {name} needs at least one column")
+        self.name = name
+        self.table = table
+        self.columns = list(columns)
+        self.unique = unique
+
+    def create_sql(self):
+        unique = 'UNIQUE ' if self.unique else ''
+        return f"CREATE {unique}INDEX IF NOT EXISTS {self.name} ON {self.table} ({', '.join(self.columns)})"
+
+    def stored(self, table_name, dimension_columns=()):
+        """Return this index on the table an ETL actually writes, e.g. healthcare_fact with doctor_id keys."""
+        if self.table != 'healthcare' or table_name == 'healthcare':
+            return self
+        columns = [f"{col}_id" if col in dimension_columns else col for col in self.columns]
+        return Index(self.name, table_name, columns, self.unique)
+
+    def __repr__(self):
+        return f"Index({self.name!r}: {self.table}({', '.join(self.columns)}))"
+
+
+# Built after loading when an ETL runs with indexes=True: the filters, joins and sorts of the query_*.py scripts
+HEALTHCARE_INDEXES = [
+    Index('idx_healthcare_condition_billing', 'healthcare', ['medical_condition', 'billing_amount']),
+    Index('idx_healthcare_billing_amount', 'healthcare', ['billing_amount']),
+    Index('idx_healthcare_doctor', 'healthcare', ['doctor'])
+]
+
+
+def resolve_indexes(indexes, table_name='healthcare', storage='table'):
+    """Turn an ETL's `indexes` option (None, True or a list of Index) into the indexes to build."""
+    if not indexes:
+        return []
+    if indexes is True:
+        indexes = HEALTHCARE_INDEXES
+    dimension_columns = DIMENSION_COLUMNS if storage == 'encoded' else ()
+    return [index.stored(table_name, dimension_columns) for index in indexes]
+
+
+def loaded_storage(conn):
+    """Return (table, storage) of a database an ETL loaded, from the columns of its fact table.
+
+    A database with only date_storage='days' has a fact table too, but with text dimension columns.
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({FACT_TABLE})")}
+    if not columns:
+        return 'healthcare', 'table'
+    encoded = any(f"{col}_id" in columns for col in DIMENSION_COLUMNS)
+    return FACT_TABLE, 'encoded' if encoded else 'table'
+
+
+def build_healthcare_indexes(db, run_analyze=True, analysis_limit=None):
+    """Build HEALTHCARE_INDEXES on whichever table the database stores the healthcare rows in."""
+    with db_connection(db) as conn:
+        table_name, storage = loaded_storage(conn)
+    return finish_load(db, resolve_indexes(True, table_name, storage), run_analyze, analysis_limit)
+
+
+def drop_indexes(conn, indexes):
+    """Drop the given indexes so a load does not maintain them row by row."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    dropped = [index.name for index in indexes if index.name in existing]
+    for name in dropped:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    if dropped:
+        logging.info(f"Dropped indexes before loading: {dropped}")
+    return dropped
+
+
+def defer_indexes(conn, table, indexes, rows_to_load, ratio=REBUILD_RATIO):
+    """Drop the indexes for a load that is large next to the table, to build them once it is done.
+
+    An empty table, or a load of at least `ratio` of its rows (or of unknown size), gets
+    its indexes dropped; a smaller append keeps them and updates them in place.
+    Returns the names of the deferred indexes.
+    """
+    try:
+        existing_rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    except sqlite3.OperationalError:
+        existing_rows = 0
+    if rows_to_load is not None and existing_rows and rows_to_load < ratio * existing_rows:
+        logging.info(f"Keeping indexes for a load of about {rows_to_load} rows into {existing_rows}")
+        return []
+    drop_indexes(conn, indexes)
+    return [index.name for index in indexes]
+
+
+def build_indexes(conn, indexes):
+    """Create the given indexes in one transaction and return the seconds each took.
+
+    Built over a loaded table, each index is one sort of the existing rows instead of a
+    B-tree insert per loaded row.
+    """
+    timings = {}
+    try:
+        with conn:
+            for index in indexes:
+                start = time.perf_counter()
+                conn.execute(index.create_sql())
+                timings[index.name] = round(time.perf_counter() - start, 6)
+        logging.info(f"Built indexes: {timings}")
+        return timings
+    except sqlite3.Error as e:
+        logging.error(f"Building indexes failed: {e}")
+        raise
+
+
+def analyze(conn, analysis_limit=None):
+    """Refresh the planner statistics with ANALYZE, then let PRAGMA optimize finish the job.
+
+    An `analysis_limit` makes ANALYZE read about that many rows per index instead of all of them.
+    """
+    start = time.perf_counter()
+    try:
+        if analysis_limit is not None:
+            conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"ANALYZE failed: {e}")
+        raise
+    seconds = round(time.perf_counter() - start, 6)
+    logging.info(f"Analyzed database in {seconds}s")
+    return seconds
+
+
+def finish_load(db, indexes, run_analyze=True, analysis_limit=None):
+    """Post-load stage: build the indexes deferred during the load, then analyze; return a report."""
+    with db_connection(db, must_exist=False) as conn:
+        report = {'indexes': build_indexes(conn, indexes)}
+        if run_analyze:
+            report['analyze_seconds'] = analyze(conn, analysis_limit)
+    return report
+
+
+def plan_problems(plan):
+    """Return the full scans and temp B-trees in EXPLAIN QUERY PLAN detail lines."""
+    return ([detail for detail in plan if detail.startswith('SCAN') and 'INDEX' not in detail],
+            [detail for detail in plan if 'TEMP B-TREE' in detail])
+
+
+def strip_sql(sql):
+    """Replace comments and string literals, whose words are not column names, with a placeholder."""
+    return SQL_NOISE.sub(' ? ', sql)
+
+
+def table_references(sql, tables):
+    """Map each table alias (and name) used in FROM / JOIN clauses to its table."""
+    references = {}
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        if table.lower() not in tables:
+            continue
+        references[table.lower()] = table.lower()
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            references[alias.lower()] = table.lower()
+    return references
+
+
+def clause_columns(pattern, sql, columns):
+    found = []
+    for clause in pattern.findall(sql):
+        for name in re.findall(r'(?:\w+\.)?(\w+)', clause):
+            if name.lower() in columns and name.lower() not in found:
+                found.append(name.lower())
+    return found
+
+
+def candidate_columns(sql, columns):
+    """Return the column lists worth trying as an index on a table with these columns.
+
+    Columns compared with = or IN lead, then a GROUP BY, an ORDER BY or a range column,
+    in that order, so that between equally good indexes the one saving a sort is kept;
+    each candidate is also tried with every other column of the table the query uses
+    appended, so the index covers the query.
+    """
+    columns = {col.lower() for col in columns}
+    column = r'(?:\w+\.)?(\w+)'
+    equality = []
+    for left, right in re.findall(rf'{column}\s*(?:==?|\bIN\b)\s*(?:{column})?', sql, re.IGNORECASE):
+        for name in (left, right):
+            if name.lower() in columns and name.lower() not in equality:
+                equality.append(name.lower())
+    ranges = []
+    for left, right in re.findall(rf'{column}\s*(?:<=?|>=?|\bBETWEEN\b|\bLIKE\b)\s*(?:{column})?', sql, re.IGNORECASE):
+        for name in (left, right):
+            if name.lower() in columns and name.lower() not in equality + ranges:
+                ranges.append(name.lower())
+    group_by = clause_columns(GROUP_BY, sql, columns)
+    order_by = clause_columns(ORDER_BY, sql, columns)
+    used = [name.lower() for name in re.findall(column, sql) if name.lower() in columns]
+
+    candidates = []
+    for tail in (group_by, order_by, ranges[:1], []):
+        keys = equality + [col for col in tail if col not in equality]
+        if not keys:
+            continue
+        covering = keys + [col for col in dict.fromkeys(used) if col not in keys]
+        for candidate in (keys, covering):
+            if len(candidate) <= MAX_INDEX_COLUMNS and candidate not in candidates:
+                candidates.append(candidate)
+    return candidates
+
+
+def estimated_stat(conn, table, columns, total_rows):
+    """Estimate the sqlite_stat1 entry of an index on `columns` from a sample of the table.
+
+    The entry is the row count followed by the average rows per distinct prefix of the
+    key. Prefixes repeating often within the sample are taken to be low-cardinality,
+    with every value seen; the others keep the sample's own ratio.
+    """
+    sample = f"(SELECT {', '.join(columns)} FROM {table} LIMIT {SAMPLE_ROWS})"
+    sample_rows = conn.execute(f"SELECT COUNT(*) FROM {sample}").fetchone()[0]
+    averages = []
+    for i in range(1, len(columns) + 1):
+        distinct = conn.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT {', '.join(columns[:i])} FROM {sample})").fetchone()[0]
+        if not distinct:
+            averages.append(1)
+        elif distinct * 10 < sample_rows:
+            averages.append(max(1, round(total_rows / distinct)))
+        else:
+            averages.append(max(1, round(sample_rows / distinct)))
+    return ' '.join(str(value) for value in [max(total_rows, 1)] + averages)
+
+
+class IndexAdvisor:
+    """Suggest indexes for registered queries from their EXPLAIN QUERY PLAN.
+
+    Each candidate index is created in an in-memory copy of the schema carrying the
+    database's planner statistics (and sampled estimates for the candidate), so the
+    plan it would get is known without building anything on the real tables. A
+    candidate is suggested when the planner uses it and the query loses a full scan
+    or a temp B-tree; ties go to the index seeking on more terms, then to covering
+    indexes, then to narrower ones.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.queries = {}
+
+    def register(self, name, sql, params=()):
+        """Add a query to advise on; `params` are bound to its placeholders."""
+        self.queries[name] = (sql, tuple(params))
+
+    def scratch_schema(self, conn):
+        """Build the in-memory schema copy and its sqlite_stat1 table; return it with the row counts."""
+        scratch = sqlite3.connect(':memory:')
+        schema = conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master WHERE sql IS NOT NULL "
+                              "AND name NOT LIKE 'sqlite_%' ORDER BY type = 'view', type = 'index'").fetchall()
+        for _, _, _, sql in schema:
+            scratch.execute(sql)
+        scratch.execute("ANALYZE")
+        tables = [name for kind, name, _, _ in schema if kind == 'table']
+        rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+        analyzed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+        stats = conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1").fetchall() if analyzed else []
+        if not stats:
+            # Never analyzed: row counts and estimates for the existing indexes stand in
+            stats = [(table, None, str(max(count, 1))) for table, count in rows.items()]
+            for kind, name, table, _ in schema:
+                if kind == 'index':
+                    index_columns = [row[2] for row in conn.execute(f"PRAGMA index_info({name})")]
+                    stats.append((table, name, estimated_stat(conn, table, index_columns, rows[table])))
+        scratch.execute("DELETE FROM sqlite_stat1")
+        scratch.executemany("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", stats)
+        scratch.execute("ANALYZE sqlite_schema")
+        return scratch, rows
+
+    def explain(self, conn, sql, params):
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+    def try_candidate(self, scratch, stat, table, columns, sql, params):
+        """Return the plan of a query with a hypothetical index on table(columns)."""
+        scratch.execute(f"CREATE INDEX {CANDIDATE_INDEX} ON {table} ({', '.join(columns)})")
+        scratch.execute("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", (table, CANDIDATE_INDEX, stat))
+        scratch.execute("ANALYZE sqlite_schema")
+        try:
+            return self.explain(scratch, sql, params)
+        finally:
+            scratch.execute(f"DROP INDEX {CANDIDATE_INDEX}")
+            scratch.execute("DELETE FROM sqlite_stat1 WHERE idx = ?", (CANDIDATE_INDEX,))
+            scratch.execute("ANALYZE sqlite_schema")
+
+    def advise(self):
+        """Return one suggestion per registered query and table an index would help.
+
+        A suggestion holds the query, the Index to build, and the plan before and after.
+        """
+        suggestions = []
+        with db_connection(self.db, read_only=True) as conn:
+            scratch, rows = self.scratch_schema(conn)
+            try:
+                tables = {table.lower(): [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                          for table in rows}
+                for name, (sql, params) in self.queries.items():
+                    try:
+                        before = self.explain(conn, sql, params)
+                    except sqlite3.Error as e:
+                        logging.warning(f"Cannot explain query {name}: {e}")
+                        continue
+                    scans, temp_btrees = plan_problems(before)
+                    if not scans and not temp_btrees:
+                        continue
+                    stripped = strip_sql(sql)
+                    for table in sorted(set(table_references(stripped, tables).values())):
+                        best = None
+                        for columns in candidate_columns(stripped, tables[table]):
+                            stat = estimated_stat(conn, table, columns, rows[table])
+                            after = self.try_candidate(scratch, stat, table, columns, sql, params)
+                            if not any(CANDIDATE_INDEX in detail for detail in after):
+                                continue
+                            after_scans, after_btrees = plan_problems(after)
+                            gain = len(scans) + len(temp_btrees) - len(after_scans) - len(after_btrees)
+                            covering = any(f"COVERING INDEX {CANDIDATE_INDEX}" in detail for detail in after)
+                            # Terms the index seeks on, e.g. (medical_condition=? AND billing_amount>?)
+                            terms = sum(detail.count('?') for detail in after if CANDIDATE_INDEX in detail)
+                            score = (gain, terms, covering, -len(columns))
+                            if gain > 0 and (best is None or score > best[0]):
+                                best = (score, columns, after)
+                        if best is not None:
+                            _, columns, after = best
+                            index = Index(f"idx_{table}_{'_'.join(columns)}", table, columns)
+                            suggestions.append({'query': name, 'index': index, 'sql': index.create_sql(),
+                                                'plan_before': before,
+                                                'plan_after': [detail.replace(CANDIDATE_INDEX, index.name)
+                                                               for detail in after]})
+            finally:
+                scratch.close()
+        logging.info(f"Index advisor suggested {[suggestion['sql'] for suggestion in suggestions]}")
+        return suggestions
+
+
+def suggested_indexes(suggestions):
+    """Return the distinct indexes of a list of suggestions, in order."""
+    indexes = {}
+    for suggestion in suggestions:
+        indexes.setdefault(suggestion['index'].name, suggestion['index'])
+    return list(indexes.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the post-load indexes, analyze, and suggest indexes for the queries.")
+    parser.add_argument('--db', default='healthcare.db')
+    parser.add_argument('--build', action='store_true', help="Build HEALTHCARE_INDEXES and analyze")
+    parser.add_argument('--advise', action='store_true', help="Suggest indexes for the query_*.py scripts")
+    parser.add_argument('--apply', action='store_true', help="Build the suggested indexes")
+    args = parser.parse_args()
+    if args.build:
+        print(build_healthcare_indexes(args.db))
+    if args.advise:
+        from benchmark_queries import QUERIES, traced_statements
+        advisor = IndexAdvisor(args.db)
+        for query in QUERIES:
+            for i, sql in enumerate(traced_statements(query, args.db)):
+                advisor.register(f"{query}[{i}]", sql)
+        suggestions = advisor.advise()
+        for suggestion in suggestions:
+            print(f"{suggestion['query']}: {suggestion['sql']}")
+            print('    before: ' + '; '.join(suggestion['plan_before']))
+            print('    after:  ' + '; '.join(suggestion['plan_after']))
+        if args.apply:
+            print(finish_load(args.db, suggested_indexes(suggestions)))
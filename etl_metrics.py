@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+from etl_compression import detect_compression
+
+
+# Columns of the etl_runs table besides its run_id key
+RUN_COLUMNS = ['started_at', 'finished_at', 'status', 'csv_file', 'rows_in', 'rows_out', 'wall_seconds',
+               'cpu_seconds', 'bytes_read', 'report']
+
+
+def create_runs_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS etl_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at DATETIME,
+            finished_at DATETIME,
+            status TEXT,
+            csv_file TEXT,
+            rows_in INTEGER,
+            rows_out INTEGER,
+            wall_seconds FLOAT,
+            cpu_seconds FLOAT,
+            bytes_read INTEGER,
+            report TEXT
+        )
+    ''')
+
+
+class StageMetrics:
+    """Accumulated wall time, CPU time and row counts of one ETL stage or transform step."""
+
+    def __init__(self, calls=0, wall_seconds=0.0, cpu_seconds=0.0, rows_in=0, rows_out=0):
+        self.calls = calls
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+
+    def add(self, wall_seconds, cpu_seconds, rows_in, rows_out):
+        self.calls += 1
+        self.wall_seconds += wall_seconds
+        self.cpu_seconds += cpu_seconds
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.wall_seconds += other.wall_seconds
+        self.cpu_seconds += other.cpu_seconds
+        self.rows_in += other.rows_in
+        self.rows_out += other.rows_out
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_per_second': round(self.rows_out / self.wall_seconds, 1) if self.wall_seconds else None
+        }
+
+
+class EtlMetrics:
+    """Per-stage metrics of one ETL run, reported as JSON and optionally stored in etl_runs.
+
+    CPU time is process time: stages running in the reader thread of a pipelined run
+    also count CPU used by other threads of the main process at the same moment. That
+    thread records stages while the writer merges worker metrics, hence the lock.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.stages_lock = threading.Lock()
+        self.bytes_read = 0
+        self.sources = []
+        self.extra = {}
+        self.started_at = None
+        self.finished_at = None
+        self.status = None
+        self.start_wall = None
+        self.start_cpu = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def start(self):
+        self.started_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def finish(self, succeeded):
+        self.finished_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.status = 'succeeded' if succeeded else 'failed'
+        self.wall_seconds = time.perf_counter() - self.start_wall
+        self.cpu_seconds = time.process_time() - self.start_cpu
+
+    def track_source(self, progress):
+        """Count a source's ReadProgress in the report's compressed and uncompressed bytes."""
+        self.sources.append(progress)
+        return progress
+
+    def record(self, name, wall_seconds, cpu_seconds, rows_in, rows_out):
+        with self.stages_lock:
+            self.stages.setdefault(name, StageMetrics()).add(wall_seconds, cpu_seconds, rows_in, rows_out)
+
+    def merge_stages(self, stages):
+        """Fold in stage metrics recorded elsewhere (e.g. in a transform worker process)."""
+        with self.stages_lock:
+            for name, stage in stages.items():
+                self.stages.setdefault(name, StageMetrics()).merge(stage)
+
+    def timed(self, name, func, chunk, *args):
+        """Run func(chunk, *args), recording its time and the rows going in and out."""
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        result = func(chunk, *args)
+        rows_out = len(result) if result is not None else len(chunk)
+        self.record(name, time.perf_counter() - start_wall, time.process_time() - start_cpu, len(chunk), rows_out)
+        return result
+
+    def timed_chunks(self, name, chunks):
+        """Yield from a chunk iterator, recording the time spent producing each chunk."""
+        chunks = iter(chunks)
+        while True:
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            try:
+                item = next(chunks)
+            except StopIteration:
+                return
+            rows = len(item[0] if isinstance(item, tuple) else item)
+            self.record(name, time.perf_counter() - start_wall, time.process_time() - start_cpu, rows, rows)
+            yield item
+
+    def map_chunks(self, name, func, chunks):
+        """Apply a timed func to every chunk of an iterator of chunks or (chunk, checkpoint) pairs."""
+        for item in chunks:
+            if isinstance(item, tuple):
+                chunk, checkpoint = item
+                yield self.timed(name, func, chunk), checkpoint
+            else:
+                yield self.timed(name, func, item)
+
+    def report(self):
+        """Return the run report as a JSON-serialisable dict."""
+        extract = self.stages.get('extract')
+        last_load = self.stages.get('load')
+        return {
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'status': self.status,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'rows_in': extract.rows_out if extract else 0,
+            'rows_out': last_load.rows_out if last_load else 0,
+            'rows_per_second': round(last_load.rows_out / self.wall_seconds, 1) if last_load and self.wall_seconds else None,
+            'bytes_read': self.bytes_read,
+            'compressed_bytes_read': sum(source.compressed_bytes for source in self.sources),
+            'uncompressed_bytes_read': sum(source.uncompressed_bytes for source in self.sources),
+            **self.extra,
+            'stages': {name: stage.to_dict() for name, stage in self.stages.items()}
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        logging.info(f"ETL run report written to {path}")
+
+    def save(self, conn):
+        """Append the run to the etl_runs table."""
+        report = self.report()
+        create_runs_table(conn)
+        conn.execute(f'''
+            INSERT INTO etl_runs ({', '.join(RUN_COLUMNS)})
+            VALUES ({', '.join('?' * len(RUN_COLUMNS))})
+        ''', (report['started_at'], report['finished_at'], report['status'], report.get('csv_file'),
+              report['rows_in'], report['rows_out'], report['wall_seconds'], report['cpu_seconds'],
+              report['bytes_read'], json.dumps(report)))
+        conn.commit()
+
+    def summary(self):
+        """Return a one-line summary of the slowest stages for the log."""
+        slowest = sorted(self.stages.items(), key=lambda item: item[1].wall_seconds, reverse=True)[:5]
+        stages = ', '.join(f"{name} {stage.wall_seconds:.3f}s" for name, stage in slowest)
+        return f"{self.status} in {self.wall_seconds:.3f}s wall / {self.cpu_seconds:.3f}s CPU; slowest: {stages}"
+
+
+def file_bytes(path, start_offset=0):
+    """Return how many bytes of a file are read from `start_offset` to its end.
+
+    A compressed file is always read from its start, whatever the (uncompressed) offset.
+    """
+    if detect_compression(path) is not None:
+        start_offset = 0
+    return max(os.path.getsize(path) - start_offset, 0)
+
+
+def estimate_rows(path, start_offset=0, sample_bytes=1 << 20):
+    """Estimate the CSV rows from `start_offset` to the end of a file, from the line length of its first MB.
+
+    Returns None for a compressed file, whose uncompressed size is not known up front.
+    """
+    if detect_compression(path) is not None:
+        return None
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    if not sample:
+        return 0
+    return int(file_bytes(path, start_offset) * max(sample.count(b'\n'), 1) / len(sample))
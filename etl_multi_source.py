@@ -0,0 +1,271 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from healthcare_etl_chunked_fixed import HealthcareETL
+from healthcare_etl import HealthcareETL as CleaningETL
+from etl_bulk_load import upsert_sql
+from etl_metrics import RUN_COLUMNS, create_runs_table
+from etl_storage import HEALTHCARE_COLUMNS, DIMENSION_COLUMNS
+from etl_validation import REJECT_COLUMNS, REJECTS_TABLE, create_rejects_table
+from etl_indexes import defer_indexes, finish_load, resolve_indexes
+from query_cache import bump_data_version
+
+# Configure logging
+logging.basicConfig(
+    filename='etl_process.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Files picked up when a directory is given as the source; compressed ones are streamed
+SOURCE_EXTENSIONS = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz')
+
+
+def expand_sources(sources):
+    """Return the sorted files named by a glob pattern, a directory, or a list of either."""
+    if isinstance(sources, (list, tuple)):
+        return [csv_file for source in sources for csv_file in expand_sources(source)]
+    if os.path.isdir(sources):
+        return sorted(os.path.join(sources, name) for name in os.listdir(sources)
+                      if name.lower().endswith(SOURCE_EXTENSIONS))
+    return sorted(glob.glob(sources))
+
+
+def create_schema(etl_class, db_name, etl_kwargs):
+    """Create the tables `etl_class` loads into in db_name and return the ETL used to do it."""
+    etl = etl_class(None, db_name=db_name, **etl_kwargs)
+    if hasattr(etl, 'create_table'):
+        etl.create_table()
+    else:
+        # The cleaning ETL creates its schema when constructed
+        etl.close_connection()
+    return etl
+
+
+def ingest_file(etl_class, csv_file, staging_db, etl_kwargs):
+    """Worker: run a single-file ETL into its own staging database and return its run report."""
+    if os.path.exists(staging_db):
+        os.remove(staging_db)
+    etl = etl_class(csv_file, db_name=staging_db, **etl_kwargs)
+    etl.run()
+    return etl.metrics.report()
+
+
+def merge_sql(alias, table, dimension_columns=(), on_conflict='update'):
+    """Build the INSERT ... SELECT that upserts one attached staging table into main."""
+    columns = []
+    select = []
+    joins = []
+    for col, _ in HEALTHCARE_COLUMNS:
+        if col in dimension_columns:
+            # Dimension keys are local to each staging file; map them through the values
+            columns.append(f"{col}_id")
+            select.append(f"m_{col}.id")
+            joins.append(f"LEFT JOIN {alias}.dim_{col} s_{col} ON s_{col}.id = f.{col}_id "
+                         f"LEFT JOIN main.dim_{col} m_{col} ON m_{col}.value = s_{col}.value")
+        else:
+            columns.append(col)
+            select.append(f"f.{col}")
+    source = f"SELECT {', '.join(select)} FROM {alias}.{table} f {' '.join(joins)}"
+    return upsert_sql(f"main.{table}", columns, on_conflict, source=source)
+
+
+def merge_staging(db_name, staging_dbs, table, dimension_columns=(), on_conflict='update'):
+    """Merge staging databases into db_name, in order, in one transaction; return the rows written.
+
+    db_name must already have the schema. At most SQLITE_LIMIT_ATTACHED databases can be merged at once.
+    """
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    aliases = []
+    try:
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(staging_dbs) > limit:
+            raise ValueError(f"Cannot attach {len(staging_dbs)} staging databases at once (limit {limit})")
+        # ATTACH is not allowed inside a transaction, so every staging file is attached first
+        for i, staging_db in enumerate(staging_dbs):
+            alias = f"staging_{i}"
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (staging_db,))
+            aliases.append(alias)
+        rows = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for alias in aliases:
+                for col in dimension_columns:
+                    conn.execute(f"INSERT OR IGNORE INTO main.dim_{col} (value) "
+                                 f"SELECT value FROM {alias}.dim_{col} ORDER BY id")
+                rows += conn.execute(merge_sql(alias, table, dimension_columns, on_conflict)).rowcount
+                has_runs = conn.execute(f"SELECT 1 FROM {alias}.sqlite_master WHERE type = 'table' AND name = 'etl_runs'").fetchone()
+                if has_runs:
+                    create_runs_table(conn)
+                    conn.execute(f"INSERT INTO main.etl_runs ({', '.join(RUN_COLUMNS)}) "
+                                 f"SELECT {', '.join(RUN_COLUMNS)} FROM {alias}.etl_runs ORDER BY run_id")
+                has_rejects = conn.execute(f"SELECT 1 FROM {alias}.sqlite_master WHERE type = 'table' AND name = ?",
+                                           (REJECTS_TABLE,)).fetchone()
+                if has_rejects:
+                    create_rejects_table(conn)
+                    conn.execute(upsert_sql(f"main.{REJECTS_TABLE}", REJECT_COLUMNS, on_conflict,
+                                            source=f"SELECT {', '.join(REJECT_COLUMNS)} FROM {alias}.{REJECTS_TABLE}"))
+            bump_data_version(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logging.info(f"Merged {len(staging_dbs)} staging databases into {db_name}: {rows} rows")
+        return rows
+    except sqlite3.Error as e:
+        logging.error(f"Merging staging databases into {db_name} failed: {e}")
+        raise
+    finally:
+        for alias in aliases:
+            conn.execute(f"DETACH DATABASE {alias}")
+        conn.close()
+
+
+class MultiSourceETL:
+    """Ingest many CSV files in parallel, each into its own staging database, then merge them.
+
+    `sources` is a glob pattern, a directory of CSV files, or a list of either. A pool
+    of `workers` processes runs one single-file ETL (`etl_class`, with `etl_kwargs`)
+    per file into a staging SQLite file, so no worker waits on another's write lock.
+    The staging files are then merged into `db_name` with ATTACH and INSERT ... SELECT
+    in one transaction, in source order: a record_id found in several files ends up
+    as if the files had been loaded one after another. Staging files go to
+    `staging_dir` (a temporary directory next to db_name by default) and are removed
+    after the merge unless keep_staging is set. `indexes` and `analyze` apply to db_name
+    only: staging files are never indexed, and the indexes are built after the merge.
+    """
+
+    def __init__(self, sources, db_name='healthcare.db', workers=None, staging_dir=None, keep_staging=False,
+                 etl_class=HealthcareETL, metrics_report=None, **etl_kwargs):
+        if etl_kwargs.get('resume'):
+            raise ValueError("resume is not supported with multiple sources: staging databases are not kept")
+        if etl_kwargs.get('dedup_spill_db'):
+            raise ValueError("dedup_spill_db would be shared by every worker; use global_dedup without it")
+        self.sources = sources
+        self.csv_files = expand_sources(sources)
+        if not self.csv_files:
+            logging.error(f"No CSV files found for {sources}")
+            raise FileNotFoundError(f"No CSV files found for {sources}")
+        self.db_name = db_name
+        self.workers = workers or os.cpu_count() or 1
+        self.staging_dir = staging_dir
+        self.keep_staging = keep_staging
+        self.etl_class = etl_class
+        self.metrics_report = metrics_report
+        self.indexes = etl_kwargs.pop('indexes', None)
+        self.analyze = etl_kwargs.pop('analyze', False)
+        # Files are ingested in parallel, so each file's own ETL runs in a single process
+        self.etl_kwargs = {**etl_kwargs, 'workers': 1}
+        self.on_conflict = etl_kwargs.get('on_conflict', 'update')
+        self.staging_files = []
+        self.file_reports = []
+        self.rows_merged = 0
+        logging.info(f"Initialized MultiSourceETL with {len(self.csv_files)} files, DB: {db_name}, Workers: {self.workers}")
+
+    def staging_path(self, index, csv_file):
+        name = os.path.splitext(os.path.basename(csv_file))[0]
+        return os.path.join(self.staging_dir, f"{index:05d}_{name}.db")
+
+    def ingest(self, staging_dbs):
+        """Run every file's ETL into its staging database, returning the run reports in source order."""
+        jobs = list(zip(self.csv_files, staging_dbs))
+        if self.workers == 1:
+            return [ingest_file(self.etl_class, csv_file, staging_db, self.etl_kwargs) for csv_file, staging_db in jobs]
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as pool:
+            futures = [pool.submit(ingest_file, self.etl_class, csv_file, staging_db, self.etl_kwargs)
+                       for csv_file, staging_db in jobs]
+            return [future.result() for future in futures]
+
+    def merge(self, staging_dbs, schema):
+        """Merge the staging databases into db_name, first combining them in groups if there are too many to attach."""
+        dimension_columns = DIMENSION_COLUMNS if schema.options.storage == 'encoded' else ()
+        with sqlite3.connect(':memory:') as conn:
+            limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        level = 0
+        while len(staging_dbs) > limit:
+            combined = []
+            for start in range(0, len(staging_dbs), limit):
+                target = os.path.join(self.staging_dir, f"combined_{level}_{start // limit:05d}.db")
+                self.staging_files.append(target)
+                create_schema(self.etl_class, target, self.etl_kwargs)
+                merge_staging(target, staging_dbs[start:start + limit], schema.table_name, dimension_columns, self.on_conflict)
+                combined.append(target)
+            staging_dbs = combined
+            level += 1
+        return merge_staging(self.db_name, staging_dbs, schema.table_name, dimension_columns, self.on_conflict)
+
+    def run(self):
+        """Ingest every source file in parallel and merge the results into db_name."""
+        start = time.perf_counter()
+        created_dir = self.staging_dir is None
+        if created_dir:
+            self.staging_dir = tempfile.mkdtemp(prefix='healthcare_staging_',
+                                                dir=os.path.dirname(os.path.abspath(self.db_name)))
+        os.makedirs(self.staging_dir, exist_ok=True)
+        staging_dbs = [self.staging_path(i, csv_file) for i, csv_file in enumerate(self.csv_files)]
+        self.staging_files = list(staging_dbs)
+        try:
+            schema = create_schema(self.etl_class, self.db_name, self.etl_kwargs)
+            self.file_reports = self.ingest(staging_dbs)
+            ingest_seconds = time.perf_counter() - start
+            indexes = resolve_indexes(self.indexes, schema.table_name, schema.options.storage)
+            if indexes:
+                with sqlite3.connect(self.db_name) as conn:
+                    defer_indexes(conn, schema.table_name, indexes,
+                                  sum(report['rows_out'] for report in self.file_reports))
+                conn.close()
+            self.rows_merged = self.merge(staging_dbs, schema)
+            merged_seconds = time.perf_counter() - start
+            if indexes or self.analyze:
+                finish_load(self.db_name, indexes, self.analyze)
+            wall_seconds = time.perf_counter() - start
+            logging.info(f"Multi-source ETL loaded {len(self.csv_files)} files in {wall_seconds:.3f}s "
+                         f"(ingest {ingest_seconds:.3f}s, merge {merged_seconds - ingest_seconds:.3f}s, "
+                         f"indexes {wall_seconds - merged_seconds:.3f}s)")
+            if self.metrics_report:
+                with open(self.metrics_report, 'w') as f:
+                    json.dump({'sources': self.csv_files, 'workers': self.workers, 'rows_merged': self.rows_merged,
+                               'ingest_seconds': round(ingest_seconds, 6),
+                               'merge_seconds': round(merged_seconds - ingest_seconds, 6),
+                               'index_seconds': round(wall_seconds - merged_seconds, 6),
+                               'wall_seconds': round(wall_seconds, 6), 'files': self.file_reports}, f, indent=2)
+            return self.rows_merged
+        except Exception as e:
+            logging.error(f"Multi-source ETL failed: {e}")
+            raise
+        finally:
+            if not self.keep_staging:
+                for path in self.staging_files:
+                    if os.path.exists(path):
+                        os.remove(path)
+                if created_dir:
+                    shutil.rmtree(self.staging_dir, ignore_errors=True)
+                    self.staging_dir = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest many healthcare CSV files in parallel through staging databases.")
+    parser.add_argument('sources', help="Glob pattern or directory of CSV files")
+    parser.add_argument('--db', default='healthcare.db')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--staging-dir', default=None)
+    parser.add_argument('--keep-staging', action='store_true')
+    parser.add_argument('--etl', choices=['chunked', 'cleaning'], default='chunked',
+                        help="Single-file ETL run on each source file")
+    parser.add_argument('--chunksize', type=int, default=10000)
+    parser.add_argument('--bulk-load', action='store_true')
+    parser.add_argument('--indexes', action='store_true', help="Build the query indexes and ANALYZE after the merge")
+    args = parser.parse_args()
+    etl = MultiSourceETL(args.sources, db_name=args.db, workers=args.workers, staging_dir=args.staging_dir,
+                         keep_staging=args.keep_staging,
+                         etl_class=CleaningETL if args.etl == 'cleaning' else HealthcareETL,
+                         chunksize=args.chunksize, bulk_load=args.bulk_load,
+                         indexes=args.indexes, analyze=args.indexes)
+    etl.run()
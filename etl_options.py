@@ -0,0 +1,67 @@
+from etl_extract_backends import EXTRACT_BACKENDS
+from etl_storage import FACT_TABLE
+
+STORAGE_MODES = ('table', 'encoded')
+DATE_STORAGE_MODES = ('text', 'days')
+
+
+class EtlOptions:
+    """Run options shared by both HealthcareETL classes, which also take them as keywords.
+
+    - workers, prefetch: transform processes, and chunks a reader thread prefetches for them
+    - bulk_load, commit_every, on_conflict: BulkLoader commits; existing record_ids are updated or ignored
+    - resume, source_complete: checkpoint each chunk so later runs only read rows appended since;
+      an unfinished last line is only loaded once its newline arrives, or at once if source_complete
+    - global_dedup, dedup_spill_db, dedup_memory_keys: drop rows seen in earlier chunks
+    - global_imputation: fill missing values from a first pass over the whole file
+    - extract_backend, memory_budget, compact_dtypes: CSV parser, per-chunk memory target, compact dtypes
+    - storage, date_storage: 'encoded' dimension keys and 'days' day-number dates behind the healthcare view
+    - validation_rules, on_invalid: rules (None for the ETL's own) and an action overriding them all
+    - indexes, analyze: indexes built (True for HEALTHCARE_INDEXES) and ANALYZE run after the load
+    - metrics_report, metrics_table: JSON report file and etl_runs rows of the run metrics
+    """
+
+    def __init__(self, workers=1, prefetch=2, bulk_load=False, commit_every=10, on_conflict='update',
+                 resume=False, source_complete=False, global_dedup=False, dedup_spill_db=None, dedup_memory_keys=10_000_000,
+                 global_imputation=False, extract_backend='pandas', memory_budget=None, compact_dtypes=False,
+                 storage='table', date_storage='text', validation_rules=None, on_invalid=None,
+                 indexes=None, analyze=False, metrics_report=None, metrics_table=False):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unsupported storage mode: {storage}")
+        if date_storage not in DATE_STORAGE_MODES:
+            raise ValueError(f"Unsupported date storage: {date_storage}")
+        if extract_backend != 'auto' and extract_backend not in EXTRACT_BACKENDS:
+            raise ValueError(f"Unknown extract backend: {extract_backend}")
+        self.workers = workers
+        self.prefetch = prefetch
+        self.bulk_load = bulk_load
+        self.commit_every = commit_every
+        self.on_conflict = on_conflict
+        self.resume = resume
+        self.source_complete = source_complete
+        self.global_dedup = global_dedup
+        self.dedup_spill_db = dedup_spill_db
+        self.dedup_memory_keys = dedup_memory_keys
+        self.global_imputation = global_imputation
+        self.extract_backend = extract_backend
+        self.memory_budget = memory_budget
+        self.compact_dtypes = compact_dtypes
+        self.storage = storage
+        self.date_storage = date_storage
+        self.validation_rules = validation_rules
+        self.on_invalid = on_invalid
+        self.indexes = indexes
+        self.analyze = analyze
+        self.metrics_report = metrics_report
+        self.metrics_table = metrics_table
+
+    def replace(self, **changes):
+        """Return a copy with some options changed."""
+        return EtlOptions(**{**vars(self), **changes})
+
+    def stored_table(self):
+        """Return the table the rows are written to: the fact table behind the view, or healthcare itself."""
+        return FACT_TABLE if self.storage == 'encoded' or self.date_storage == 'days' else 'healthcare'
+
+    def __repr__(self):
+        return f"EtlOptions({', '.join(f'{name}={value!r}' for name, value in vars(self).items())})"
@@ -0,0 +1,119 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+_END_OF_CHUNKS = object()
+
+# Workers are not forked from the writer: its reader thread may hold the logging, queue or pandas locks
+WORKER_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+# The object whose method a worker runs, sent once per worker by the pool initializer
+_worker_owner = None
+
+
+def _init_worker(owner):
+    global _worker_owner
+    _worker_owner = owner
+
+
+def _call_worker_method(name, chunk):
+    return getattr(_worker_owner, name)(chunk)
+
+
+class _ReaderFailure:
+    """Carries an exception raised by the reader thread over to the writer."""
+    def __init__(self, error):
+        self.error = error
+
+
+def _read_ahead(chunks, chunk_queue, stop_event):
+    """Reader thread: pull chunks from the iterator into the bounded queue."""
+    try:
+        for chunk in chunks:
+            while not stop_event.is_set():
+                try:
+                    chunk_queue.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stop_event.is_set():
+                return
+        item = _END_OF_CHUNKS
+    except Exception as e:
+        item = _ReaderFailure(e)
+    while not stop_event.is_set():
+        try:
+            chunk_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def run_pipelined(transform, chunks, load, workers=None, prefetch=2):
+    """Run read -> transform -> load as a pipeline and return the number of records loaded.
+
+    A reader thread prefetches up to `prefetch` chunks, a pool of `workers` processes
+    runs `transform` on them in parallel, and the calling thread is the single writer
+    that passes results to `load` in the original chunk order. At most
+    `workers + prefetch` transformed chunks are in flight, so memory stays bounded.
+    Items may also be (chunk, checkpoint) pairs; the checkpoint stays in the writer and
+    is passed on as load(transformed_chunk, checkpoint). If `transform` is a bound method,
+    its object is sent to each worker once, so caches it fills last for the whole run.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers + prefetch
+    chunk_queue = queue.Queue(maxsize=prefetch)
+    stop_event = threading.Event()
+    reader = threading.Thread(target=_read_ahead, args=(chunks, chunk_queue, stop_event), daemon=True)
+    reader.start()
+    logging.info(f"Started pipelined run with {workers} transform workers and prefetch {prefetch}")
+
+    pending = deque()
+    total_records = 0
+    exhausted = False
+    mp_context = multiprocessing.get_context(WORKER_START_METHOD)
+    owner = getattr(transform, '__self__', None)
+    if owner is not None:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                                   initializer=_init_worker, initargs=(owner,))
+        submit = lambda chunk: pool.submit(_call_worker_method, transform.__name__, chunk)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+        submit = lambda chunk: pool.submit(transform, chunk)
+    try:
+        while True:
+            # Keep the pool busy, but only block on the reader when nothing is left to load
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    item = chunk_queue.get(block=not pending)
+                except queue.Empty:
+                    break
+                if item is _END_OF_CHUNKS:
+                    exhausted = True
+                elif isinstance(item, _ReaderFailure):
+                    raise item.error
+                elif isinstance(item, tuple):
+                    chunk, checkpoint = item
+                    pending.append((submit(chunk), checkpoint))
+                else:
+                    pending.append((submit(item), None))
+            if not pending:
+                break
+            future, checkpoint = pending.popleft()
+            transformed_chunk = future.result()
+            if checkpoint is None:
+                load(transformed_chunk)
+            else:
+                load(transformed_chunk, checkpoint)
+            total_records += len(transformed_chunk)
+            logging.info(f"Pipeline loaded chunk. Total records processed: {total_records}")
+    finally:
+        stop_event.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        reader.join()
+    return total_records
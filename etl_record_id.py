@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+# Columns that identify one admission; rows with the same values get the same record_id
+BUSINESS_KEY = ['name', 'age', 'date_of_admission', 'doctor', 'hospital']
+
+_HEX_DIGITS = np.array([f'{i:02x}' for i in range(256)], dtype='S2')
+
+
+def business_key_hashes(chunk, key=BUSINESS_KEY):
+    """Return a stable 64-bit hash of each row's business key."""
+    columns = {}
+    for col in key:
+        values = chunk[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            # Hash every integer width the same way so dtype changes do not change ids
+            values = values.astype('Int64') if pd.api.types.is_integer_dtype(values) else values.astype('float64')
+        columns[col] = values
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+
+def business_key_ids(chunk, key=BUSINESS_KEY):
+    """Return deterministic record ids (16 hex digits) computed from the business key."""
+    if chunk.empty:
+        return np.array([], dtype=object)
+    hashes = business_key_hashes(chunk, key).astype('>u8')
+    hex_pairs = _HEX_DIGITS[hashes.view(np.uint8).reshape(-1, 8)]
+    return hex_pairs.view('S16').ravel().astype(str).astype(object)
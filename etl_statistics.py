@@ -0,0 +1,160 @@
+import logging
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch (KLL-style compactors) over a stream of numbers.
+
+    Exact while fewer than `k` values have been added; after that each level keeps
+    fewer than `k` items, each standing for 2**level original values. The result
+    depends only on the sequence of values, not on how they were split into updates.
+    """
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Add an array of values; NaNs are ignored."""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        # Fill level 0 in fixed-size steps so the sketch depends only on the values, not on how they were chunked
+        while len(values):
+            room = self.k - len(self.levels[0])
+            self.levels[0] = np.concatenate([self.levels[0], values[:room]])
+            values = values[room:]
+            if len(self.levels[0]) >= self.k:
+                self.compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.compress()
+
+    def compress(self):
+        """Halve every level holding k or more items, promoting half of them a level up."""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self.k:
+                items = np.sort(items)
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                even = items[:len(items) - len(keep)]
+                promoted = even[self.rng.integers(2)::2]
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        """Return the estimated q-quantile, or NaN if nothing was added."""
+        if self.count == 0:
+            return float('nan')
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items)
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(items[order][min(position, len(items) - 1)])
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+class FrequencyCounter:
+    """Mergeable value counter for modes (Misra-Gries heavy hitters beyond `capacity` values).
+
+    Exact while a column has at most `capacity` distinct values; beyond that the
+    most frequent value is still found whenever it occurs often enough to matter.
+    """
+
+    def __init__(self, capacity=100_000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+
+    def update(self, values):
+        """Count a Series of values; NaNs are ignored."""
+        self.merge_counts(values.value_counts())
+
+    def merge(self, other):
+        self.merge_counts(other.counts)
+
+    def merge_counts(self, counts):
+        self.counts = self.counts.add(counts, fill_value=0).astype('int64')
+        if len(self.counts) > self.capacity:
+            threshold = self.counts.nlargest(self.capacity + 1).iloc[-1]
+            self.counts = self.counts[self.counts > threshold] - threshold
+
+    def mode(self, default='Unknown'):
+        """Return the most frequent value (smallest value on ties, like Series.mode)."""
+        if self.counts.empty:
+            return default
+        top = self.counts[self.counts == self.counts.max()]
+        return top.index.sort_values()[0]
+
+
+class ImputationStatistics:
+    """Dataset-wide medians (numeric and date columns) and modes (categorical columns)."""
+
+    def __init__(self, numeric_columns=(), date_columns=(), categorical_columns=()):
+        self.numeric_columns = list(numeric_columns)
+        self.date_columns = list(date_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.sketches = {col: QuantileSketch() for col in self.numeric_columns + self.date_columns}
+        self.counters = {col: FrequencyCounter() for col in self.categorical_columns}
+        self.rows = 0
+
+    def update(self, chunk):
+        """Add a chunk whose columns use the database (snake_case) names."""
+        for col in self.numeric_columns:
+            self.sketches[col].update(pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan))
+        for col in self.date_columns:
+            # Day numbers keep the sketch values exact in float64
+            dates = pd.to_datetime(chunk[col], errors='coerce')
+            self.sketches[col].update(dates[dates.notna()].astype('int64').to_numpy() / 86_400_000_000_000)
+        for col in self.categorical_columns:
+            self.counters[col].update(chunk[col])
+        self.rows += len(chunk)
+
+    def merge(self, other):
+        for col, sketch in other.sketches.items():
+            self.sketches[col].merge(sketch)
+        for col, counter in other.counters.items():
+            self.counters[col].merge(counter)
+        self.rows += other.rows
+
+    def values(self):
+        """Return the fill value for every tracked column."""
+        fill_values = {}
+        for col in self.numeric_columns:
+            fill_values[col] = self.sketches[col].median()
+        for col in self.date_columns:
+            median = self.sketches[col].median()
+            fill_values[col] = pd.NaT if np.isnan(median) else pd.Timestamp(median, unit='D')
+        for col in self.categorical_columns:
+            fill_values[col] = self.counters[col].mode()
+        return fill_values
+
+
+def compute_imputation_values(chunks, numeric_columns=(), date_columns=(), categorical_columns=()):
+    """Stream over raw CSV chunks once and return dataset-wide imputation values."""
+    stats = ImputationStatistics(numeric_columns, date_columns, categorical_columns)
+    for chunk in chunks:
+        chunk.columns = [col.lower().replace(' ', '_') for col in chunk.columns]
+        stats.update(chunk)
+    fill_values = stats.values()
+    logging.info(f"Computed imputation values over {stats.rows} rows: {fill_values}")
+    return fill_values
@@ -0,0 +1,140 @@
+import logging
+import pandas as pd
+
+# Low-cardinality text columns stored as integer keys into dim_<column> tables
+DIMENSION_COLUMNS = ['hospital', 'doctor', 'insurance_provider', 'medication',
+                     'admission_type', 'blood_type', 'gender', 'test_results']
+
+FACT_TABLE = 'healthcare_fact'
+
+# Column order of the healthcare table, which the compatibility view reproduces
+HEALTHCARE_COLUMNS = [
+    ('record_id', 'TEXT PRIMARY KEY'),
+    ('name', 'TEXT'),
+    ('age', 'INTEGER'),
+    ('gender', 'TEXT'),
+    ('blood_type', 'TEXT'),
+    ('medical_condition', 'TEXT'),
+    ('date_of_admission', 'DATETIME'),
+    ('doctor', 'TEXT'),
+    ('hospital', 'TEXT'),
+    ('insurance_provider', 'TEXT'),
+    ('billing_amount', 'FLOAT'),
+    ('room_number', 'INTEGER'),
+    ('admission_type', 'TEXT'),
+    ('discharge_date', 'DATETIME'),
+    ('medication', 'TEXT'),
+    ('test_results', 'TEXT')
+]
+
+
+def table_exists(conn, name, kind='table'):
+    """Return True if a table (or view) with this name exists."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)).fetchone()
+    return row is not None
+
+
+def create_encoded_schema(conn, dimension_columns=DIMENSION_COLUMNS, day_date_columns=()):
+    """Create the dimension tables, the integer-keyed fact table and the healthcare view.
+
+    Columns in `day_date_columns` are stored as INTEGER day numbers since 1970-01-01
+    and exposed by the view in the 'YYYY-MM-DD HH:MM:SS' text format of the plain table.
+    """
+    if table_exists(conn, 'healthcare'):
+        raise ValueError("A plain healthcare table already exists; encoded storage needs a fresh database")
+    for col in dimension_columns:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS dim_{col} (
+                id INTEGER PRIMARY KEY,
+                value TEXT NOT NULL UNIQUE
+            )
+        ''')
+    fact_columns = []
+    for col, col_type in HEALTHCARE_COLUMNS:
+        if col in dimension_columns:
+            fact_columns.append(f"{col}_id INTEGER REFERENCES dim_{col}(id)")
+        elif col in day_date_columns:
+            fact_columns.append(f"{col} INTEGER")
+        else:
+            fact_columns.append(f"{col} {col_type}")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {FACT_TABLE} ({', '.join(fact_columns)})")
+
+    # Scalar subqueries rather than LEFT JOINs: SQLite only looks up the dimensions a query reads,
+    # while it probes every LEFT JOIN for aggregates. Aggregates over dimensions run faster on the
+    # integer keys, as written by keyed_aggregate_sql.
+    view_columns = []
+    for col, _ in HEALTHCARE_COLUMNS:
+        if col in dimension_columns:
+            view_columns.append(f"(SELECT value FROM dim_{col} WHERE id = f.{col}_id) AS {col}")
+        elif col in day_date_columns:
+            view_columns.append(f"datetime(f.{col} * 86400, 'unixepoch') AS {col}")
+        else:
+            view_columns.append(f"f.{col}")
+    conn.execute(f'''
+        CREATE VIEW IF NOT EXISTS healthcare AS
+        SELECT {', '.join(view_columns)}
+        FROM {FACT_TABLE} f
+    ''')
+    conn.commit()
+    logging.info("Encoded healthcare schema (dimension tables, fact table and view) created or already exists.")
+
+
+def keyed_aggregate_sql(group_columns, aggregates, filters=None, dimension_columns=DIMENSION_COLUMNS):
+    """Return (sql, params) aggregating the fact table per group on dimension keys instead of text.
+
+    `aggregates` maps result names to SQL expressions over fact columns; `filters` maps
+    columns to values, each dimension value looked up once as its key. Dimension tables
+    are joined only to label the aggregated rows.
+    """
+    filters = filters or {}
+    keys = [f"{col}_id" if col in dimension_columns else col for col in group_columns]
+    conditions = [f"{col}_id = (SELECT id FROM dim_{col} WHERE value = ?)" if col in dimension_columns
+                  else f"{col} = ?" for col in filters]
+    inner = f"SELECT {', '.join(keys + [f'{expr} AS {name}' for name, expr in aggregates.items()])} FROM {FACT_TABLE}"
+    if conditions:
+        inner += f" WHERE {' AND '.join(conditions)}"
+    if keys:
+        inner += f" GROUP BY {', '.join(keys)}"
+    labels = [f"dim_{col}.value AS {col}" if col in dimension_columns else f"c.{col}" for col in group_columns]
+    joins = [f"LEFT JOIN dim_{col} ON dim_{col}.id = c.{col}_id" for col in group_columns if col in dimension_columns]
+    sql = f"SELECT {', '.join(labels + [f'c.{name}' for name in aggregates])} FROM ({inner}) c {' '.join(joins)}"
+    return sql.strip(), tuple(filters.values())
+
+
+class DimensionEncoder:
+    """Replace dimension text columns with integer keys, adding new values to dim_<column> tables."""
+
+    def __init__(self, columns=DIMENSION_COLUMNS):
+        self.columns = list(columns)
+        self.ids = {col: None for col in self.columns}
+
+    def reset(self):
+        """Forget the cached ids; call when a transaction that may have added dimension rows rolls back."""
+        self.ids = {col: None for col in self.columns}
+
+    def load_ids(self, conn, col, after_id=0):
+        """Read the value -> id mapping of one dimension table (only ids above `after_id`)."""
+        rows = conn.execute(f"SELECT value, id FROM dim_{col} WHERE id > ?", (after_id,)).fetchall()
+        return pd.Series([row[1] for row in rows], index=[row[0] for row in rows], dtype='int64')
+
+    def encode(self, conn, chunk):
+        """Return the chunk with <column>_id keys in place of the dimension columns.
+
+        Must run on the connection that loads the chunk, so new dimension rows are
+        committed (or rolled back) together with the fact rows.
+        """
+        columns = {col: chunk[col] for col in chunk.columns if col not in self.columns}
+        for col in self.columns:
+            if self.ids[col] is None:
+                self.ids[col] = self.load_ids(conn, col)
+            values = chunk[col].astype(object).where(chunk[col].notna(), 'Unknown')
+            distinct = pd.Index(values.unique())
+            new_values = distinct[~distinct.isin(self.ids[col].index)]
+            if len(new_values):
+                # New rows get ids above the current maximum, so only those need reading back
+                last_id = int(self.ids[col].max()) if len(self.ids[col]) else 0
+                conn.executemany(f"INSERT OR IGNORE INTO dim_{col} (value) VALUES (?)",
+                                 ((value,) for value in new_values))
+                self.ids[col] = pd.concat([self.ids[col], self.load_ids(conn, col, last_id)])
+            columns[f"{col}_id"] = values.map(self.ids[col])
+        return pd.DataFrame(columns, index=chunk.index)
@@ -0,0 +1,180 @@
+import operator
+import sqlite3
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from etl_bulk_load import chunk_rows, upsert_sql
+from etl_storage import HEALTHCARE_COLUMNS
+
+REJECTS_TABLE = 'healthcare_rejects'
+
+# What happens to a row violating a rule: repaired in place, dropped, or moved to healthcare_rejects
+VALIDATION_ACTIONS = ('fix', 'drop', 'reject')
+
+# One bit per rule; the bitmask is stored in a signed 64-bit SQLite INTEGER
+MAX_RULES = 63
+
+COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+# Columns of healthcare_rejects: the healthcare columns, then the violations and when they were found
+REJECT_COLUMNS = [col for col, _ in HEALTHCARE_COLUMNS] + ['violations', 'violated_rules', 'rejected_at']
+
+
+def create_rejects_table(conn):
+    columns = [f"{col} {col_type}" for col, col_type in HEALTHCARE_COLUMNS]
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {REJECTS_TABLE} (
+            {', '.join(columns)},
+            violations INTEGER,
+            violated_rules TEXT,
+            rejected_at DATETIME
+        )
+    ''')
+
+
+class Rule:
+    """A declarative integrity rule: a row violates it when `column <op> bound` is true.
+
+    The bound is the scalar `value` or, with `other`, the same row's value of another
+    column. With fix='bound' a violating value is replaced by the bound (plus `fix_offset`),
+    with fix='median' by the column median. `action` says whether violating rows are
+    fixed, dropped, or rejected into healthcare_rejects.
+    """
+
+    def __init__(self, name, column, op, value=None, other=None, action='fix', fix='bound', fix_offset=None):
+        if op not in COMPARISONS:
+            raise ValueError(f"Unsupported comparison in rule {name}: {op}")
+        if action not in VALIDATION_ACTIONS:
+            raise ValueError(f"Unsupported action in rule {name}: {action}")
+        if fix not in ('bound', 'median'):
+            raise ValueError(f"Unsupported fix in rule {name}: {fix}")
+        if (value is None) == (other is None):
+            raise ValueError(f"Rule {name} needs exactly one of value and other")
+        self.name = name
+        self.column = column
+        self.op = op
+        self.value = value
+        self.other = other
+        self.action = action
+        self.fix = fix
+        self.fix_offset = fix_offset
+
+    def bound(self, chunk):
+        return chunk[self.other] if self.other is not None else self.value
+
+    def check(self, chunk):
+        """Return a boolean array of the rows violating the rule; missing values never violate it."""
+        violations = COMPARISONS[self.op](chunk[self.column], self.bound(chunk))
+        return violations.to_numpy(dtype=bool, na_value=False)
+
+    def repair(self, chunk, rows, median):
+        """Replace the violating values of `rows` (a boolean array) in place."""
+        if self.fix == 'median':
+            value = median(chunk, self.column)
+            if pd.api.types.is_integer_dtype(chunk[self.column]):
+                # An integer column cannot hold a median like 53.5
+                value = round(value)
+        else:
+            value = self.bound(chunk)
+            if self.fix_offset is not None:
+                value = value + self.fix_offset
+        chunk.loc[rows, self.column] = value
+
+    def __repr__(self):
+        bound = self.other if self.other is not None else repr(self.value)
+        return f"Rule({self.name!r}: {self.column} {self.op} {bound} -> {self.action})"
+
+
+class ValidationEngine:
+    """Evaluate a list of rules over a chunk in one pass into a per-row violation bitmask.
+
+    Rule i sets bit i. Every rule is a single vectorized comparison OR-ed into one uint64
+    array, so a chunk without violations costs one comparison per rule and nothing else;
+    fixes only touch violating rows, and dropped and rejected rows leave the chunk in a
+    single take. `on_invalid` overrides the action of every rule.
+    """
+
+    def __init__(self, rules, on_invalid=None):
+        if on_invalid is not None and on_invalid not in VALIDATION_ACTIONS:
+            raise ValueError(f"Unsupported on_invalid value: {on_invalid}")
+        if len(rules) > MAX_RULES:
+            raise ValueError(f"At most {MAX_RULES} validation rules are supported, got {len(rules)}")
+        self.rules = list(rules)
+        self.actions = [on_invalid or rule.action for rule in self.rules]
+        self.bits = [np.uint64(1 << bit) for bit in range(len(self.rules))]
+        self.removed_bits = np.uint64(sum(1 << bit for bit, action in enumerate(self.actions) if action != 'fix'))
+        self.reject_bits = np.uint64(sum(1 << bit for bit, action in enumerate(self.actions) if action == 'reject'))
+
+    @property
+    def rejects(self):
+        """True if any rule moves rows to healthcare_rejects."""
+        return bool(self.reject_bits)
+
+    def evaluate(self, chunk):
+        """Return the uint64 violation bitmask of every row."""
+        violations = np.zeros(len(chunk), dtype=np.uint64)
+        for rule, bit in zip(self.rules, self.bits):
+            np.bitwise_or(violations, bit, out=violations, where=rule.check(chunk))
+        return violations
+
+    def rule_names(self, violations):
+        """Return the comma-separated names of the rules set in a bitmask."""
+        return ','.join(rule.name for rule, bit in zip(self.rules, self.bits) if int(violations) & int(bit))
+
+    def apply(self, chunk, median):
+        """Validate a chunk; return the valid (and fixed) rows and the rejected rows, or None.
+
+        `median(chunk, column)` supplies the value used by fix='median' rules. Rejected
+        rows keep their original values and get violations / violated_rules columns.
+        """
+        violations = self.evaluate(chunk)
+        if not violations.any():
+            return chunk, None
+        removed = (violations & self.removed_bits) != 0
+        for rule, bit, action in zip(self.rules, self.bits, self.actions):
+            rows = (violations & bit) != 0
+            count = int(np.count_nonzero(rows))
+            if not count:
+                continue
+            logging.warning(f"{count} rows in chunk violate {rule.name}; action: {action}")
+            if action == 'fix':
+                rows &= ~removed
+                if rows.any():
+                    rule.repair(chunk, rows, median)
+
+        rejects = None
+        rejected = (violations & self.reject_bits) != 0
+        if rejected.any():
+            rejects = chunk.take(np.flatnonzero(rejected))
+            rejects['violations'] = violations[rejected].astype(np.int64)
+            masks = pd.Series(rejects['violations'].unique())
+            rejects['violated_rules'] = rejects['violations'].map(
+                pd.Series(masks.map(self.rule_names).to_numpy(), index=masks.to_numpy()))
+        if removed.any():
+            chunk = chunk.take(np.flatnonzero(~removed))
+            logging.info(f"Removed {int(np.count_nonzero(removed))} invalid rows from chunk")
+        return chunk, rejects
+
+
+def save_rejects(conn, rejects):
+    """Write rejected rows to healthcare_rejects; a row rejected again replaces the earlier one."""
+    if rejects is None or rejects.empty:
+        return 0
+    rejects = rejects[[col for col in REJECT_COLUMNS if col in rejects.columns]]
+    rejects = rejects.assign(rejected_at=datetime.now().isoformat(timespec='seconds'))
+    try:
+        create_rejects_table(conn)
+        conn.executemany(upsert_sql(REJECTS_TABLE, list(rejects.columns)), chunk_rows(rejects))
+        logging.info(f"Rejected {len(rejects)} records into {REJECTS_TABLE}")
+        return len(rejects)
+    except sqlite3.Error as e:
+        logging.error(f"Saving rejected records failed: {e}")
+        raise
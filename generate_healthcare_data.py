@@ -0,0 +1,314 @@
+import argparse
+import bz2
+import gzip
+import lzma
+import time
+import logging
+from datetime import date, timedelta
+import numpy as np
+from etl_compression import COMPRESSION_EXTENSIONS
+from etl_pipeline import run_pipelined
+
+HEADER = ('Name,Age,Gender,Blood Type,Medical Condition,Date of Admission,Doctor,Hospital,Insurance Provider,'
+          'Billing Amount,Room Number,Admission Type,Discharge Date,Medication,Test Results')
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Christopher', 'Karen',
+    'Charles', 'Lisa', 'Daniel', 'Nancy', 'Matthew', 'Betty', 'Anthony', 'Sandra', 'Mark', 'Margaret',
+    'Donald', 'Ashley', 'Steven', 'Kimberly', 'Andrew', 'Emily', 'Paul', 'Donna', 'Joshua', 'Michelle',
+    'Kenneth', 'Carol', 'Kevin', 'Amanda', 'Brian', 'Melissa', 'George', 'Deborah', 'Timothy', 'Stephanie',
+    'Ronald', 'Rebecca', 'Jason', 'Sharon', 'Edward', 'Laura', 'Jeffrey', 'Cynthia', 'Ryan', 'Dorothy',
+    'Jacob', 'Amy', 'Gary', 'Kathleen', 'Nicholas', 'Angela', 'Eric', 'Shirley', 'Jonathan', 'Emma',
+    'Stephen', 'Brenda', 'Larry', 'Pamela', 'Justin', 'Nicole', 'Scott', 'Anna', 'Brandon', 'Samantha',
+    'Benjamin', 'Katherine', 'Samuel', 'Christine', 'Gregory', 'Debra', 'Alexander', 'Rachel', 'Patrick', 'Carolyn',
+    'Frank', 'Janet', 'Raymond', 'Maria', 'Jack', 'Olivia', 'Dennis', 'Heather', 'Jerry', 'Helen',
+    'Tyler', 'Catherine', 'Aaron', 'Diane', 'Jose', 'Julie', 'Adam', 'Victoria', 'Nathan', 'Joyce',
+    'Henry', 'Lauren', 'Zachary', 'Kelly', 'Douglas', 'Christina', 'Peter', 'Ruth', 'Kyle', 'Joan',
+    'Noah', 'Virginia', 'Ethan', 'Judith', 'Jeremy', 'Evelyn', 'Christian', 'Hannah', 'Walter', 'Andrea',
+    'Keith', 'Megan', 'Austin', 'Cheryl', 'Roger', 'Jacqueline', 'Terry', 'Madison', 'Sean', 'Teresa',
+    'Gerald', 'Abigail', 'Carl', 'Sophia', 'Dylan', 'Martha', 'Harold', 'Sara', 'Jordan', 'Gloria',
+    'Jesse', 'Janice', 'Bryan', 'Kathryn', 'Lawrence', 'Ann', 'Arthur', 'Isabella', 'Gabriel', 'Judy',
+    'Bruce', 'Charlotte', 'Logan', 'Julia', 'Billy', 'Grace', 'Joe', 'Amber', 'Alan', 'Alice',
+    'Juan', 'Jean', 'Elijah', 'Denise', 'Willie', 'Frances', 'Albert', 'Danielle', 'Wayne', 'Marilyn',
+    'Randy', 'Natalie', 'Mason', 'Beverly', 'Vincent', 'Diana', 'Liam', 'Brittany', 'Roy', 'Theresa',
+    'Bobby', 'Kayla', 'Caleb', 'Alexis', 'Bradley', 'Doris', 'Russell', 'Lori', 'Lucas', 'Tiffany'
+]
+
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+    'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores',
+    'Green', 'Adams', 'Nelson', 'Baker', 'Hall', 'Rivera', 'Campbell', 'Mitchell', 'Carter', 'Roberts',
+    'Gomez', 'Phillips', 'Evans', 'Turner', 'Diaz', 'Parker', 'Cruz', 'Edwards', 'Collins', 'Reyes',
+    'Stewart', 'Morris', 'Morales', 'Murphy', 'Cook', 'Rogers', 'Gutierrez', 'Ortiz', 'Morgan', 'Cooper',
+    'Peterson', 'Bailey', 'Reed', 'Kelly', 'Howard', 'Ramos', 'Kim', 'Cox', 'Ward', 'Richardson',
+    'Watson', 'Brooks', 'Chavez', 'Wood', 'James', 'Bennett', 'Gray', 'Mendoza', 'Ruiz', 'Hughes',
+    'Price', 'Alvarez', 'Castillo', 'Sanders', 'Patel', 'Myers', 'Long', 'Ross', 'Foster', 'Jimenez',
+    'Powell', 'Jenkins', 'Perry', 'Russell', 'Sullivan', 'Bell', 'Coleman', 'Butler', 'Henderson', 'Barnes',
+    'Gonzales', 'Fisher', 'Vasquez', 'Simmons', 'Romero', 'Jordan', 'Patterson', 'Alexander', 'Hamilton', 'Graham',
+    'Reynolds', 'Griffin', 'Wallace', 'Moreno', 'West', 'Cole', 'Hayes', 'Bryant', 'Herrera', 'Gibson',
+    'Ellis', 'Tran', 'Medina', 'Aguilar', 'Stevens', 'Murray', 'Ford', 'Castro', 'Marshall', 'Owens',
+    'Harrison', 'Fernandez', 'Mcdonald', 'Woods', 'Washington', 'Kennedy', 'Wells', 'Vargas', 'Henry', 'Chen',
+    'Freeman', 'Webb', 'Tucker', 'Guzman', 'Burns', 'Crawford', 'Olson', 'Simpson', 'Porter', 'Hunter',
+    'Gordon', 'Mendez', 'Silva', 'Shaw', 'Snyder', 'Mason', 'Dixon', 'Munoz', 'Hunt', 'Hicks',
+    'Holmes', 'Palmer', 'Wagner', 'Black', 'Robertson', 'Boyd', 'Rose', 'Stone', 'Salazar', 'Fox',
+    'Warren', 'Mills', 'Meyer', 'Rice', 'Schmidt', 'Garza', 'Daniels', 'Ferguson', 'Nichols', 'Stephens',
+    'Soto', 'Weaver', 'Ryan', 'Gardner', 'Payne', 'Grant', 'Dunn', 'Kelley', 'Spencer', 'Hawkins'
+]
+
+# Hospital name patterns, as in the sample dataset ('Smith PLC', 'Burke, Griffin and Cooper', ...)
+HOSPITAL_PATTERNS = ['{0} PLC', '{0} Inc', '{0} LLC', '{0} Ltd', '{0} Group', '{0} and Sons',
+                     '{0}-{1}', '{0} {1}', '{0}, {1} and {2}']
+
+GENDERS = ['Male', 'Female']
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+MEDICAL_CONDITIONS = ['Arthritis', 'Asthma', 'Cancer', 'Diabetes', 'Hypertension', 'Obesity']
+INSURANCE_PROVIDERS = ['Aetna', 'Blue Cross', 'Cigna', 'Medicare', 'UnitedHealthcare']
+ADMISSION_TYPES = ['Elective', 'Emergency', 'Urgent']
+MEDICATIONS = ['Aspirin', 'Ibuprofen', 'Lipitor', 'Paracetamol', 'Penicillin']
+TEST_RESULTS = ['Abnormal', 'Inconclusive', 'Normal']
+
+# Values written in place of a date by bad_date_rate
+BAD_DATES = ['31-02-2023', '00-01-2022', '2023-13-45', '32-12-2021', 'not a date', '15/05/2023']
+
+# Value ranges of the sample dataset
+AGE_RANGE = (18, 85)
+ROOM_RANGE = (101, 500)
+BILLING_RANGE = (1000, 50000)
+ADMISSION_DATES = (date(2018, 10, 30), date(2023, 10, 30))
+MAX_STAY_DAYS = 30
+
+# Rows generated per block; each block has its own random stream
+BLOCK_ROWS = 100_000
+
+# Preformatted value pools, built once per process for each (seed, doctors, hospitals)
+POOL_ATTRIBUTES = ('names', 'doctors', 'hospitals', 'ages', 'rooms', 'billing_units', 'billing_fractions',
+                   'admission_days', 'dates', 'categories', 'bad_dates')
+POOL_CACHE = {}
+
+
+def text_pool(values):
+    return np.array(values, dtype=object)
+
+
+def number_pool(start, stop):
+    """Decimal text of the integers in [start, stop), indexed from 0."""
+    return text_pool([str(i) for i in range(start, stop)])
+
+
+def skewed_choice(rng, size, n, skew):
+    """Draw `size` indices in [0, n) with probability proportional to (rank + 1) ** -skew."""
+    if skew == 0:
+        return rng.integers(0, n, size)
+    weights = np.arange(1, n + 1, dtype='float64') ** -skew
+    cumulative = np.cumsum(weights)
+    return np.minimum(np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side='right'), n - 1)
+
+
+def open_output(path):
+    """Open the output CSV for binary writing, compressed if it ends in .gz, .bz2 or .xz."""
+    compression = next((c for ext, c in COMPRESSION_EXTENSIONS.items() if path.lower().endswith(ext)), None)
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == 'bz2':
+        return bz2.open(path, 'wb')
+    if compression == 'xz':
+        return lzma.open(path, 'wb')
+    return open(path, 'wb')
+
+
+class SyntheticDataGenerator:
+    """Generate healthcare CSV rows with the schema and formats of healthcare_dataset.csv.
+
+    Rows are produced in blocks of `block_rows`. Block i draws from a random stream
+    seeded by (seed, i), so the output depends only on the seed, the row count and
+    block_rows, not on how many workers generate it. Every field is a lookup into a
+    pool of preformatted text indexed by vectorized NumPy draws, so the only per-row
+    Python work is joining the fields. Doctors and hospitals come from pools of
+    `doctors` and `hospitals` names, drawn with a power-law `skew` so a few are busy.
+
+    Rates make the data dirty: duplicate_rate rows repeat an earlier row of the block,
+    null_rate empties fields, bad_date_rate writes unparseable dates and
+    negative_billing_rate negates billing amounts.
+    """
+
+    def __init__(self, seed=0, doctors=40_000, hospitals=6_000, skew=0.6, duplicate_rate=0.0, null_rate=0.0,
+                 bad_date_rate=0.0, negative_billing_rate=0.0, block_rows=BLOCK_ROWS):
+        for name, rate in (('duplicate_rate', duplicate_rate), ('null_rate', null_rate),
+                           ('bad_date_rate', bad_date_rate), ('negative_billing_rate', negative_billing_rate)):
+            if not 0 <= rate <= 1:
+                raise ValueError(f"{name} must be between 0 and 1, got {rate}")
+        self.seed = seed
+        self.skew = skew
+        self.duplicate_rate = duplicate_rate
+        self.null_rate = null_rate
+        self.bad_date_rate = bad_date_rate
+        self.negative_billing_rate = negative_billing_rate
+        self.block_rows = block_rows
+        self.rows = 0
+        self.doctor_count = doctors
+        self.hospital_count = hospitals
+        self.build_pools()
+
+    def __getstate__(self):
+        """Leave the pools out when sent to pipeline workers; each worker builds them once."""
+        return {key: value for key, value in self.__dict__.items() if key not in POOL_ATTRIBUTES}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.build_pools()
+
+    def build_pools(self):
+        """Preformat every value a field can take; names are drawn from the seed's own stream."""
+        key = (self.seed, self.doctor_count, self.hospital_count)
+        if key in POOL_CACHE:
+            self.__dict__.update(POOL_CACHE[key])
+            return
+        doctors, hospitals = self.doctor_count, self.hospital_count
+        rng = np.random.default_rng([self.seed, 2 ** 32])
+        first = text_pool(FIRST_NAMES)
+        last = text_pool(LAST_NAMES)
+        self.names = (first[:, None] + ' ' + last[None, :]).ravel()
+        self.doctors = first[rng.integers(0, len(first), doctors)] + ' ' + last[rng.integers(0, len(last), doctors)]
+        patterns = rng.integers(0, len(HOSPITAL_PATTERNS), hospitals)
+        parts = last[rng.integers(0, len(last), (hospitals, 3))]
+        self.hospitals = text_pool([self.quote(HOSPITAL_PATTERNS[p].format(*row)) for p, row in zip(patterns, parts)])
+        self.ages = number_pool(AGE_RANGE[0], AGE_RANGE[1] + 1)
+        self.rooms = number_pool(ROOM_RANGE[0], ROOM_RANGE[1] + 1)
+        self.billing_units = number_pool(*BILLING_RANGE)
+        self.billing_fractions = text_pool([f"{i:05d}" for i in range(100_000)])
+        first_day, last_day = ADMISSION_DATES
+        self.admission_days = (last_day - first_day).days + 1
+        self.dates = text_pool([(first_day + timedelta(days=i)).strftime('%d-%m-%Y')
+                                for i in range(self.admission_days + MAX_STAY_DAYS)])
+        self.categories = [text_pool(values) for values in (GENDERS, BLOOD_TYPES, MEDICAL_CONDITIONS,
+                                                            INSURANCE_PROVIDERS, ADMISSION_TYPES, MEDICATIONS,
+                                                            TEST_RESULTS)]
+        self.bad_dates = text_pool(BAD_DATES)
+        POOL_CACHE[key] = {attr: getattr(self, attr) for attr in POOL_ATTRIBUTES}
+
+    @staticmethod
+    def quote(value):
+        return f'"{value}"' if ',' in value or '"' in value else value
+
+    def duplicate_sources(self, rng, rows):
+        """Return, for every row, the index of the row whose values it takes (itself unless duplicated)."""
+        source = np.arange(rows)
+        duplicated = rng.random(rows) < self.duplicate_rate
+        duplicated[0] = False
+        # Each duplicate copies a random earlier row; follow chains back to an original row
+        source[duplicated] = (rng.random(int(duplicated.sum())) * np.flatnonzero(duplicated)).astype(np.int64)
+        while True:
+            followed = source[source]
+            if np.array_equal(followed, source):
+                return source
+            source = followed
+
+    def generate_columns(self, block, rows):
+        """Return the 15 fields of a block's rows as object arrays of CSV text, in header order."""
+        rng = np.random.default_rng([self.seed, block])
+        gender, blood_type, condition, insurance, admission_type, medication, test_results = (
+            pool[rng.integers(0, len(pool), rows)] for pool in self.categories)
+        admitted = rng.integers(0, self.admission_days, rows)
+        discharged = admitted + rng.integers(1, MAX_STAY_DAYS + 1, rows)
+        billing = (self.billing_units[rng.integers(0, len(self.billing_units), rows)] + '.'
+                   + self.billing_fractions[rng.integers(0, len(self.billing_fractions), rows)])
+        negative = rng.random(rows) < self.negative_billing_rate
+        billing[negative] = '-' + billing[negative]
+        columns = [
+            self.names[rng.integers(0, len(self.names), rows)],
+            self.ages[rng.integers(0, len(self.ages), rows)],
+            gender,
+            blood_type,
+            condition,
+            self.dates[admitted],
+            self.doctors[skewed_choice(rng, rows, len(self.doctors), self.skew)],
+            self.hospitals[skewed_choice(rng, rows, len(self.hospitals), self.skew)],
+            insurance,
+            billing,
+            self.rooms[rng.integers(0, len(self.rooms), rows)],
+            admission_type,
+            self.dates[discharged],
+            medication,
+            test_results
+        ]
+        for col in (5, 12):
+            bad = rng.random(rows) < self.bad_date_rate
+            columns[col][bad] = self.bad_dates[rng.integers(0, len(self.bad_dates), int(bad.sum()))]
+        if self.null_rate:
+            for values in columns:
+                values[rng.random(rows) < self.null_rate] = ''
+        if self.duplicate_rate:
+            source = self.duplicate_sources(rng, rows)
+            columns = [values[source] for values in columns]
+        return columns
+
+    def generate_block(self, block, rows=None):
+        """Return the CSV lines of a block as text."""
+        rows = self.block_rows if rows is None else rows
+        return ''.join([','.join(fields) + '\n' for fields in zip(*self.generate_columns(block, rows))])
+
+    def block_rows_of(self, block, rows):
+        """Return how many of `rows` total rows fall in a block."""
+        return min(self.block_rows, rows - block * self.block_rows)
+
+    def generate_job(self, block):
+        """Pipeline worker: generate a block of self.rows, as a list of lines so the pipeline counts rows."""
+        return self.generate_block(block, self.block_rows_of(block, self.rows)).splitlines(keepends=True)
+
+    def write(self, path, rows, workers=1, prefetch=2):
+        """Write `rows` rows (plus the header) to path, streaming one block at a time; return the seconds taken."""
+        start = time.perf_counter()
+        self.rows = rows
+        blocks = range(-(-rows // self.block_rows))
+        try:
+            with open_output(path) as out:
+                out.write((HEADER + '\n').encode('utf-8'))
+                if workers > 1:
+                    run_pipelined(self.generate_job, blocks,
+                                  lambda lines: out.write(''.join(lines).encode('utf-8')),
+                                  workers=workers, prefetch=prefetch)
+                else:
+                    for block in blocks:
+                        out.write(self.generate_block(block, self.block_rows_of(block, rows)).encode('utf-8'))
+        except OSError as e:
+            logging.error(f"Writing synthetic data to {path} failed: {e}")
+            raise
+        seconds = time.perf_counter() - start
+        logging.info(f"Generated {rows} rows into {path} in {seconds:.1f}s ({rows / max(seconds, 1e-9):.0f} rows/second)")
+        return seconds
+
+
+def generate_csv(path, rows, seed=0, workers=1, **options):
+    """Write a synthetic healthcare CSV of `rows` rows; see SyntheticDataGenerator for the options."""
+    return SyntheticDataGenerator(seed=seed, **options).write(path, rows, workers=workers)
+
+
+if __name__ == "__main__":
+    # Configure logging only when run as a script; spawned workers and importers keep their own log
+    logging.basicConfig(
+        filename='generate_healthcare_data.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Generate a synthetic healthcare CSV with the healthcare_dataset.csv schema.")
+    parser.add_argument('output', help="CSV path; .gz, .bz2 or .xz compresses it")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS)
+    parser.add_argument('--doctors', type=int, default=40_000)
+    parser.add_argument('--hospitals', type=int, default=6_000)
+    parser.add_argument('--skew', type=float, default=0.6, help="Power-law skew of doctor and hospital frequencies")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0)
+    parser.add_argument('--null-rate', type=float, default=0.0)
+    parser.add_argument('--bad-date-rate', type=float, default=0.0)
+    parser.add_argument('--negative-billing-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    seconds = generate_csv(args.output, args.rows, seed=args.seed, workers=args.workers, block_rows=args.block_rows,
+                           doctors=args.doctors, hospitals=args.hospitals, skew=args.skew,
+                           duplicate_rate=args.duplicate_rate, null_rate=args.null_rate,
+                           bad_date_rate=args.bad_date_rate, negative_billing_rate=args.negative_billing_rate)
+    print(f"Wrote {args.rows} rows to {args.output} in {seconds:.1f}s")
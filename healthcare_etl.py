@@ -1,11 +1,29 @@
+import argparse
 import pandas as pd
 import sqlite3
 import logging
+import time
 import numpy as np
 from datetime import datetime
 import re
-import uuid
 import csv
+from etl_pipeline import run_pipelined
+from etl_bulk_load import BulkLoader, upsert_method
+from etl_record_id import business_key_ids
+from etl_checkpoint import CheckpointStore, read_csv_resumable
+from etl_dedup import GlobalDeduplicator
+from etl_statistics import compute_imputation_values
+from etl_storage import DIMENSION_COLUMNS, FACT_TABLE, DimensionEncoder, create_encoded_schema
+from etl_dates import DB_DATE_COLUMNS, DateParser, store_dates_as_day_numbers
+from etl_metrics import EtlMetrics, estimate_rows, file_bytes
+from etl_compression import ReadProgress
+from etl_chunk_sizing import AdaptiveChunkSizer
+from etl_dtypes import compact_read_dtypes, downcast_integers, fill_missing, is_categorical, map_categories
+from etl_extract_backends import EXTRACT_BACKENDS, read_csv_chunks, select_backend
+from etl_validation import VALIDATION_ACTIONS, Rule, ValidationEngine, create_rejects_table, save_rejects
+from etl_indexes import defer_indexes, finish_load, resolve_indexes
+from etl_options import EtlOptions
+from query_cache import bump_data_version
 
 # Configure logging
 logging.basicConfig(
@@ -14,21 +32,126 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+VALID_GENDERS = ['male', 'female']
+VALID_BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+VALID_TEST_RESULTS = ['Normal', 'Abnormal', 'Inconclusive']
+NAME_TITLE_PATTERN = re.compile(r'^(Dr\.|Mrs\.|Mr\.|Ms\.|MD|DVM|DDS)\s+')
+
+
+def map_distinct(series, cleaner):
+    """Apply a vectorized cleaner to the distinct values of a column and map the results back."""
+    if is_categorical(series):
+        return map_categories(series, cleaner)
+    distinct = pd.Series(series.unique(), dtype=object)
+    lookup = pd.Series(cleaner(distinct).to_numpy(), index=distinct.to_numpy())
+    return series.map(lookup)
+
+
+def clean_gender_values(values):
+    """Capitalize male/female values; anything else becomes 'Unknown'."""
+    return values.str.capitalize().where(values.str.lower().isin(VALID_GENDERS), 'Unknown')
+
+
+def clean_blood_type_values(values):
+    """Keep valid blood types; anything else becomes 'Unknown'."""
+    return values.where(values.isin(VALID_BLOOD_TYPES), 'Unknown')
+
+
+def clean_test_results_values(values):
+    """Keep valid test results; anything else becomes 'Inconclusive'."""
+    return values.where(values.isin(VALID_TEST_RESULTS), 'Inconclusive')
+
+
+def strip_text(values):
+    """Convert values to text without surrounding whitespace."""
+    return values.astype(str).str.strip()
+
+
+def strip_name_titles(values):
+    """Remove a leading title (Dr., Mrs., MD, ...) from names."""
+    return values.str.replace(NAME_TITLE_PATTERN, '', regex=True).str.strip()
+
+
+# Raw CSV columns that identify a duplicate row across chunks (None means all columns)
+DEDUP_SUBSET = None
+
+# Columns imputed from dataset-wide statistics when global_imputation is enabled
+IMPUTE_NUMERIC_COLUMNS = ['age', 'billing_amount', 'room_number']
+IMPUTE_DATE_COLUMNS = ['date_of_admission', 'discharge_date']
+IMPUTE_CATEGORICAL_COLUMNS = ['name', 'gender', 'blood_type', 'medical_condition', 'doctor', 'hospital',
+                              'insurance_provider', 'admission_type', 'medication', 'test_results']
+
+# Integrity rules checked by validate_data_integrity, evaluated together in one pass
+VALIDATION_RULES = [
+    Rule('negative_age', 'age', '<', 0, fix='median'),
+    Rule('discharge_before_admission', 'discharge_date', '<', other='date_of_admission',
+         fix_offset=pd.Timedelta(days=1)),
+    Rule('negative_billing_amount', 'billing_amount', '<', 0, fix='median')
+]
+
+
 class HealthcareETL:
-    def __init__(self, csv_file_path, db_name='healthcare.db', chunksize=10000):
-        """Initialize ETL process with file path, database name, and chunksize."""
+    def __init__(self, csv_file_path, db_name='healthcare.db', chunksize=10000, options=None, **option_values):
+        """Initialize ETL process with file path, database name, and chunksize.
+
+        Run options come as an EtlOptions, as its keywords, or both (keywords win).
+        """
         self.csv_file_path = csv_file_path
         self.db_name = db_name
         self.chunksize = chunksize
+        self.options = options.replace(**option_values) if options is not None else EtlOptions(**option_values)
+        self.checkpoints = None
+        self.deduplicator = None
+        self.imputation_values = None
+        self.table_name = self.options.stored_table()
+        self.date_parser = DateParser(format='%d-%m-%Y')
+        self.encoder = DimensionEncoder() if self.options.storage == 'encoded' else None
+        # The parser in use: 'auto' is replaced by the fastest one on the first read
+        self.extract_backend = self.options.extract_backend
+        self.metrics = EtlMetrics()
+        self.sizer = None
+        self.integer_dtype = 'Int16' if self.options.compact_dtypes else 'Int32'
+        rules = VALIDATION_RULES if self.options.validation_rules is None else self.options.validation_rules
+        self.validator = ValidationEngine(rules, self.options.on_invalid)
+        self.indexes = resolve_indexes(self.options.indexes, self.table_name, self.options.storage)
+        self.deferred_indexes = []
+        self.start_offset = 0
+        self.bulk_loader = None
         self.conn = None
         self.cursor = None
         self.setup_database()
 
+    def __getstate__(self):
+        """Drop the connection, reader and run caches so the ETL can be sent to transform workers.
+
+        The encoder ids, parsed dates and metrics grow during a run and would otherwise be
+        pickled again with every chunk.
+        """
+        state = self.__dict__.copy()
+        for attr in ('conn', 'cursor', 'chunk_iter', 'bulk_loader', 'deduplicator', 'sizer',
+                     'encoder', 'date_parser', 'metrics'):
+            state.pop(attr, None)
+        return state
+
+    def __setstate__(self, state):
+        """Rebuild the caches dropped by __getstate__, empty, in the transform worker."""
+        self.__dict__.update(state)
+        self.date_parser = DateParser(format='%d-%m-%Y')
+        self.encoder = DimensionEncoder() if self.options.storage == 'encoded' else None
+        self.metrics = EtlMetrics()
+
     def setup_database(self):
         """Set up SQLite database connection and create table."""
         try:
             self.conn = sqlite3.connect(self.db_name)
             self.cursor = self.conn.cursor()
+            if self.validator.rejects:
+                create_rejects_table(self.conn)
+            if self.table_name == FACT_TABLE:
+                create_encoded_schema(self.conn, DIMENSION_COLUMNS if self.options.storage == 'encoded' else (),
+                                      DB_DATE_COLUMNS if self.options.date_storage == 'days' else ())
+                logging.info("Database connection established and encoded schema created.")
+                return
             # Create table schema
             self.cursor.execute('''
                 CREATE TABLE IF NOT EXISTS healthcare (
@@ -56,36 +179,73 @@ class HealthcareETL:
             logging.error(f"Database connection failed: {e}")
             raise
 
+    def csv_options(self):
+        """Return the pd.read_csv options used to parse the source file."""
+        # Define data types to optimize memory usage
+        dtypes = {
+            'Name': str,
+            'Age': 'Int32',
+            'Gender': str,
+            'Blood Type': str,
+            'Medical Condition': str,
+            'Doctor': str,
+            'Hospital': str,
+            'Insurance Provider': str,
+            'Billing Amount': float,
+            'Room Number': 'Int32',
+            'Admission Type': str,
+            'Medication': str,
+            'Test Results': str
+        }
+        if self.options.compact_dtypes:
+            dtypes = compact_read_dtypes(dtypes)
+        return {
+            'encoding': 'utf-8',
+            'dtype': dtypes,
+            # Dates are read as text and parsed once per distinct value by self.date_parser
+            'low_memory': False,
+            'on_bad_lines': 'warn'  # Warn and skip malformed rows
+        }
+
+    def read_chunksize(self):
+        """Return the reader chunksize: fixed, or asked from the adaptive sizer before each chunk."""
+        return self.sizer.next_rows if self.sizer is not None else self.chunksize
+
+    def resolve_extract_backend(self):
+        """Return the extract backend name, timing a sample once per run when it is 'auto'."""
+        if self.extract_backend == 'auto':
+            # Keep the fastest backend for the rest of the run
+            self.extract_backend = select_backend(self.csv_file_path, self.csv_options())
+        return self.extract_backend
+
+    def read_chunks(self, stage='extract'):
+        """Return an iterator of CSV chunks from the configured extract backend, timed as `stage`."""
+        self.resolve_extract_backend()
+        self.metrics.bytes_read += file_bytes(self.csv_file_path)
+        progress = self.metrics.track_source(ReadProgress())
+        chunks = read_csv_chunks(self.csv_file_path, self.read_chunksize(), self.csv_options(), self.extract_backend, progress)
+        chunks = self.metrics.timed_chunks(stage, chunks)
+        return self.metrics.map_chunks(f"{stage}.parse_dates", self.date_parser.parse_chunk, chunks)
+
     def extract(self):
         """Extract data from CSV file in chunks."""
         try:
-            # Define data types to optimize memory usage
-            dtypes = {
-                'Name': str,
-                'Age': 'Int32',
-                'Gender': str,
-                'Blood Type': str,
-                'Medical Condition': str,
-                'Doctor': str,
-                'Hospital': str,
-                'Insurance Provider': str,
-                'Billing Amount': float,
-                'Room Number': 'Int32',
-                'Admission Type': str,
-                'Medication': str,
-                'Test Results': str
-            }
-            # Read CSV in chunks with explicit date format
-            self.chunk_iter = pd.read_csv(
-                self.csv_file_path,
-                encoding='utf-8',
-                dtype=dtypes,
-                parse_dates=['Date of Admission', 'Discharge Date'],
-                date_format='%d-%m-%Y',  # Specify DD-MM-YYYY format
-                chunksize=self.chunksize,
-                low_memory=False,
-                on_bad_lines='warn'  # Warn and skip malformed rows
-            )
+            if self.options.resume:
+                # Continue after the last committed chunk; yields (chunk, checkpoint) pairs
+                self.checkpoints = CheckpointStore(self.csv_file_path)
+                self.checkpoints.ensure_table(self.conn)
+                resume_after = self.checkpoints.resume_point(self.conn)
+                self.start_offset = resume_after.end_offset if resume_after else 0
+                self.metrics.bytes_read += file_bytes(self.csv_file_path, self.start_offset)
+                progress = self.metrics.track_source(ReadProgress())
+                chunks = read_csv_resumable(self.csv_file_path, self.read_chunksize(), resume_after, progress,
+                                            self.options.source_complete, self.resolve_extract_backend(),
+                                            **self.csv_options())
+                chunks = self.metrics.timed_chunks('extract', chunks)
+                self.chunk_iter = self.metrics.map_chunks('extract.parse_dates', self.date_parser.parse_chunk, chunks)
+            else:
+                # Read CSV in chunks with explicit date format
+                self.chunk_iter = self.read_chunks()
             logging.info(f"Initialized chunked reading of {self.csv_file_path} with chunksize {self.chunksize}")
         except FileNotFoundError:
             logging.error(f"CSV file not found: {self.csv_file_path}")
@@ -98,31 +258,63 @@ class HealthcareETL:
         """Transform a single chunk of data."""
         logging.info(f"Transforming chunk with {len(chunk)} records")
 
+        # Each step is timed separately as transform.<step> in self.metrics
         # 1. Remove duplicates
-        initial_rows = len(chunk)
-        chunk = chunk.drop_duplicates()
-        logging.info(f"Removed {initial_rows - len(chunk)} duplicate rows in chunk")
+        chunk = self.metrics.timed('transform.drop_duplicates', self.drop_duplicate_rows, chunk)
 
         # 2. Handle missing values
-        chunk = self.handle_missing_values(chunk)
+        chunk = self.metrics.timed('transform.handle_missing_values', self.handle_missing_values, chunk)
 
         # 3. Standardize column names
-        chunk.columns = [col.lower().replace(' ', '_') for col in chunk.columns]
-        logging.info("Standardized column names in chunk")
+        chunk = self.metrics.timed('transform.standardize_column_names', self.standardize_column_names, chunk)
 
         # 4. Data type validation and conversion
-        chunk = self.validate_and_convert_data_types(chunk)
+        chunk = self.metrics.timed('transform.validate_and_convert_data_types', self.validate_and_convert_data_types, chunk)
 
         # 5. Clean and standardize specific columns
-        chunk = self.clean_specific_columns(chunk)
+        chunk = self.metrics.timed('transform.clean_specific_columns', self.clean_specific_columns, chunk)
 
-        # 6. Add unique identifier
-        chunk['record_id'] = [str(uuid.uuid4()) for _ in range(len(chunk))]
-        logging.info("Added unique record_id column to chunk")
+        # 6. Add deterministic identifier from the business key
+        chunk = self.metrics.timed('transform.add_record_id', self.add_record_id, chunk)
 
         # 7. Validate data integrity
-        chunk = self.validate_data_integrity(chunk)
+        chunk = self.metrics.timed('transform.validate_data_integrity', self.validate_data_integrity, chunk)
+
+        # 8. Downcast cleaned integer columns
+        if self.options.compact_dtypes:
+            chunk = self.metrics.timed('transform.downcast_integers', downcast_integers, chunk)
+
+        # 9. Store dates as integer day numbers
+        if self.options.date_storage == 'days':
+            chunk = self.metrics.timed('transform.store_dates_as_day_numbers', store_dates_as_day_numbers, chunk)
+
+        return chunk
+
+    def transform_in_worker(self, chunk):
+        """Transform a chunk in a pipeline worker, sending its step metrics back in chunk.attrs."""
+        self.metrics = EtlMetrics()
+        chunk = self.transform(chunk)
+        chunk.attrs['etl_metrics'] = self.metrics.stages
+        return chunk
+
+    def drop_duplicate_rows(self, chunk):
+        """Remove exact duplicate rows within the chunk."""
+        duplicated = chunk.duplicated()
+        if duplicated.any():
+            chunk = chunk.take(np.flatnonzero(~duplicated.to_numpy()))
+        logging.info(f"Removed {int(duplicated.sum())} duplicate rows in chunk")
+        return chunk
+
+    def standardize_column_names(self, chunk):
+        """Convert CSV headers to snake_case database column names."""
+        chunk.columns = [col.lower().replace(' ', '_') for col in chunk.columns]
+        logging.info("Standardized column names in chunk")
+        return chunk
 
+    def add_record_id(self, chunk):
+        """Add the deterministic record_id derived from the business key."""
+        chunk['record_id'] = business_key_ids(chunk)
+        logging.info("Added record_id column to chunk")
         return chunk
 
     def handle_missing_values(self, chunk):
@@ -134,21 +326,43 @@ class HealthcareETL:
 
         for col in chunk.columns:
             if chunk[col].isnull().any():
-                if chunk[col].dtype in ['Int32', 'float64']:
-                    median_val = chunk[col].median()
+                if pd.api.types.is_numeric_dtype(chunk[col]):
+                    median_val = self.fill_value(chunk, col, 'median')
                     chunk[col] = chunk[col].fillna(median_val)
                     logging.info(f"Filled missing values in {col} with median: {median_val}")
                 else:
-                    mode_val = chunk[col].mode()[0] if not chunk[col].mode().empty else 'Unknown'
-                    chunk[col] = chunk[col].fillna(mode_val)
+                    mode_val = self.fill_value(chunk, col, 'mode')
+                    chunk[col] = fill_missing(chunk[col], mode_val)
                     logging.info(f"Filled missing values in {col} with mode: {mode_val}")
         return chunk
 
+    def fill_value(self, chunk, col, statistic):
+        """Return the dataset-wide fill value for a column, or this chunk's median/mode."""
+        key = col.lower().replace(' ', '_')
+        if self.imputation_values is not None and key in self.imputation_values:
+            value = self.imputation_values[key]
+        elif statistic == 'median':
+            value = chunk[col].median()
+        else:
+            mode = chunk[col].mode()
+            return mode[0] if not mode.empty else 'Unknown'
+        if pd.api.types.is_integer_dtype(chunk[col]) and pd.notna(value):
+            # Integer columns cannot hold a median like 52.5
+            value = round(value)
+        return value
+
+    def compute_imputation_values(self):
+        """Stream over the whole CSV once to build dataset-wide medians and modes."""
+        chunks = self.read_chunks('imputation_pass')
+        return compute_imputation_values(chunks, numeric_columns=IMPUTE_NUMERIC_COLUMNS,
+                                         date_columns=IMPUTE_DATE_COLUMNS,
+                                         categorical_columns=IMPUTE_CATEGORICAL_COLUMNS)
+
     def validate_and_convert_data_types(self, chunk):
         """Validate and convert data types in the chunk."""
         expected_types = {
             'name': str,
-            'age': 'Int32',
+            'age': self.integer_dtype,
             'gender': str,
             'blood_type': str,
             'medical_condition': str,
@@ -157,7 +371,7 @@ class HealthcareETL:
             'hospital': str,
             'insurance_provider': str,
             'billing_amount': float,
-            'room_number': 'Int32',
+            'room_number': self.integer_dtype,
             'admission_type': str,
             'discharge_date': 'datetime64[ns]',
             'medication': str,
@@ -167,17 +381,19 @@ class HealthcareETL:
         for col, dtype in expected_types.items():
             try:
                 if col in ['date_of_admission', 'discharge_date']:
-                    chunk[col] = pd.to_datetime(chunk[col], errors='coerce', format='%d-%m-%Y')
+                    chunk[col] = self.date_parser.parse(chunk[col])
                     if chunk[col].isnull().any():
                         logging.warning(f"Invalid dates found in {col}. Filling with median date.")
-                        median_date = chunk[col].median()
+                        median_date = self.fill_value(chunk, col, 'median')
                         chunk[col] = chunk[col].fillna(median_date)
-                elif dtype == 'Int32':
-                    chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(chunk[col].median()).astype('Int32')
-                elif dtype == float:
-                    chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(chunk[col].median())
+                elif dtype in ('Int16', 'Int32', float):
+                    # Columns read with the right dtype and no gaps are kept without a copy
+                    values = pd.to_numeric(chunk[col], errors='coerce')
+                    if values.hasnans:
+                        values = values.fillna(self.fill_value(chunk, col, 'median'))
+                    chunk[col] = values.astype(dtype, copy=False)
                 elif dtype == str:
-                    chunk[col] = chunk[col].astype(str).str.strip()
+                    chunk[col] = map_categories(chunk[col], strip_text) if is_categorical(chunk[col]) else strip_text(chunk[col])
                 logging.info(f"Validated/converted {col} to {dtype} in chunk")
             except Exception as e:
                 logging.error(f"Error converting {col} to {dtype}: {e}")
@@ -186,55 +402,87 @@ class HealthcareETL:
 
     def clean_specific_columns(self, chunk):
         """Clean and standardize specific columns in the chunk."""
+        # Each cleaner runs once per distinct value; results are mapped back to the rows
         # Clean gender
-        chunk['gender'] = chunk['gender'].apply(lambda x: x.capitalize() if x.lower() in ['male', 'female'] else 'Unknown')
+        chunk['gender'] = map_distinct(chunk['gender'], clean_gender_values)
         logging.info("Standardized gender values in chunk")
 
         # Clean blood_type
-        valid_blood_types = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
-        chunk['blood_type'] = chunk['blood_type'].apply(lambda x: x if x in valid_blood_types else 'Unknown')
+        chunk['blood_type'] = map_distinct(chunk['blood_type'], clean_blood_type_values)
         logging.info("Standardized blood_type values in chunk")
 
         # Clean medical_condition
-        chunk['medical_condition'] = chunk['medical_condition'].str.title()
+        chunk['medical_condition'] = map_distinct(chunk['medical_condition'], lambda values: values.str.title())
         logging.info("Standardized medical_condition values in chunk")
 
         # Clean test_results
-        valid_test_results = ['Normal', 'Abnormal', 'Inconclusive']
-        chunk['test_results'] = chunk['test_results'].apply(lambda x: x if x in valid_test_results else 'Inconclusive')
+        chunk['test_results'] = map_distinct(chunk['test_results'], clean_test_results_values)
         logging.info("Standardized test_results values in chunk")
 
         # Remove titles from names
-        chunk['name'] = chunk['name'].apply(lambda x: re.sub(r'^(Dr\.|Mrs\.|Mr\.|Ms\.|MD|DVM|DDS)\s+', '', x).strip())
+        chunk['name'] = map_distinct(chunk['name'], strip_name_titles)
         logging.info("Removed titles from name column in chunk")
         return chunk
 
     def validate_data_integrity(self, chunk):
         """Validate data integrity in the chunk."""
-        # Check for negative ages
-        if (chunk['age'] < 0).any():
-            logging.warning("Negative ages found in chunk. Replacing with median age.")
-            chunk.loc[chunk['age'] < 0, 'age'] = chunk['age'].median()
-
-        # Check for discharge dates before admission dates
-        invalid_dates = chunk[chunk['discharge_date'] < chunk['date_of_admission']]
-        if not invalid_dates.empty:
-            logging.warning(f"Found {len(invalid_dates)} records with discharge date before admission in chunk. Correcting...")
-            chunk.loc[chunk['discharge_date'] < chunk['date_of_admission'], 'discharge_date'] = chunk['date_of_admission'] + pd.Timedelta(days=1)
-
-        # Check for negative billing amounts
-        if (chunk['billing_amount'] < 0).any():
-            logging.warning("Negative billing amounts found in chunk. Replacing with median.")
-            chunk.loc[chunk['billing_amount'] < 0, 'billing_amount'] = chunk['billing_amount'].median()
+        # Negative ages and billing amounts get the median, early discharges admission + 1 day
+        chunk, rejects = self.validator.apply(chunk, lambda chunk, col: self.fill_value(chunk, col, 'median'))
+        if rejects is not None:
+            # Written by load() in the same transaction as the chunk
+            chunk.attrs['validation_rejects'] = rejects
         return chunk
 
-    def load(self, chunk):
-        """Load a transformed chunk into SQLite database."""
+    def load_chunk(self, chunk, checkpoint=None):
+        """Load a transformed chunk, recording load time and any metrics sent back by a worker."""
+        worker_stages = chunk.attrs.pop('etl_metrics', None)
+        if worker_stages:
+            self.metrics.merge_stages(worker_stages)
+        rejects = chunk.attrs.pop('validation_rejects', None)
+        if rejects is not None:
+            self.metrics.extra['rows_rejected'] = self.metrics.extra.get('rows_rejected', 0) + len(rejects)
+        self.metrics.timed('load', self.load, chunk, checkpoint, rejects)
+
+    def write_metrics(self):
+        """Log the run summary and write the JSON report and etl_runs row if configured."""
+        self.metrics.extra.update({'csv_file': self.csv_file_path, 'db_name': self.db_name, 'chunksize': self.chunksize,
+                                   'workers': self.options.workers, 'extract_backend': self.extract_backend})
+        logging.info(f"ETL run metrics: {self.metrics.summary()}")
         try:
-            chunk.to_sql('healthcare', self.conn, if_exists='append', index=False)
+            if self.options.metrics_report:
+                self.metrics.write_json(self.options.metrics_report)
+            if self.options.metrics_table:
+                with sqlite3.connect(self.db_name) as conn:
+                    self.metrics.save(conn)
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Failed to write ETL run metrics: {e}")
+            raise
+
+    def load(self, chunk, checkpoint=None, rejects=None):
+        """Load a transformed chunk, and the rows it rejected, into SQLite database."""
+        if self.bulk_loader is not None:
+            save_rejects(self.bulk_loader.conn, rejects)
+            if not chunk.empty:
+                # Committed with the rows, so cached query results expire exactly when they change
+                bump_data_version(self.bulk_loader.conn)
+            self.bulk_loader.load(chunk, checkpoint, self.checkpoints)
+            return
+        try:
+            save_rejects(self.conn, rejects)
+            if not chunk.empty:
+                if self.encoder is not None:
+                    chunk = self.encoder.encode(self.conn, chunk)
+                chunk.to_sql(self.table_name, self.conn, if_exists='append', index=False,
+                             method=upsert_method(self.options.on_conflict))
+                bump_data_version(self.conn)
+            if checkpoint is not None:
+                self.checkpoints.record(self.conn, checkpoint)
             self.conn.commit()
             logging.info(f"Loaded {len(chunk)} records into SQLite database")
-        except sqlite3.Error as e:
+        except Exception as e:
+            self.conn.rollback()
+            if self.encoder is not None:
+                self.encoder.reset()
             # logging.error(f"Error loading chunk into database: {e Facetious: To use this feature, please register for a 30-day free trial account at https://facetools.ai/
             logging.error(f"Error loading chunk into database: {e}")
             raise
@@ -245,27 +493,98 @@ class HealthcareETL:
             self.conn.close()
             logging.info("Database connection closed")
 
+    def finish_load(self):
+        """Post-load stage: build the indexes deferred during the load, then ANALYZE and PRAGMA optimize."""
+        if not self.indexes and not self.options.analyze:
+            return
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        report = finish_load(self.conn, self.indexes, self.options.analyze)
+        self.metrics.record('index', time.perf_counter() - start_wall, time.process_time() - start_cpu, 0, 0)
+        report['deferred_indexes'] = self.deferred_indexes
+        self.metrics.extra['post_load'] = report
+
     def run(self):
         """Run the complete ETL pipeline with chunked processing."""
+        succeeded = False
+        self.metrics = EtlMetrics()
+        self.metrics.start()
+        if self.options.memory_budget is not None:
+            self.sizer = AdaptiveChunkSizer(self.options.memory_budget, initial_rows=self.chunksize)
         try:
+            if self.options.global_imputation:
+                self.imputation_values = self.compute_imputation_values()
             self.extract()
-            total_records = 0
-            for chunk in self.chunk_iter:
-                transformed_chunk = self.transform(chunk)
-                self.load(transformed_chunk)
-                total_records += len(transformed_chunk)
-                logging.info(f"Processed and loaded chunk. Total records processed: {total_records}")
+            if self.indexes:
+                self.deferred_indexes = defer_indexes(self.conn, self.table_name, self.indexes,
+                                                      estimate_rows(self.csv_file_path, self.start_offset))
+            if self.options.bulk_load:
+                self.bulk_loader = BulkLoader(self.db_name, table=self.table_name, commit_every=self.options.commit_every,
+                                              on_conflict=self.options.on_conflict, encoder=self.encoder)
+                self.bulk_loader.open()
+            chunks = self.chunk_iter
+            if self.sizer is not None and self.options.workers > 1:
+                # Transform memory is in the workers, so chunks are sized from their raw size
+                chunks = self.sizer.observe_chunks(chunks)
+            if self.options.global_dedup:
+                # Runs ahead of transform, in order, so it also works in pipelined mode
+                self.deduplicator = GlobalDeduplicator(subset=DEDUP_SUBSET, max_memory_keys=self.options.dedup_memory_keys,
+                                                       spill_db=self.options.dedup_spill_db)
+                self.deduplicator.open()
+                chunks = self.metrics.map_chunks('dedup', self.deduplicator.filter, chunks)
+            if self.options.workers > 1:
+                total_records = run_pipelined(self.transform_in_worker, chunks, self.load_chunk,
+                                              workers=self.options.workers, prefetch=self.options.prefetch)
+            else:
+                total_records = 0
+                if self.sizer is not None:
+                    self.sizer.start()
+                for chunk in chunks:
+                    chunk, checkpoint = chunk if self.options.resume else (chunk, None)
+                    transformed_chunk = self.transform(chunk)
+                    self.load_chunk(transformed_chunk, checkpoint)
+                    if self.sizer is not None:
+                        self.sizer.observe(len(chunk), transformed_chunk)
+                    total_records += len(transformed_chunk)
+                    logging.info(f"Processed and loaded chunk. Total records processed: {total_records}")
+            if self.bulk_loader is not None:
+                # Commit the load before indexing it
+                self.bulk_loader.close()
+                self.bulk_loader = None
+            self.finish_load()
+            succeeded = True
             logging.info(f"ETL pipeline completed successfully. Total records: {total_records}")
         except Exception as e:
             logging.error(f"ETL pipeline failed: {e}")
             raise
         finally:
+            if self.deduplicator is not None:
+                self.deduplicator.close(commit=succeeded)
+            if self.bulk_loader is not None:
+                self.bulk_loader.close(commit=succeeded)
+                self.bulk_loader = None
             self.close_connection()
+            if self.sizer is not None:
+                self.sizer.stop()
+                self.metrics.extra.update(self.sizer.report())
+            self.metrics.finish(succeeded)
+            self.write_metrics()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the healthcare ETL.")
+    parser.add_argument('--extract-backend', default='pandas', choices=['auto', *EXTRACT_BACKENDS])
+    parser.add_argument('--compact-dtypes', action='store_true',
+                        help="Read low-cardinality text as categoricals and downcast small integers")
+    parser.add_argument('--on-invalid', choices=VALIDATION_ACTIONS, default=None,
+                        help="Fix, drop or reject rows breaking any validation rule (default: per rule)")
+    parser.add_argument('--indexes', action='store_true',
+                        help="Build the query indexes and ANALYZE once the load finishes")
+    args = parser.parse_args()
+
     # Path to the CSV file
     csv_file = r"C:\Users\maruf\OneDrive\Desktop\SQL-Data-Analysis-Healthcare-Project\healthcare_dataset.csv"
     
     # Initialize and run ETL process
-    etl = HealthcareETL(csv_file, chunksize=10000)
+    etl = HealthcareETL(csv_file, chunksize=10000, extract_backend=args.extract_backend,
+                        compact_dtypes=args.compact_dtypes, on_invalid=args.on_invalid,
+                        indexes=args.indexes, analyze=args.indexes)
     etl.run()
@@ -1,9 +1,28 @@
+import argparse
 import pandas as pd
 import numpy as np
 import sqlite3
 import logging
-import uuid
 import os
+import time
+from etl_pipeline import run_pipelined
+from db_connection import db_connection
+from etl_bulk_load import BulkLoader, upsert_method
+from etl_record_id import business_key_ids
+from etl_checkpoint import CheckpointStore, read_csv_resumable
+from etl_dedup import GlobalDeduplicator
+from etl_statistics import compute_imputation_values
+from etl_storage import DIMENSION_COLUMNS, FACT_TABLE, DimensionEncoder, create_encoded_schema
+from etl_dates import DB_DATE_COLUMNS, DateParser, store_dates_as_day_numbers
+from etl_metrics import EtlMetrics, estimate_rows, file_bytes
+from etl_compression import ReadProgress
+from etl_chunk_sizing import AdaptiveChunkSizer
+from etl_dtypes import compact_read_dtypes, downcast_integers, fill_missing, map_values
+from etl_extract_backends import EXTRACT_BACKENDS, read_csv_chunks, select_backend
+from etl_validation import VALIDATION_ACTIONS, Rule, ValidationEngine, create_rejects_table, save_rejects
+from etl_indexes import defer_indexes, finish_load, resolve_indexes
+from etl_options import EtlOptions
+from query_cache import bump_data_version
 
 # Configure logging
 logging.basicConfig(
@@ -12,18 +31,80 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Raw CSV columns that identify a duplicate row across chunks (None means all columns)
+DEDUP_SUBSET = ['Name', 'Age', 'Date of Admission', 'Doctor']
+
+# Columns filled with their median; text columns are filled with 'Unknown'
+IMPUTE_NUMERIC_COLUMNS = ['age', 'billing_amount', 'room_number']
+
+# Integrity rules checked by validate(); by default violating values are clipped to the bound
+VALIDATION_RULES = [
+    Rule('negative_age', 'age', '<', 0),
+    Rule('negative_billing_amount', 'billing_amount', '<', 0),
+    Rule('discharge_before_admission', 'discharge_date', '<', other='date_of_admission')
+]
+
 class HealthcareETL:
-    def __init__(self, csv_file, db_name='healthcare.db', chunksize=10000):
+    def __init__(self, csv_file, db_name='healthcare.db', chunksize=10000, options=None, **option_values):
+        """Initialize ETL process with file path, database name, and chunksize.
+
+        Run options come as an EtlOptions, as its keywords, or both (keywords win).
+        """
         self.csv_file = csv_file
         self.db_name = db_name
         self.chunksize = chunksize
+        self.options = options.replace(**option_values) if options is not None else EtlOptions(**option_values)
+        self.checkpoints = None
+        self.deduplicator = None
+        self.imputation_values = None
+        self.table_name = self.options.stored_table()
+        self.date_parser = DateParser(dayfirst=True)
+        self.encoder = DimensionEncoder() if self.options.storage == 'encoded' else None
+        # The parser in use: 'auto' is replaced by the fastest one on the first read
+        self.extract_backend = self.options.extract_backend
+        self.metrics = EtlMetrics()
+        self.sizer = None
+        rules = VALIDATION_RULES if self.options.validation_rules is None else self.options.validation_rules
+        self.validator = ValidationEngine(rules, self.options.on_invalid)
+        self.indexes = resolve_indexes(self.options.indexes, self.table_name, self.options.storage)
+        self.deferred_indexes = []
+        self.start_offset = 0
+        self.bulk_loader = None
         self.chunk_iter = None
-        logging.info(f"Initialized HealthcareETL with CSV: {csv_file}, DB: {db_name}, Chunksize: {chunksize}")
+        logging.info(f"Initialized HealthcareETL with CSV: {csv_file}, DB: {db_name}, Chunksize: {chunksize}, Workers: {self.options.workers}")
+
+    def __getstate__(self):
+        """Drop the CSV reader, bulk loader, deduplicator, sizer and run caches so the ETL can be sent to transform workers.
+
+        The encoder ids, parsed dates and metrics grow during a run and would otherwise be
+        pickled again with every chunk.
+        """
+        state = self.__dict__.copy()
+        state['chunk_iter'] = None
+        state['bulk_loader'] = None
+        state['deduplicator'] = None
+        state['sizer'] = None
+        for attr in ('encoder', 'date_parser', 'metrics'):
+            state.pop(attr, None)
+        return state
+
+    def __setstate__(self, state):
+        """Rebuild the caches dropped by __getstate__, empty, in the transform worker."""
+        self.__dict__.update(state)
+        self.date_parser = DateParser(dayfirst=True)
+        self.encoder = DimensionEncoder() if self.options.storage == 'encoded' else None
+        self.metrics = EtlMetrics()
 
     def create_table(self):
         """Create healthcare table with explicit schema."""
         try:
             with sqlite3.connect(self.db_name) as conn:
+                if self.validator.rejects:
+                    create_rejects_table(conn)
+                if self.table_name == FACT_TABLE:
+                    create_encoded_schema(conn, DIMENSION_COLUMNS if self.options.storage == 'encoded' else (),
+                                          DB_DATE_COLUMNS if self.options.date_storage == 'days' else ())
+                    return
                 cursor = conn.cursor()
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS healthcare (
@@ -51,20 +132,59 @@ class HealthcareETL:
             logging.error(f"Table creation failed: {e}")
             raise
 
+    def csv_options(self):
+        """Return the pd.read_csv options used to parse the source file."""
+        # Dates are read as text and parsed once per distinct value by self.date_parser
+        options = {
+            'on_bad_lines': 'warn'
+        }
+        if self.options.compact_dtypes:
+            options['dtype'] = compact_read_dtypes()
+        return options
+
+    def read_chunksize(self):
+        """Return the reader chunksize: fixed, or asked from the adaptive sizer before each chunk."""
+        return self.sizer.next_rows if self.sizer is not None else self.chunksize
+
+    def resolve_extract_backend(self):
+        """Return the extract backend name, timing a sample once per run when it is 'auto'."""
+        if self.extract_backend == 'auto':
+            # Keep the fastest backend for the rest of the run
+            self.extract_backend = select_backend(self.csv_file, self.csv_options())
+        return self.extract_backend
+
+    def read_chunks(self, stage='extract'):
+        """Return an iterator of CSV chunks from the configured extract backend, timed as `stage`."""
+        self.resolve_extract_backend()
+        self.metrics.bytes_read += file_bytes(self.csv_file)
+        progress = self.metrics.track_source(ReadProgress())
+        chunks = read_csv_chunks(self.csv_file, self.read_chunksize(), self.csv_options(), self.extract_backend, progress)
+        chunks = self.metrics.timed_chunks(stage, chunks)
+        return self.metrics.map_chunks(f"{stage}.parse_dates", self.date_parser.parse_chunk, chunks)
+
     def extract(self):
         """Read CSV file in chunks."""
         try:
             if not os.path.exists(self.csv_file):
                 logging.error(f"CSV file not found: {self.csv_file}")
                 raise FileNotFoundError(f"CSV file not found: {self.csv_file}")
-            
-            self.chunk_iter = pd.read_csv(
-                self.csv_file,
-                chunksize=self.chunksize,
-                parse_dates=['Date of Admission', 'Discharge Date'],
-                dayfirst=True,
-                on_bad_lines='warn'
-            )
+
+            if self.options.resume:
+                # Continue after the last committed chunk; yields (chunk, checkpoint) pairs
+                self.checkpoints = CheckpointStore(self.csv_file)
+                with sqlite3.connect(self.db_name) as conn:
+                    self.checkpoints.ensure_table(conn)
+                    resume_after = self.checkpoints.resume_point(conn)
+                self.start_offset = resume_after.end_offset if resume_after else 0
+                self.metrics.bytes_read += file_bytes(self.csv_file, self.start_offset)
+                progress = self.metrics.track_source(ReadProgress())
+                chunks = read_csv_resumable(self.csv_file, self.read_chunksize(), resume_after, progress,
+                                            self.options.source_complete, self.resolve_extract_backend(),
+                                            **self.csv_options())
+                chunks = self.metrics.timed_chunks('extract', chunks)
+                self.chunk_iter = self.metrics.map_chunks('extract.parse_dates', self.date_parser.parse_chunk, chunks)
+            else:
+                self.chunk_iter = self.read_chunks()
             logging.info(f"Extracted CSV iterator for {self.csv_file}")
         except Exception as e:
             logging.error(f"Extraction failed: {e}")
@@ -77,101 +197,277 @@ class HealthcareETL:
                 logging.info("Empty chunk received, skipping transformation.")
                 return chunk
 
-            # Rename columns to match database schema
-            column_mapping = {
-                'Name': 'name',
-                'Age': 'age',
-                'Gender': 'gender',
-                'Blood Type': 'blood_type',
-                'Medical Condition': 'medical_condition',
-                'Date of Admission': 'date_of_admission',
-                'Doctor': 'doctor',
-                'Hospital': 'hospital',
-                'Insurance Provider': 'insurance_provider',
-                'Billing Amount': 'billing_amount',
-                'Room Number': 'room_number',
-                'Admission Type': 'admission_type',
-                'Discharge Date': 'discharge_date',
-                'Medication': 'medication',
-                'Test Results': 'test_results'
-            }
-            chunk = chunk.rename(columns=column_mapping)
-            logging.info("Renamed columns to match database schema")
-
-            # Remove duplicates based on key columns
-            chunk = chunk.drop_duplicates(subset=['name', 'age', 'date_of_admission', 'doctor'])
-            logging.info(f"Removed duplicates, {len(chunk)} rows remain")
-
-            # Handle missing values
-            chunk['age'] = chunk['age'].fillna(chunk['age'].median() if not chunk['age'].empty else 0).astype('Int32')
-            chunk['billing_amount'] = chunk['billing_amount'].fillna(chunk['billing_amount'].median() if not chunk['billing_amount'].empty else 0).astype(float)
-            chunk['gender'] = chunk['gender'].fillna('Unknown')
-            chunk['medical_condition'] = chunk['medical_condition'].fillna('Unknown')
-            chunk['blood_type'] = chunk['blood_type'].fillna('Unknown')
-            chunk['doctor'] = chunk['doctor'].fillna('Unknown')
-            chunk['hospital'] = chunk['hospital'].fillna('Unknown')
-            chunk['insurance_provider'] = chunk['insurance_provider'].fillna('Unknown')
-            chunk['room_number'] = chunk['room_number'].fillna(chunk['room_number'].median() if not chunk['room_number'].empty else 0).astype('Int32')
-            chunk['admission_type'] = chunk['admission_type'].fillna('Unknown')
-            chunk['medication'] = chunk['medication'].fillna('Unknown')
-            chunk['test_results'] = chunk['test_results'].fillna('Unknown')
-            logging.info("Handled missing values")
-
-            # Standardize formats
-            chunk['gender'] = chunk['gender'].str.title().replace({'M': 'Male', 'F': 'Female'})
-            chunk['medical_condition'] = chunk['medical_condition'].str.title()
-            chunk['blood_type'] = chunk['blood_type'].str.upper()
-            chunk['test_results'] = chunk['test_results'].str.title()
-            chunk['name'] = chunk['name'].str.replace(r'^(Dr\.|Mrs\.|Mr\.|Ms\.)', '', regex=True).str.strip()
-            logging.info("Standardized formats")
-
-            # Data validation
-            chunk['age'] = chunk['age'].clip(lower=0)
-            chunk['billing_amount'] = chunk['billing_amount'].clip(lower=0)
-            chunk.loc[chunk['discharge_date'] < chunk['date_of_admission'], 'discharge_date'] = chunk['date_of_admission']
-            logging.info("Validated data")
-
-            # Add unique ID
-            chunk['record_id'] = [str(uuid.uuid4()) for _ in range(len(chunk))]
+            # Each step is timed separately as transform.<step> in self.metrics
+            chunk = self.metrics.timed('transform.rename_columns', self.rename_columns, chunk)
+            chunk = self.metrics.timed('transform.drop_duplicates', self.drop_duplicate_rows, chunk)
+            chunk = self.metrics.timed('transform.handle_missing_values', self.handle_missing_values, chunk)
+            chunk = self.metrics.timed('transform.standardize_formats', self.standardize_formats, chunk)
+            chunk = self.metrics.timed('transform.validate', self.validate, chunk)
+            if self.options.compact_dtypes:
+                chunk = self.metrics.timed('transform.downcast_integers', downcast_integers, chunk)
+            chunk = self.metrics.timed('transform.add_record_id', self.add_record_id, chunk)
+            if self.options.date_storage == 'days':
+                chunk = self.metrics.timed('transform.store_dates_as_day_numbers', store_dates_as_day_numbers, chunk)
             return chunk
         except Exception as e:
             logging.error(f"Transformation failed: {e}")
             raise
 
-    def load(self, chunk):
-        """Load transformed chunk into SQLite database."""
+    def transform_in_worker(self, chunk):
+        """Transform a chunk in a pipeline worker, sending its step metrics back in chunk.attrs."""
+        self.metrics = EtlMetrics()
+        chunk = self.transform(chunk)
+        chunk.attrs['etl_metrics'] = self.metrics.stages
+        return chunk
+
+    def rename_columns(self, chunk):
+        """Rename columns to match database schema."""
+        column_mapping = {
+            'Name': 'name',
+            'Age': 'age',
+            'Gender': 'gender',
+            'Blood Type': 'blood_type',
+            'Medical Condition': 'medical_condition',
+            'Date of Admission': 'date_of_admission',
+            'Doctor': 'doctor',
+            'Hospital': 'hospital',
+            'Insurance Provider': 'insurance_provider',
+            'Billing Amount': 'billing_amount',
+            'Room Number': 'room_number',
+            'Admission Type': 'admission_type',
+            'Discharge Date': 'discharge_date',
+            'Medication': 'medication',
+            'Test Results': 'test_results'
+        }
+        # Relabel in place; rename() would copy every column
+        chunk.columns = [column_mapping.get(col, col) for col in chunk.columns]
+        logging.info("Renamed columns to match database schema")
+        return chunk
+
+    def drop_duplicate_rows(self, chunk):
+        """Remove duplicates based on key columns."""
+        duplicated = chunk.duplicated(subset=['name', 'age', 'date_of_admission', 'doctor'])
+        if duplicated.any():
+            chunk = chunk.take(np.flatnonzero(~duplicated.to_numpy()))
+        logging.info(f"Removed duplicates, {len(chunk)} rows remain")
+        return chunk
+
+    def handle_missing_values(self, chunk):
+        """Fill missing values with medians or 'Unknown'."""
+        # Int16 keeps compact integers narrow until downcast_integers
+        integer_dtype = 'Int16' if self.options.compact_dtypes else 'Int32'
+        for col, dtype in (('age', integer_dtype), ('billing_amount', float), ('room_number', integer_dtype)):
+            values = chunk[col]
+            if values.hasnans:
+                fill = self.median(chunk, col)
+                if dtype != float and pd.notna(fill):
+                    # Integer columns cannot hold a median like 52.5
+                    fill = round(fill)
+                values = values.fillna(fill)
+            chunk[col] = values.astype(dtype, copy=False)
+        for col in ('gender', 'medical_condition', 'blood_type', 'doctor', 'hospital', 'insurance_provider',
+                    'admission_type', 'medication', 'test_results'):
+            chunk[col] = fill_missing(chunk[col], 'Unknown')
+        logging.info("Handled missing values")
+        return chunk
+
+    def standardize_formats(self, chunk):
+        """Standardize text formats."""
+        # Categorical columns are cleaned once per category
+        chunk['gender'] = map_values(chunk['gender'], lambda values: values.str.title().replace({'M': 'Male', 'F': 'Female'}))
+        chunk['medical_condition'] = map_values(chunk['medical_condition'], lambda values: values.str.title())
+        chunk['blood_type'] = map_values(chunk['blood_type'], lambda values: values.str.upper())
+        chunk['test_results'] = map_values(chunk['test_results'], lambda values: values.str.title())
+        chunk['name'] = chunk['name'].str.replace(r'^(Dr\.|Mrs\.|Mr\.|Ms\.)', '', regex=True).str.strip()
+        logging.info("Standardized formats")
+        return chunk
+
+    def validate(self, chunk):
+        """Apply the validation rules: by default clip negative values and fix discharge dates before admission."""
+        chunk, rejects = self.validator.apply(chunk, self.median)
+        if rejects is not None:
+            # Rejected rows are keyed like loaded ones and written by load() with the chunk
+            rejects['record_id'] = business_key_ids(rejects)
+            chunk.attrs['validation_rejects'] = rejects
+        logging.info("Validated data")
+        return chunk
+
+    def add_record_id(self, chunk):
+        """Add deterministic ID from the business key."""
+        chunk['record_id'] = business_key_ids(chunk)
+        return chunk
+
+    def median(self, chunk, col):
+        """Return the dataset-wide median of a column if computed, else this chunk's median."""
+        if self.imputation_values is not None:
+            return self.imputation_values[col]
+        return chunk[col].median() if not chunk[col].empty else 0
+
+    def compute_imputation_values(self):
+        """Stream over the whole CSV once to build dataset-wide medians."""
+        chunks = self.read_chunks('imputation_pass')
+        return compute_imputation_values(chunks, numeric_columns=IMPUTE_NUMERIC_COLUMNS)
+
+    def load_chunk(self, chunk, checkpoint=None):
+        """Load a transformed chunk, recording load time and any metrics sent back by a worker."""
+        worker_stages = chunk.attrs.pop('etl_metrics', None)
+        if worker_stages:
+            self.metrics.merge_stages(worker_stages)
+        rejects = chunk.attrs.pop('validation_rejects', None)
+        if rejects is not None:
+            self.metrics.extra['rows_rejected'] = self.metrics.extra.get('rows_rejected', 0) + len(rejects)
+        self.metrics.timed('load', self.load, chunk, checkpoint, rejects)
+
+    def write_metrics(self):
+        """Log the run summary and write the JSON report and etl_runs row if configured."""
+        self.metrics.extra.update({'csv_file': self.csv_file, 'db_name': self.db_name, 'chunksize': self.chunksize,
+                                   'workers': self.options.workers, 'extract_backend': self.extract_backend})
+        logging.info(f"ETL run metrics: {self.metrics.summary()}")
+        try:
+            if self.options.metrics_report:
+                self.metrics.write_json(self.options.metrics_report)
+            if self.options.metrics_table:
+                with sqlite3.connect(self.db_name) as conn:
+                    self.metrics.save(conn)
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Failed to write ETL run metrics: {e}")
+            raise
+
+    def load(self, chunk, checkpoint=None, rejects=None):
+        """Load transformed chunk, and the rows it rejected, into SQLite database."""
         try:
+            if self.bulk_loader is not None:
+                save_rejects(self.bulk_loader.conn, rejects)
+                if not chunk.empty:
+                    # Committed with the rows, so cached query results expire exactly when they change
+                    bump_data_version(self.bulk_loader.conn)
+                self.bulk_loader.load(chunk, checkpoint, self.checkpoints)
+                return
             if chunk.empty:
                 logging.info("Empty chunk, skipping load.")
+                if checkpoint is not None or rejects is not None:
+                    with sqlite3.connect(self.db_name) as conn:
+                        save_rejects(conn, rejects)
+                        if checkpoint is not None:
+                            self.checkpoints.record(conn, checkpoint)
                 return
             with sqlite3.connect(self.db_name) as conn:
-                chunk.to_sql('healthcare', conn, if_exists='append', index=False)
+                save_rejects(conn, rejects)
+                if self.encoder is not None:
+                    chunk = self.encoder.encode(conn, chunk)
+                chunk.to_sql(self.table_name, conn, if_exists='append', index=False,
+                              method=upsert_method(self.options.on_conflict))
+                bump_data_version(conn)
+                if checkpoint is not None:
+                    # Committed together with the rows when the connection block exits
+                    self.checkpoints.record(conn, checkpoint)
                 # Verify schema
-                schema = pd.read_sql_query("PRAGMA table_info(healthcare)", conn)
+                schema = pd.read_sql_query(f"PRAGMA table_info({self.table_name})", conn)
                 billing_type = schema[schema['name'] == 'billing_amount']['type'].iloc[0]
                 if billing_type != 'FLOAT':
                     logging.error(f"Incorrect billing_amount type: {billing_type}")
                     raise ValueError(f"Incorrect billing_amount type: {billing_type}")
                 logging.info(f"Loaded {len(chunk)} records into healthcare table")
         except Exception as e:
+            if self.encoder is not None:
+                # The connection block rolled back any dimension rows the encoder added
+                self.encoder.reset()
             logging.error(f"Load failed: {e}")
             raise
 
+    def finish_load(self):
+        """Post-load stage: build the indexes deferred during the load, then ANALYZE and PRAGMA optimize."""
+        if not self.indexes and not self.options.analyze:
+            return
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        report = finish_load(self.db_name, self.indexes, self.options.analyze)
+        self.metrics.record('index', time.perf_counter() - start_wall, time.process_time() - start_cpu, 0, 0)
+        report['deferred_indexes'] = self.deferred_indexes
+        self.metrics.extra['post_load'] = report
+
     def run(self):
-        """Run the ETL pipeline."""
+        """Run the ETL pipeline.
+
+        Indexes in `indexes` are dropped before a load that is large next to the table
+        and built once every chunk is loaded, so the load never maintains them row by
+        row; small appends keep them. `analyze` then refreshes the planner statistics.
+        """
+        succeeded = False
+        self.metrics = EtlMetrics()
+        self.metrics.start()
+        if self.options.memory_budget is not None:
+            self.sizer = AdaptiveChunkSizer(self.options.memory_budget, initial_rows=self.chunksize)
         try:
             self.create_table()
             self.extract()
-            for i, chunk in enumerate(self.chunk_iter):
-                logging.info(f"Processing chunk {i+1}")
-                transformed_chunk = self.transform(chunk)
-                self.load(transformed_chunk)
+            if self.indexes:
+                with db_connection(self.db_name) as conn:
+                    self.deferred_indexes = defer_indexes(conn, self.table_name, self.indexes,
+                                                          estimate_rows(self.csv_file, self.start_offset))
+            if self.options.global_imputation:
+                self.imputation_values = self.compute_imputation_values()
+            if self.options.bulk_load:
+                # One connection for the whole run; schema is validated once when it opens
+                self.bulk_loader = BulkLoader(self.db_name, table=self.table_name, commit_every=self.options.commit_every,
+                                              on_conflict=self.options.on_conflict, encoder=self.encoder)
+                self.bulk_loader.open()
+            chunks = self.chunk_iter
+            if self.sizer is not None and self.options.workers > 1:
+                # Transform memory is in the workers, so chunks are sized from their raw size
+                chunks = self.sizer.observe_chunks(chunks)
+            if self.options.global_dedup:
+                # Runs ahead of transform, in order, so it also works in pipelined mode
+                self.deduplicator = GlobalDeduplicator(subset=DEDUP_SUBSET, max_memory_keys=self.options.dedup_memory_keys,
+                                                       spill_db=self.options.dedup_spill_db)
+                self.deduplicator.open()
+                chunks = self.metrics.map_chunks('dedup', self.deduplicator.filter, chunks)
+            if self.options.workers > 1:
+                run_pipelined(self.transform_in_worker, chunks, self.load_chunk,
+                              workers=self.options.workers, prefetch=self.options.prefetch)
+            else:
+                if self.sizer is not None:
+                    self.sizer.start()
+                for i, chunk in enumerate(chunks):
+                    logging.info(f"Processing chunk {i+1}")
+                    chunk, checkpoint = chunk if self.options.resume else (chunk, None)
+                    transformed_chunk = self.transform(chunk)
+                    self.load_chunk(transformed_chunk, checkpoint)
+                    if self.sizer is not None:
+                        self.sizer.observe(len(chunk), transformed_chunk)
+            if self.bulk_loader is not None:
+                # Commit the load before indexing it
+                self.bulk_loader.close()
+                self.bulk_loader = None
+            self.finish_load()
+            succeeded = True
             logging.info("ETL pipeline completed successfully")
         except Exception as e:
             logging.error(f"ETL pipeline failed: {e}")
             raise
+        finally:
+            if self.deduplicator is not None:
+                self.deduplicator.close(commit=succeeded)
+            if self.bulk_loader is not None:
+                self.bulk_loader.close(commit=succeeded)
+                self.bulk_loader = None
+            if self.sizer is not None:
+                self.sizer.stop()
+                self.metrics.extra.update(self.sizer.report())
+            self.metrics.finish(succeeded)
+            self.write_metrics()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the chunked healthcare ETL.")
+    parser.add_argument('--extract-backend', default='pandas', choices=['auto', *EXTRACT_BACKENDS])
+    parser.add_argument('--compact-dtypes', action='store_true',
+                        help="Read low-cardinality text as categoricals and downcast small integers")
+    parser.add_argument('--on-invalid', choices=VALIDATION_ACTIONS, default=None,
+                        help="Fix, drop or reject rows breaking any validation rule (default: per rule)")
+    parser.add_argument('--indexes', action='store_true',
+                        help="Build the query indexes and ANALYZE once the load finishes")
+    args = parser.parse_args()
     csv_file = r"C:\Users\maruf\OneDrive\Desktop\SQL-Data-Analysis-Healthcare-Project\test_healthcare_dataset.csv"
-    etl = HealthcareETL(csv_file, db_name='healthcare.db', chunksize=10000)
+    etl = HealthcareETL(csv_file, db_name='healthcare.db', chunksize=10000, extract_backend=args.extract_backend,
+                        compact_dtypes=args.compact_dtypes, on_invalid=args.on_invalid,
+                        indexes=args.indexes, analyze=args.indexes)
     etl.run()
\ No newline at end of file
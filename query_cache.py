@@ -0,0 +1,239 @@
+import hashlib
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+import pandas as pd
+from db_connection import ConnectionPool
+
+VERSION_TABLE = 'etl_data_version'
+
+# Results with more rows than this are streamed but never cached
+MAX_CACHED_ROWS = 100_000
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def create_version_table(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at DATETIME
+        )
+    ''')
+
+
+def bump_data_version(conn):
+    """Record that the data changed, in the caller's transaction, so cached query results expire.
+
+    The generation is random and set when the row is created, so a database rebuilt
+    from scratch never reuses the tokens of the one it replaced.
+    """
+    create_version_table(conn)
+    conn.execute(f"INSERT INTO {VERSION_TABLE} (id, generation, version, updated_at) VALUES (1, ?, 1, ?) "
+                 "ON CONFLICT(id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at",
+                 (uuid.uuid4().hex, datetime.now().isoformat(sep=' ', timespec='seconds')))
+
+
+def read_data_version(conn):
+    """Return the data-version token of a database, or None if no load ever recorded one."""
+    try:
+        row = conn.execute(f"SELECT generation, version FROM {VERSION_TABLE} WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return f"{row[0]}-{row[1]}" if row else None
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace outside string literals and drop a trailing semicolon."""
+    parts = []
+    last = 0
+    for literal in STRING_LITERAL.finditer(sql):
+        parts.append(' '.join(sql[last:literal.start()].split()))
+        parts.append(literal.group(0))
+        last = literal.end()
+    parts.append(' '.join(sql[last:].split()))
+    return ' '.join(part for part in parts if part).rstrip(';').strip()
+
+
+def result_frame(columns, rows):
+    """Build the DataFrame pd.read_sql_query would return for these rows."""
+    return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+
+class CachingConnection(sqlite3.Connection):
+    """A pooled connection that knows its QueryCache and the data version it last saw."""
+    query_cache = None
+    data_version = None
+    token = None
+
+
+class QueryCache(ConnectionPool):
+    """Read-only connection pool whose query results are cached until new data is loaded.
+
+    Results are keyed by normalized SQL, parameters and the data-version token that
+    every ETL load bumps. An in-process LRU of `max_entries` results sits in front of
+    an optional on-disk tier in `cache_dir`, shared by processes and kept across runs.
+    Checking the token costs one PRAGMA data_version per query: SQLite changes it only
+    when another connection commits, and only then is the token read again. A commit
+    that leaves the token alone still drops this cache's results, but only writers that
+    call bump_data_version expire the disk tier for other processes. Query functions
+    given a QueryCache as db_name use it through export_query.
+    """
+
+    connection_factory = CachingConnection
+
+    def __init__(self, db_name, max_entries=256, cache_dir=None, max_rows=MAX_CACHED_ROWS, pragmas=None):
+        super().__init__(db_name, read_only=True, pragmas=pragmas)
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_rows = max_rows
+        self.entries = OrderedDict()
+        self.entries_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.last_token = None
+
+    def connection(self):
+        conn = super().connection()
+        conn.query_cache = self
+        return conn
+
+    def current_token(self, conn):
+        """Return the data-version token, re-reading it only after another connection committed."""
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != conn.data_version:
+            first_read = conn.data_version is None
+            conn.token = read_data_version(conn)
+            conn.data_version = data_version
+            if conn.token != self.last_token:
+                self.token_changed(conn.token)
+            elif not first_read:
+                # A commit that did not bump the token, such as a hand-written UPDATE
+                self.token_changed(conn.token, stale=True)
+        return conn.token
+
+    def token_changed(self, token, stale=False):
+        """Forget results of older data versions (and of this one if `stale`), in memory and on disk."""
+        with self.entries_lock:
+            self.entries = OrderedDict((key, entry) for key, entry in self.entries.items()
+                                       if key[0] == token and not stale)
+            self.last_token = token
+        if self.cache_dir and token is not None and os.path.isdir(self.cache_dir):
+            generation = token.rsplit('-', 1)[0]
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(f"{generation}-") and (name != token or stale):
+                    shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+        logging.info(f"Query cache for {self.db_name} now at data version {token}")
+
+    def key(self, conn, sql, params=()):
+        """Return the cache key of a query, or None if the database has no data-version token."""
+        token = self.current_token(conn)
+        if token is None:
+            return None
+        return token, normalize_sql(sql), tuple(params)
+
+    def disk_path(self, key):
+        digest = hashlib.sha256(repr(key[1:]).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[0], f"{digest}.pkl")
+
+    def get(self, key):
+        """Return the cached (columns, rows) entry for a key, looking in memory and then on disk."""
+        if key is None:
+            return None
+        with self.entries_lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        if self.cache_dir:
+            try:
+                with open(self.disk_path(key), 'rb') as f:
+                    stored_key, entry = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                entry = None
+            else:
+                if stored_key == key:
+                    self.remember(key, entry)
+                    self.disk_hits += 1
+                    return entry
+        self.misses += 1
+        return None
+
+    def remember(self, key, entry):
+        with self.entries_lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def put(self, key, columns, rows):
+        """Cache a result in memory and, if configured, on disk; oversized results are skipped."""
+        if key is None or len(rows) > self.max_rows:
+            return None
+        entry = {'columns': list(columns), 'rows': list(rows)}
+        self.remember(key, entry)
+        if self.cache_dir:
+            path = self.disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Written to a temporary file first so readers never see half an entry
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump((key, entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logging.warning(f"Could not write query cache entry {path}: {e}")
+        return entry
+
+    def fetch(self, sql, params=(), conn=None):
+        """Return (columns, rows) of a query, from the cache when the data has not changed."""
+        conn = conn or self.connection()
+        key = self.key(conn, sql, params)
+        entry = self.get(key)
+        if entry is None:
+            cursor = conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description or ()]
+            rows = cursor.fetchall()
+            self.put(key, columns, rows)
+            return columns, rows
+        return entry['columns'], entry['rows']
+
+    def read_sql(self, sql, params=()):
+        """Cached pd.read_sql_query: a repeat query returns a copy of the DataFrame built on first use."""
+        conn = self.connection()
+        key = self.key(conn, sql, params)
+        entry = self.get(key)
+        if entry is None:
+            cursor = conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description or ()]
+            rows = cursor.fetchall()
+            entry = self.put(key, columns, rows)
+            if entry is None:
+                return result_frame(columns, rows)
+        if 'frame' not in entry:
+            entry['frame'] = result_frame(entry['columns'], entry['rows'])
+        return entry['frame'].copy()
+
+    def clear(self):
+        """Drop every cached result, in memory and on disk."""
+        with self.entries_lock:
+            self.entries.clear()
+        if self.cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
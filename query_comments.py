@@ -1,7 +1,8 @@
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_sink import export_query
 
 # Configure logging
 logging.basicConfig(
@@ -10,14 +11,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def query_comments(db_name='healthcare.db'):
-    """Execute query with SQL comments."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+def query_comments(db_name='healthcare.db', as_dataframe=False):
+    """Execute query with SQL comments.
 
-        with sqlite3.connect(db_name) as conn:
+    db_name is a database path, an open sqlite3 connection or a ConnectionPool such as a QueryCache.
+    """
+    try:
+        with db_connection(db_name, read_only=True) as conn:
             logging.info("Connected to database successfully.")
             print("Connected to database successfully.")
 
@@ -29,18 +29,12 @@ def query_comments(db_name='healthcare.db'):
             ORDER BY billing_amount DESC;  -- Sort by billing amount
             """
 
-            df = pd.read_sql_query(query, conn)
+            result = export_query(conn, query, 'comments_results.csv',
+                                  "\nHigh Billing Patients with Comments (COMMENTS):",
+                                  as_dataframe=as_dataframe)
             logging.info("Comments query executed successfully.")
 
-            print("\nHigh Billing Patients with Comments (COMMENTS):")
-            print(df.to_string(index=False))
-
-            output_csv = 'comments_results.csv'
-            df.to_csv(output_csv, index=False)
-            logging.info(f"Results saved to {output_csv}")
-            print(f"\nResults saved to '{output_csv}'.")
-
-            return df
+            return result
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
@@ -1,7 +1,8 @@
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_sink import export_query
 
 # Configure logging
 logging.basicConfig(
@@ -10,14 +11,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def query_full_join(db_name='healthcare.db'):
-    """Execute FULL JOIN query between healthcare and doctors tables."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+def query_full_join(db_name='healthcare.db', as_dataframe=False):
+    """Execute FULL JOIN query between healthcare and doctors tables.
 
-        with sqlite3.connect(db_name) as conn:
+    db_name is a database path, an open sqlite3 connection or a ConnectionPool such as a QueryCache.
+    """
+    try:
+        with db_connection(db_name, read_only=True) as conn:
             logging.info("Connected to database successfully.")
             print("Connected to database successfully.")
 
@@ -33,18 +33,12 @@ def query_full_join(db_name='healthcare.db'):
             """
             # SQLite does not support FULL JOIN; we use LEFT JOIN + UNION
 
-            df = pd.read_sql_query(query, conn)
+            result = export_query(conn, query, 'full_join_results.csv',
+                                  "\nAll Patients and Doctors (FULL JOIN):",
+                                  as_dataframe=as_dataframe)
             logging.info("FULL JOIN query executed successfully.")
 
-            print("\nAll Patients and Doctors (FULL JOIN):")
-            print(df.to_string(index=False))
-
-            output_csv = 'full_join_results.csv'
-            df.to_csv(output_csv, index=False)
-            logging.info(f"Results saved to {output_csv}")
-            print(f"\nResults saved to '{output_csv}'.")
-
-            return df
+            return result
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
@@ -1,7 +1,8 @@
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_sink import export_query
 
 # Configure logging
 logging.basicConfig(
@@ -10,14 +11,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def query_group_by(db_name='healthcare.db'):
-    """Execute GROUP BY query on healthcare table."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+def query_group_by(db_name='healthcare.db', as_dataframe=False):
+    """Execute GROUP BY query on healthcare table.
 
-        with sqlite3.connect(db_name) as conn:
+    db_name is a database path, an open sqlite3 connection or a ConnectionPool such as a QueryCache.
+    """
+    try:
+        with db_connection(db_name, read_only=True) as conn:
             logging.info("Connected to database successfully.")
             print("Connected to database successfully.")
 
@@ -28,18 +28,12 @@ def query_group_by(db_name='healthcare.db'):
             ORDER BY average_billing DESC;
             """
 
-            df = pd.read_sql_query(query, conn)
+            result = export_query(conn, query, 'group_by_results.csv',
+                                  "\nAverage Billing Amount by Medical Condition (GROUP BY):",
+                                  as_dataframe=as_dataframe)
             logging.info("GROUP BY query executed successfully.")
 
-            print("\nAverage Billing Amount by Medical Condition (GROUP BY):")
-            print(df.to_string(index=False))
-
-            output_csv = 'group_by_results.csv'
-            df.to_csv(output_csv, index=False)
-            logging.info(f"Results saved to {output_csv}")
-            print(f"\nResults saved to '{output_csv}'.")
-
-            return df
+            return result
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
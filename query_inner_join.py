@@ -1,7 +1,8 @@
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_sink import export_query, print_preview
 
 # Configure logging
 logging.basicConfig(
@@ -10,14 +11,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def query_inner_join(db_name='healthcare.db'):
-    """Execute INNER JOIN query between healthcare and doctors tables."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+def query_inner_join(db_name='healthcare.db', as_dataframe=False):
+    """Execute INNER JOIN query between healthcare and doctors tables.
 
-        with sqlite3.connect(db_name) as conn:
+    db_name is a database path, an open sqlite3 connection or a ConnectionPool such as a QueryCache.
+    """
+    try:
+        with db_connection(db_name, read_only=True) as conn:
             logging.info("Connected to database successfully.")
             print("Connected to database successfully.")
 
@@ -25,9 +25,9 @@ def query_inner_join(db_name='healthcare.db'):
             healthcare_doctors = pd.read_sql_query("SELECT DISTINCT doctor FROM healthcare", conn)
             doctors_table = pd.read_sql_query("SELECT doctor_name FROM doctors", conn)
             print("\nDoctors in healthcare table:")
-            print(healthcare_doctors.to_string(index=False))
+            print_preview(healthcare_doctors)
             print("\nDoctors in doctors table:")
-            print(doctors_table.to_string(index=False))
+            print_preview(doctors_table)
             logging.info("Inspected healthcare and doctors tables.")
 
             query = """
@@ -38,18 +38,12 @@ def query_inner_join(db_name='healthcare.db'):
             ORDER BY patient_count DESC;
             """
 
-            df = pd.read_sql_query(query, conn)
+            result = export_query(conn, query, 'inner_join_results.csv',
+                                  "\nPatient Count by Medical Condition, Doctor, and Specialty (INNER JOIN):",
+                                  as_dataframe=as_dataframe)
             logging.info("INNER JOIN query executed successfully.")
 
-            print("\nPatient Count by Medical Condition, Doctor, and Specialty (INNER JOIN):")
-            print(df.to_string(index=False))
-
-            output_csv = 'inner_join_results.csv'
-            df.to_csv(output_csv, index=False)
-            logging.info(f"Results saved to {output_csv}")
-            print(f"\nResults saved to '{output_csv}'.")
-
-            return df
+            return result
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
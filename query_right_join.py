@@ -1,7 +1,8 @@
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_sink import export_query
 
 # Configure logging
 logging.basicConfig(
@@ -10,14 +11,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def query_right_join(db_name='healthcare.db'):
-    """Execute RIGHT JOIN query between doctors and healthcare tables."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+def query_right_join(db_name='healthcare.db', as_dataframe=False):
+    """Execute RIGHT JOIN query between doctors and healthcare tables.
 
-        with sqlite3.connect(db_name) as conn:
+    db_name is a database path, an open sqlite3 connection or a ConnectionPool such as a QueryCache.
+    """
+    try:
+        with db_connection(db_name, read_only=True) as conn:
             logging.info("Connected to database successfully.")
             print("Connected to database successfully.")
 
@@ -30,18 +30,12 @@ def query_right_join(db_name='healthcare.db'):
             """
             # Note: SQLite does not support RIGHT JOIN directly; we use LEFT JOIN with tables reversed
 
-            df = pd.read_sql_query(query, conn)
+            result = export_query(conn, query, 'right_join_results.csv',
+                                  "\nDoctors with Patient Counts and Medical Conditions (RIGHT JOIN):",
+                                  as_dataframe=as_dataframe)
             logging.info("RIGHT JOIN query executed successfully.")
 
-            print("\nDoctors with Patient Counts and Medical Conditions (RIGHT JOIN):")
-            print(df.to_string(index=False))
-
-            output_csv = 'right_join_results.csv'
-            df.to_csv(output_csv, index=False)
-            logging.info(f"Results saved to {output_csv}")
-            print(f"\nResults saved to '{output_csv}'.")
-
-            return df
+            return result
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
@@ -1,7 +1,9 @@
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_cache import bump_data_version
+from query_sink import export_query
 
 # Configure logging
 logging.basicConfig(
@@ -10,14 +12,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def query_select_into(db_name='healthcare.db'):
-    """Execute SELECT INTO query to create a new table."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+def query_select_into(db_name='healthcare.db', as_dataframe=False):
+    """Execute SELECT INTO query to create a new table.
 
-        with sqlite3.connect(db_name) as conn:
+    db_name is a database path, an open sqlite3 connection or a writable ConnectionPool.
+    """
+    try:
+        with db_connection(db_name) as conn:
             cursor = conn.cursor()
             logging.info("Connected to database successfully.")
             print("Connected to database successfully.")
@@ -35,21 +36,16 @@ def query_select_into(db_name='healthcare.db'):
             """
 
             cursor.execute(query)
+            bump_data_version(conn)
             conn.commit()
             logging.info("SELECT INTO query executed successfully.")
 
             # Retrieve results
-            df = pd.read_sql_query("SELECT * FROM high_billing_patients", conn)
-            
-            print("\nHigh Billing Patients (> 20000) (SELECT INTO):")
-            print(df.to_string(index=False))
-
-            output_csv = 'select_into_results.csv'
-            df.to_csv(output_csv, index=False)
-            logging.info(f"Results saved to {output_csv}")
-            print(f"\nResults saved to '{output_csv}'.")
+            result = export_query(conn, "SELECT * FROM high_billing_patients", 'select_into_results.csv',
+                                  "\nHigh Billing Patients (> 20000) (SELECT INTO):",
+                                  as_dataframe=as_dataframe)
 
-            return df
+            return result
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
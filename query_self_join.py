@@ -1,7 +1,9 @@
+import argparse
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_sink import BATCH_ROWS, PREVIEW_ROWS, export_query
 
 # Configure logging
 logging.basicConfig(
@@ -10,36 +12,86 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def query_self_join(db_name='healthcare.db'):
-    """Execute SELF JOIN query on healthcare table."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+# 'pairs' lists every pair, 'count' the number of pairs per condition, 'stream' the pairs without a preview
+SELF_JOIN_MODES = ('pairs', 'count', 'stream')
 
-        with sqlite3.connect(db_name) as conn:
-            logging.info("Connected to database successfully.")
-            print("Connected to database successfully.")
+# Every patient pairs with each later patient (by record_id) of the same condition: n * (n - 1) / 2 pairs
+PAIR_COUNT_QUERY = """
+SELECT medical_condition, COUNT(record_id) AS patients,
+       COUNT(record_id) * (COUNT(record_id) - 1) / 2 AS patient_pairs
+FROM healthcare
+WHERE medical_condition IS NOT NULL
+GROUP BY medical_condition
+ORDER BY patient_pairs DESC, medical_condition;
+"""
 
-            query = """
+
+def pair_query(patients_per_condition=None, limit=None):
+    """Build the self join and its parameters, optionally over a sample of patients and capped.
+
+    The sample keeps the first `patients_per_condition` patients of each condition by
+    record_id, a hash of the business key, so it is pseudo-random but repeatable.
+    """
+    params = []
+    source = 'healthcare'
+    query = ''
+    if patients_per_condition is not None:
+        query = """
+            WITH sampled AS MATERIALIZED (
+                SELECT record_id, name, medical_condition
+                FROM (
+                    SELECT record_id, name, medical_condition,
+                           ROW_NUMBER() OVER (PARTITION BY medical_condition ORDER BY record_id) AS position
+                    FROM healthcare
+                    WHERE medical_condition IS NOT NULL
+                )
+                WHERE position <= ?
+            )"""
+        params.append(patients_per_condition)
+        source = 'sampled'
+    query += f"""
             SELECT h1.name AS patient1, h2.name AS patient2, h1.medical_condition
-            FROM healthcare h1
-            INNER JOIN healthcare h2 ON h1.medical_condition = h2.medical_condition
-            WHERE h1.record_id < h2.record_id;
-            """
+            FROM {source} h1
+            INNER JOIN {source} h2 ON h1.medical_condition = h2.medical_condition
+            WHERE h1.record_id < h2.record_id"""
+    if limit is not None:
+        query += "\n            LIMIT ?"
+        params.append(limit)
+    return query + ";", params
 
-            df = pd.read_sql_query(query, conn)
-            logging.info("SELF JOIN query executed successfully.")
 
-            print("\nPatients with Same Medical Condition (SELF JOIN):")
-            print(df.to_string(index=False))
+def query_self_join(db_name='healthcare.db', mode='pairs', limit=None, patients_per_condition=None,
+                    batch_size=BATCH_ROWS, output_csv='self_join_results.csv', as_dataframe=False):
+    """Execute SELF JOIN query on healthcare table.
 
-            output_csv = 'self_join_results.csv'
-            df.to_csv(output_csv, index=False)
-            logging.info(f"Results saved to {output_csv}")
-            print(f"\nResults saved to '{output_csv}'.")
+    The pairs grow with the square of the patients per condition. mode='count' returns
+    the pairs per condition from one grouped scan instead; mode='stream' writes the
+    pairs without a console preview. `limit` caps the pairs and `patients_per_condition`
+    samples the patients joined. Rows are streamed to output_csv in `batch_size` batches
+    and their number returned, or returned as a DataFrame with as_dataframe.
+    db_name is a database path, an open sqlite3 connection or a ConnectionPool such as a QueryCache.
+    """
+    if mode not in SELF_JOIN_MODES:
+        raise ValueError(f"Unsupported self join mode: {mode}")
+    try:
+        with db_connection(db_name, read_only=True) as conn:
+            logging.info("Connected to database successfully.")
+            print("Connected to database successfully.")
+
+            if mode == 'count':
+                result = export_query(conn, PAIR_COUNT_QUERY, output_csv,
+                                      "\nPatient Pairs with Same Medical Condition (SELF JOIN, counted):",
+                                      as_dataframe=as_dataframe, batch_size=batch_size)
+                logging.info("SELF JOIN pair count executed successfully.")
+                return result
+
+            query, params = pair_query(patients_per_condition, limit)
+            result = export_query(conn, query, output_csv, "\nPatients with Same Medical Condition (SELF JOIN):",
+                                  params=params, as_dataframe=as_dataframe, batch_size=batch_size,
+                                  preview_rows=0 if mode == 'stream' else PREVIEW_ROWS)
+            logging.info("SELF JOIN query executed successfully.")
 
-            return df
+            return result
 
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
@@ -51,8 +103,16 @@ def query_self_join(db_name='healthcare.db'):
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pair patients with the same medical condition.")
+    parser.add_argument('--mode', choices=SELF_JOIN_MODES, default='pairs')
+    parser.add_argument('--limit', type=int, default=None, help="Return at most this many pairs")
+    parser.add_argument('--patients-per-condition', type=int, default=None,
+                        help="Join a repeatable sample of this many patients per condition")
+    parser.add_argument('--batch-size', type=int, default=BATCH_ROWS, help="Rows fetched from the cursor per batch")
+    args = parser.parse_args()
     try:
-        query_self_join()
+        query_self_join(mode=args.mode, limit=args.limit, patients_per_condition=args.patients_per_condition,
+                        batch_size=args.batch_size)
         logging.info("Script completed successfully.")
     except Exception as e:
         logging.error(f"Script failed: {e}")
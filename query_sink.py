@@ -0,0 +1,111 @@
+import csv
+import logging
+import os
+import pandas as pd
+
+# Rows printed to the console; the full result only goes to the CSV file
+PREVIEW_ROWS = 20
+
+# Rows pulled from the cursor per fetchmany call
+BATCH_ROWS = 10000
+
+
+class CsvSink:
+    """Write query rows to a CSV file as they are fetched, keeping only the first rows for a preview."""
+
+    def __init__(self, output_csv, preview_rows=PREVIEW_ROWS, batch_size=BATCH_ROWS):
+        self.output_csv = output_csv
+        self.preview_rows = preview_rows
+        self.batch_size = batch_size
+        self.columns = []
+        self.preview = []
+        self.rows = 0
+
+    def write(self, cursor, keep_rows=0):
+        """Drain a cursor into the CSV file `batch_size` rows at a time; return the rows written.
+
+        Results of up to `keep_rows` rows are also kept in self.kept, for a query cache.
+        """
+        self.columns = [column[0] for column in cursor.description or ()]
+        self.kept = []
+        with open(self.output_csv, 'w', newline='') as f:
+            # Same line endings as DataFrame.to_csv
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(self.columns)
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                if len(self.preview) < self.preview_rows:
+                    self.preview.extend(rows[:self.preview_rows - len(self.preview)])
+                writer.writerows(rows)
+                self.rows += len(rows)
+                if self.kept is not None and self.rows <= keep_rows:
+                    self.kept.extend(rows)
+                else:
+                    self.kept = None
+        return self.rows
+
+    def write_rows(self, columns, rows):
+        """Write rows already in memory, such as a cached result; return the rows written."""
+        self.columns = list(columns)
+        self.preview = list(rows[:self.preview_rows])
+        with open(self.output_csv, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(self.columns)
+            writer.writerows(rows)
+        self.rows = len(rows)
+        return self.rows
+
+    def preview_frame(self):
+        return pd.DataFrame(self.preview, columns=self.columns)
+
+
+def print_preview(df, total_rows=None, preview_rows=PREVIEW_ROWS):
+    """Print the first `preview_rows` rows of a result and how many more there are."""
+    total_rows = len(df) if total_rows is None else total_rows
+    shown = min(len(df), preview_rows)
+    if not preview_rows:
+        print(f"{total_rows} rows")
+        return
+    print(df.head(preview_rows).to_string(index=False))
+    if total_rows > shown:
+        print(f"... {total_rows - shown} more rows ({total_rows} in total)")
+
+
+def export_query(conn, query, output_csv, title, params=(), as_dataframe=False, preview_rows=PREVIEW_ROWS,
+                 batch_size=BATCH_ROWS):
+    """Run a query, write its result to output_csv and print a preview of it under `title`.
+
+    Rows go from the cursor to the CSV file in fetchmany batches, so memory stays the
+    same whatever the size of the result, and the number of rows written is returned.
+    With as_dataframe the whole result is read into a DataFrame, written and returned.
+    On a connection from a QueryCache a repeat query is answered from the cache.
+    """
+    cache = getattr(conn, 'query_cache', None)
+    if as_dataframe:
+        df = cache.read_sql(query, params) if cache else pd.read_sql_query(query, conn, params=params)
+        print(title)
+        print_preview(df, preview_rows=preview_rows)
+        df.to_csv(output_csv, index=False)
+        result = df
+    else:
+        sink = CsvSink(output_csv, preview_rows, batch_size)
+        key = cache.key(conn, query, params) if cache else None
+        entry = cache.get(key) if cache else None
+        if entry is not None:
+            sink.write_rows(entry['columns'], entry['rows'])
+        else:
+            cursor = conn.execute(query, params)
+            try:
+                sink.write(cursor, keep_rows=cache.max_rows if key is not None else 0)
+            finally:
+                cursor.close()
+            if key is not None and sink.kept is not None:
+                cache.put(key, sink.columns, sink.kept)
+        print(title)
+        print_preview(sink.preview_frame(), sink.rows, preview_rows)
+        result = sink.rows
+    logging.info(f"Results saved to {output_csv}")
+    print(f"\nResults saved to '{output_csv}'.")
+    return result
@@ -1,7 +1,8 @@
 import sqlite3
 import pandas as pd
 import logging
-import os
+from db_connection import db_connection
+from query_sink import export_query
 
 # Configure logging
 logging.basicConfig(
@@ -10,17 +11,18 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def get_patients_by_condition(db_name, condition):
-    """Mimic a stored procedure to get patients by medical condition."""
-    try:
-        with sqlite3.connect(db_name) as conn:
-            query = """
+PATIENTS_BY_CONDITION_QUERY = """
             SELECT name, medical_condition, billing_amount
             FROM healthcare
             WHERE medical_condition = ?
             ORDER BY billing_amount DESC;
             """
-            df = pd.read_sql_query(query, conn, params=(condition,))
+
+def get_patients_by_condition(db_name, condition):
+    """Mimic a stored procedure to get patients by medical condition."""
+    try:
+        with db_connection(db_name, read_only=True) as conn:
+            df = pd.read_sql_query(PATIENTS_BY_CONDITION_QUERY, conn, params=(condition,))
             return df
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
@@ -29,29 +31,23 @@ def get_patients_by_condition(db_name, condition):
         logging.error(f"Error: {e}")
         raise
 
-def query_stored_procedure(db_name='healthcare.db'):
-    """Execute a 'stored procedure' to get patients with Diabetes."""
-    try:
-        if not os.path.exists(db_name):
-            logging.error(f"Database file not found: {db_name}")
-            raise FileNotFoundError(f"Database file not found: {db_name}")
+def query_stored_procedure(db_name='healthcare.db', as_dataframe=False):
+    """Execute a 'stored procedure' to get patients with Diabetes.
 
+    db_name is a database path, an open sqlite3 connection or a ConnectionPool such as a QueryCache.
+    """
+    try:
         logging.info("Connected to database successfully.")
         print("Connected to database successfully.")
 
-        # Call the 'stored procedure'
-        df = get_patients_by_condition(db_name, 'Diabetes')
+        # Call the 'stored procedure', streaming its rows to CSV unless a DataFrame is wanted
+        with db_connection(db_name, read_only=True) as conn:
+            result = export_query(conn, PATIENTS_BY_CONDITION_QUERY, 'stored_procedure_results.csv',
+                                  "\nPatients with Diabetes (STORED PROCEDURE):", params=('Diabetes',),
+                                  as_dataframe=as_dataframe)
         logging.info("Stored procedure query executed successfully.")
 
-        print("\nPatients with Diabetes (STORED PROCEDURE):")
-        print(df.to_string(index=False))
-
-        output_csv = 'stored_procedure_results.csv'
-        df.to_csv(output_csv, index=False)
-        logging.info(f"Results saved to {output_csv}")
-        print(f"\nResults saved to '{output_csv}'.")
-
-        return df
+        return result
 
     except Exception as e:
         logging.error(f"Error: {e}")
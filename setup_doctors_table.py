@@ -1,6 +1,8 @@
 import sqlite3
 import pandas as pd
 import logging
+from db_connection import db_connection
+from query_cache import bump_data_version
 
 # Configure logging
 logging.basicConfig(
@@ -10,9 +12,12 @@ logging.basicConfig(
 )
 
 def setup_doctors_table(db_name='healthcare.db'):
-    """Create and populate doctors table in healthcare.db."""
+    """Create and populate doctors table in healthcare.db.
+
+    db_name is a database path, an open sqlite3 connection or a writable ConnectionPool.
+    """
     try:
-        with sqlite3.connect(db_name) as conn:
+        with db_connection(db_name, must_exist=False) as conn:
             cursor = conn.cursor()
             logging.info("Connected to database successfully.")
             print("Connected to database successfully.")
@@ -40,6 +45,7 @@ def setup_doctors_table(db_name='healthcare.db'):
                 INSERT OR IGNORE INTO doctors (doctor_name, specialty)
                 VALUES (?, ?)
             ''', doctors_data)
+            bump_data_version(conn)
             conn.commit()
             logging.info(f"Inserted {cursor.rowcount} records into doctors table.")
             print(f"Inserted {cursor.rowcount} records into doctors table.")
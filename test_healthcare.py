@@ -4,11 +4,16 @@ import pandas as pd
 import os
 import sys
 import logging
+import shutil
+import json
+import subprocess
+import pickle
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from healthcare_etl_chunked_fixed import HealthcareETL
 from setup_doctors_table import setup_doctors_table
 from query_group_by import query_group_by
 from query_inner_join import query_inner_join
+from query_left_join import query_left_join
 from query_right_join import query_right_join
 from query_full_join import query_full_join
 from query_self_join import query_self_join
@@ -23,6 +28,29 @@ from query_null_functions import query_null_functions
 from query_stored_procedure import query_stored_procedure
 from query_comments import query_comments
 from query_operators import query_operators
+from healthcare_etl import HealthcareETL as CleaningETL
+from benchmark_clean_columns import legacy_clean_specific_columns
+from columnar_snapshot import export_snapshot, refresh_snapshot, load_snapshot
+from etl_extract_backends import read_csv_chunks, available_backends, select_backend
+from etl_dates import DateParser, LENGTH_OF_STAY_SQL, year_day_range
+from etl_chunk_sizing import AdaptiveChunkSizer
+from db_connection import ConnectionPool
+from etl_multi_source import MultiSourceETL
+from generate_healthcare_data import generate_csv
+from benchmark_etl import run_suite, compare_results
+import benchmark_queries
+from etl_indexes import HEALTHCARE_INDEXES, IndexAdvisor
+from etl_options import EtlOptions
+from etl_storage import keyed_aggregate_sql
+from etl_checkpoint import complete_line_ends
+from query_sink import PREVIEW_ROWS, CsvSink
+from query_cache import QueryCache
+from etl_pipeline import run_pipelined
+import threading
+import contextlib
+import io
+import gzip
+import lzma
 
 # Configure logging
 logging.basicConfig(
@@ -31,6 +59,17 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+
+class CountingTransform:
+    """Pipeline transform that numbers the chunks its own copy has seen."""
+    def __init__(self):
+        self.calls = 0
+
+    def transform(self, chunk):
+        self.calls += 1
+        return chunk.assign(calls=self.calls)
+
+
 class TestHealthcareProject(unittest.TestCase):
     def setUp(self):
         """Set up test environment."""
@@ -77,7 +116,9 @@ class TestHealthcareProject(unittest.TestCase):
             'having_results.csv', 'exists_results.csv', 'any_all_results.csv',
             'select_into_results.csv', 'insert_into_select_results.csv', 'case_results.csv',
             'null_functions_results.csv', 'stored_procedure_results.csv', 'comments_results.csv',
-            'operators_results.csv', 'empty_test.csv'
+            'operators_results.csv', 'empty_test.csv', 'resume_test.csv', 'dedup_test.csv', 'missing_test.csv', 'etl_run_report.json',
+            'compressed_test.csv.gz', 'compressed_test_xz', 'invalid_test.csv',
+            'synthetic_test.csv', 'synthetic_test_2.csv', 'self_join_stream.csv'
         ]
         for csv in csv_files:
             if os.path.exists(csv):
@@ -86,6 +127,9 @@ class TestHealthcareProject(unittest.TestCase):
                     logging.info(f"Deleted {csv}")
                 except PermissionError:
                     logging.warning(f"Could not delete {csv}: File in use.")
+        for directory in ('test_snapshot', 'test_sources', 'test_benchmark_data', 'test_query_cache'):
+            if os.path.exists(directory):
+                shutil.rmtree(directory, ignore_errors=True)
         logging.info("Test teardown completed.")
 
     def test_etl_pipeline(self):
@@ -123,7 +167,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_group_by(db_name=self.test_db)
+            df = query_group_by(db_name=self.test_db, as_dataframe=True)
             expected = pd.DataFrame({
                 'medical_condition': ['Diabetes', 'Hypertension', 'Arthritis'],
                 'average_billing': [27500.25, 18000.75, 15000.20]
@@ -145,7 +189,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_inner_join(db_name=self.test_db)
+            df = query_inner_join(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 4, "Expected 4 rows in INNER JOIN results")
             self.assertIn('Cardiology', df['specialty'].values, "Expected specialty not found")
             self.assertTrue(os.path.exists('inner_join_results.csv'), "INNER JOIN CSV output not found")
@@ -159,7 +203,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_right_join(db_name=self.test_db)
+            df = query_right_join(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 5, "Expected 5 rows in RIGHT JOIN results")
             self.assertIn('Pediatrics', df['specialty'].values, "Expected specialty not found")
             self.assertTrue(df[df['doctor_name'] == 'Dr. Sarah Davis']['patient_count'].iloc[0] == 0, "Expected 0 patients for Dr. Sarah Davis")
@@ -174,7 +218,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_full_join(db_name=self.test_db)
+            df = query_full_join(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 5, "Expected 5 rows in FULL JOIN results")
             self.assertIn('Pediatrics', df['specialty'].values, "Expected specialty not found")
             self.assertTrue(df[df['doctor_name'] == 'Dr. Sarah Davis']['record_id'].isna().iloc[0], "Expected no patient data for Dr. Sarah Davis")
@@ -189,7 +233,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_self_join(db_name=self.test_db)
+            df = query_self_join(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 1, "Expected 1 row in SELF JOIN results")
             self.assertEqual(df['medical_condition'].iloc[0], 'Diabetes', "Expected Diabetes in SELF JOIN")
             self.assertTrue(set(df[['patient1', 'patient2']].values.flatten()).issubset({'John Doe', 'Alice Brown'}), "Expected John Doe and Alice Brown")
@@ -199,12 +243,41 @@ class TestHealthcareProject(unittest.TestCase):
             logging.error(f"SELF JOIN test failed: {e}")
             raise
 
+    def test_self_join_modes(self):
+        """Test the SELF JOIN pair count, streamed pairs, cap and sample agree with the full join."""
+        try:
+            generate_csv('synthetic_test.csv', 600, seed=3)
+            HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=200).run()
+            pairs = query_self_join(db_name=self.test_db, as_dataframe=True)
+            counts = query_self_join(db_name=self.test_db, mode='count', as_dataframe=True)
+            self.assertEqual(counts['patient_pairs'].sum(), len(pairs), "Counted pairs should match the full join")
+            self.assertEqual(dict(zip(counts['medical_condition'], counts['patient_pairs'])),
+                             pairs['medical_condition'].value_counts().to_dict())
+
+            streamed = query_self_join(db_name=self.test_db, mode='stream', batch_size=1000,
+                                       output_csv='self_join_stream.csv')
+            self.assertEqual(streamed, len(pairs))
+            pd.testing.assert_frame_equal(pd.read_csv('self_join_stream.csv', keep_default_na=False), pairs)
+
+            self.assertEqual(query_self_join(db_name=self.test_db, limit=7), 7)
+            sample = query_self_join(db_name=self.test_db, patients_per_condition=10, as_dataframe=True)
+            self.assertTrue((sample['medical_condition'].value_counts() == 45).all(),
+                            "10 sampled patients per condition should give 45 pairs each")
+            pd.testing.assert_frame_equal(sample, query_self_join(db_name=self.test_db, patients_per_condition=10,
+                                                                  as_dataframe=True))
+            with self.assertRaises(ValueError):
+                query_self_join(db_name=self.test_db, mode='all')
+            logging.info("SELF JOIN modes test passed.")
+        except Exception as e:
+            logging.error(f"SELF JOIN modes test failed: {e}")
+            raise
+
     def test_union_query(self):
         """Test the UNION query script."""
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_union(db_name=self.test_db)
+            df = query_union(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 9, "Expected 9 rows in UNION results")
             self.assertTrue(set(df['role']).issubset({'Patient', 'Doctor'}), "Expected Patient and Doctor roles")
             self.assertIn('John Doe', df['person_name'].values, "Expected patient name not found")
@@ -220,7 +293,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_having(db_name=self.test_db)
+            df = query_having(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 1, "Expected 1 row in HAVING results")
             self.assertEqual(df['medical_condition'].iloc[0], 'Diabetes', "Expected Diabetes in HAVING")
             self.assertGreater(df['average_billing'].iloc[0], 20000, "Expected average billing > 20000")
@@ -235,7 +308,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_exists(db_name=self.test_db)
+            df = query_exists(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 4, "Expected 4 rows in EXISTS results")
             self.assertNotIn('Dr. Sarah Davis', df['doctor_name'].values, "Dr. Sarah Davis should not appear")
             self.assertIn('Cardiology', df['specialty'].values, "Expected specialty not found")
@@ -250,7 +323,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_any_all(db_name=self.test_db)
+            df = query_any_all(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 3, "Expected 3 rows in ANY results")
             self.assertTrue(all(df['billing_amount'] > 15000.20), "Expected all billing amounts > Arthritis billing")
             self.assertIn('Diabetes', df['medical_condition'].values, "Expected condition not found")
@@ -265,7 +338,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_select_into(db_name=self.test_db)
+            df = query_select_into(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 2, "Expected 2 rows in SELECT INTO results")
             self.assertTrue(all(df['billing_amount'] > 20000), "Expected all billing amounts > 20000")
             self.assertIn('Diabetes', df['medical_condition'].values, "Expected condition not found")
@@ -283,7 +356,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_insert_into_select(db_name=self.test_db)
+            df = query_insert_into_select(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 2, "Expected 2 rows in INSERT INTO SELECT results")
             self.assertTrue(all(df['billing_amount'] > 20000), "Expected all billing amounts > 20000")
             self.assertIn('Diabetes', df['medical_condition'].values, "Expected condition not found")
@@ -301,7 +374,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_case(db_name=self.test_db)
+            df = query_case(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 4, "Expected 4 rows in CASE results")
             self.assertEqual(df[df['billing_amount'] > 25000]['billing_category'].iloc[0], 'High', "Expected High category")
             self.assertEqual(df[df['billing_amount'] <= 15000.20]['billing_category'].iloc[0], 'Low', "Expected Low category")
@@ -316,7 +389,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_null_functions(db_name=self.test_db)
+            df = query_null_functions(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 4, "Expected 4 rows in NULL FUNCTIONS results")
             self.assertTrue(all(df['medical_condition'] != None), "Expected no null medical conditions")
             self.assertIn('Diabetes', df['medical_condition'].values, "Expected condition not found")
@@ -331,7 +404,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_stored_procedure(db_name=self.test_db)
+            df = query_stored_procedure(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 2, "Expected 2 rows in STORED PROCEDURE results")
             self.assertTrue(all(df['medical_condition'] == 'Diabetes'), "Expected all Diabetes conditions")
             self.assertIn('John Doe', df['name'].values, "Expected patient name not found")
@@ -346,7 +419,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_comments(db_name=self.test_db)
+            df = query_comments(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 2, "Expected 2 rows in COMMENTS results")
             self.assertTrue(all(df['billing_amount'] > 20000), "Expected all billing amounts > 20000")
             self.assertIn('Diabetes', df['medical_condition'].values, "Expected condition not found")
@@ -361,7 +434,7 @@ class TestHealthcareProject(unittest.TestCase):
         try:
             self.etl.run()
             setup_doctors_table(db_name=self.test_db)
-            df = query_operators(db_name=self.test_db)
+            df = query_operators(db_name=self.test_db, as_dataframe=True)
             self.assertEqual(len(df), 1, "Expected 1 row in OPERATORS results")
             self.assertEqual(df['name'].iloc[0], 'Jane Smith', "Expected Jane Smith")
             self.assertEqual(df['medical_condition'].iloc[0], 'Hypertension', "Expected Hypertension")
@@ -402,5 +475,835 @@ class TestHealthcareProject(unittest.TestCase):
             logging.error(f"Empty CSV test failed: {e}")
             raise
 
+    def test_vectorized_column_cleaning_matches_legacy(self):
+        """Test vectorized clean_specific_columns against the row-wise implementation."""
+        try:
+            chunk = pd.DataFrame({
+                'name': ['Dr. John Doe', 'Mrs. Jane Smith', 'Bob Jones MD', 'MD Alice Brown', 'Mr.  Tom Lee '],
+                'gender': ['male', 'FEMALE', 'Other', 'Male', 'female'],
+                'blood_type': ['A+', 'ab+', 'O-', 'X', 'AB-'],
+                'medical_condition': ['diabetes', 'HYPERTENSION', 'arthritis', 'Diabetes', 'asthma'],
+                'test_results': ['Normal', 'abnormal', 'Inconclusive', 'Pending', 'Abnormal']
+            })
+            etl = CleaningETL(self.test_csv, db_name=':memory:')
+            actual = etl.clean_specific_columns(chunk.copy())
+            etl.close_connection()
+            expected = legacy_clean_specific_columns(chunk.copy())
+            pd.testing.assert_frame_equal(actual, expected)
+            logging.info("Vectorized column cleaning test passed.")
+        except Exception as e:
+            logging.error(f"Vectorized column cleaning test failed: {e}")
+            raise
+
+    def test_pipelined_etl_preserves_order(self):
+        """Test the multi-process ETL run loads every chunk in file order."""
+        try:
+            self.etl = HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=1, workers=2, prefetch=1)
+            self.etl.run()
+            with sqlite3.connect(self.test_db) as conn:
+                df = pd.read_sql_query("SELECT name FROM healthcare ORDER BY rowid", conn)
+            expected = pd.read_csv(self.test_csv)['Name'].tolist()
+            self.assertEqual(df['name'].tolist(), expected, "Pipelined load changed the chunk order")
+            worker_etl = pickle.loads(pickle.dumps(self.etl))
+            self.assertEqual(len(worker_etl.date_parser.cache), 0, "Parsed dates should not be sent to workers")
+            self.assertEqual(worker_etl.metrics.stages, {}, "Run metrics should not be sent to workers")
+
+            # Each worker gets the transform's object once and keeps it, with its caches, for every chunk
+            loaded = []
+            chunks = (pd.DataFrame({'row': [i]}) for i in range(3))
+            run_pipelined(CountingTransform().transform, chunks, loaded.append, workers=1, prefetch=1)
+            self.assertEqual([int(chunk['calls'].iloc[0]) for chunk in loaded], [1, 2, 3])
+            logging.info("Pipelined ETL test passed.")
+        except Exception as e:
+            logging.error(f"Pipelined ETL test failed: {e}")
+            raise
+
+    def test_bulk_load_mode(self):
+        """Test the bulk-load path loads every row and restores the journal mode."""
+        try:
+            self.etl = HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=1,
+                                     options=EtlOptions(bulk_load=True, commit_every=3))
+            self.etl.run()
+            with sqlite3.connect(self.test_db) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+                journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+                admission = conn.execute("SELECT date_of_admission FROM healthcare WHERE name = 'John Doe'").fetchone()[0]
+            self.assertEqual(count, 4, "Bulk load did not load every row")
+            self.assertEqual(journal_mode, 'delete', "Journal mode was not restored after bulk load")
+            self.assertEqual(admission, '2023-05-15 00:00:00', "Bulk load wrote dates in a different format than to_sql")
+            logging.info("Bulk load test passed.")
+        except Exception as e:
+            logging.error(f"Bulk load test failed: {e}")
+            raise
+
+    def test_reingest_is_idempotent(self):
+        """Test re-running the ETL on the same CSV keeps one row per business key."""
+        try:
+            self.etl.run()
+            with sqlite3.connect(self.test_db) as conn:
+                first_ids = pd.read_sql_query("SELECT record_id FROM healthcare ORDER BY record_id", conn)
+            HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=3).run()
+            HealthcareETL(self.test_csv, db_name=self.test_db, bulk_load=True, on_conflict='ignore').run()
+            with sqlite3.connect(self.test_db) as conn:
+                second_ids = pd.read_sql_query("SELECT record_id FROM healthcare ORDER BY record_id", conn)
+            self.assertEqual(len(second_ids), 4, "Re-ingesting the same CSV added rows")
+            pd.testing.assert_frame_equal(first_ids, second_ids)
+            logging.info("Idempotent re-ingest test passed.")
+        except Exception as e:
+            logging.error(f"Idempotent re-ingest test failed: {e}")
+            raise
+
+    def test_resumable_incremental_ingest(self):
+        """Test resumable runs only ingest rows appended since the last checkpoint."""
+        try:
+            with open(self.test_csv) as f:
+                lines = [line.rstrip('\n') + '\n' for line in f]
+            resume_csv = 'resume_test.csv'
+            with open(resume_csv, 'w') as f:
+                f.writelines(lines[:3])
+            HealthcareETL(resume_csv, db_name=self.test_db, chunksize=1, resume=True).run()
+            with open(resume_csv, 'a') as f:
+                f.writelines(lines[3:])
+            HealthcareETL(resume_csv, db_name=self.test_db, chunksize=1, resume=True).run()
+            with sqlite3.connect(self.test_db) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+                checkpoint = pd.read_sql_query(
+                    "SELECT chunk_index, row_number FROM etl_checkpoints ORDER BY chunk_index DESC LIMIT 1", conn)
+            self.assertEqual(count, 4, "Resumed run did not load the appended rows")
+            self.assertEqual(checkpoint['chunk_index'][0], 3, "Expected one checkpoint per chunk")
+            self.assertEqual(checkpoint['row_number'][0], 4, "Checkpoint row number should cover the whole file")
+
+            # Nothing new to read: no more chunks and no more rows
+            HealthcareETL(resume_csv, db_name=self.test_db, chunksize=1, resume=True).run()
+            with sqlite3.connect(self.test_db) as conn:
+                chunks = conn.execute("SELECT COUNT(*) FROM etl_checkpoints").fetchone()[0]
+            self.assertEqual(chunks, 4, "Run without new data should not add checkpoints")
+
+            # A row still being appended is left for a later run, then loaded whole once its newline arrives
+            late_row = lines[1].replace('John Doe', 'Late Row').replace('25000.50', '12345.67')
+            for part in (late_row[:40], late_row[40:]):
+                with open(resume_csv, 'a') as f:
+                    f.write(part)
+                HealthcareETL(resume_csv, db_name=self.test_db, chunksize=1, resume=True).run()
+                with sqlite3.connect(self.test_db) as conn:
+                    rows = conn.execute("SELECT name, billing_amount FROM healthcare WHERE name LIKE 'Late%'").fetchall()
+                    chunks = conn.execute("SELECT COUNT(*) FROM etl_checkpoints").fetchone()[0]
+                conn.close()
+                if part is late_row[:40]:
+                    self.assertEqual((rows, chunks), ([], 4), "Half-written row should not be loaded or checkpointed")
+            self.assertEqual((rows, chunks), ([('Late Row', 12345.67)], 5), "Completed row should load whole")
+
+            # A finished file may end without a newline when the caller says so
+            with open(resume_csv, 'a') as f:
+                f.write(lines[2].replace('Jane Smith', 'Last Row').rstrip('\n'))
+            HealthcareETL(resume_csv, db_name=self.test_db, chunksize=1, resume=True, source_complete=True).run()
+            with sqlite3.connect(self.test_db) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+            conn.close()
+            self.assertEqual(count, 6, "Last line of a complete file should be loaded")
+            logging.info("Resumable ingest test passed.")
+        except Exception as e:
+            logging.error(f"Resumable ingest test failed: {e}")
+            raise
+
+    def test_resumable_ingest_uses_extract_backend(self):
+        """Test resumed runs parse with the configured extract backend and split records on quotes."""
+        try:
+            generate_csv('synthetic_test.csv', 600, seed=8)
+            with open('synthetic_test.csv') as f:
+                lines = f.readlines()
+            with open('resume_test.csv', 'w') as f:
+                f.writelines(lines[:301])
+            etl = HealthcareETL('resume_test.csv', db_name=self.test_db, chunksize=100, resume=True,
+                                extract_backend='csv')
+            etl.run()
+            self.assertEqual(etl.extract_backend, 'csv')
+            with open('resume_test.csv', 'a') as f:
+                f.writelines(lines[301:])
+            HealthcareETL('resume_test.csv', db_name=self.test_db, chunksize=100, resume=True,
+                          extract_backend='csv').run()
+            with sqlite3.connect(self.test_db) as conn:
+                resumed = pd.read_sql_query("SELECT * FROM healthcare ORDER BY name, date_of_admission", conn)
+            conn.close()
+            os.remove(self.test_db)
+            HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=100).run()
+            with sqlite3.connect(self.test_db) as conn:
+                expected = pd.read_sql_query("SELECT * FROM healthcare ORDER BY name, date_of_admission", conn)
+            conn.close()
+            pd.testing.assert_frame_equal(resumed, expected)
+
+            # A newline inside quotes does not end a record, even when the quote opens in an earlier block
+            ends, in_quotes = complete_line_ends(b'a,"multi\nline",1\nb,"open')
+            self.assertEqual((list(ends), in_quotes), ([17], 1))
+            ends, in_quotes = complete_line_ends(b'\nfield",2\nc,x,3\n', in_quotes)
+            self.assertEqual((list(ends), in_quotes), ([10, 16], 0))
+            logging.info("Resumable extract backend test passed.")
+        except Exception as e:
+            logging.error(f"Resumable extract backend test failed: {e}")
+            raise
+
+    def test_global_dedup_across_chunks(self):
+        """Test duplicates in different chunks are dropped by the global dedup stage."""
+        try:
+            with open(self.test_csv) as f:
+                lines = f.readlines()
+            dedup_csv = 'dedup_test.csv'
+            with open(dedup_csv, 'w') as f:
+                f.writelines([line.rstrip('\n') + '\n' for line in lines + lines[1:3]])
+            self.etl = HealthcareETL(dedup_csv, db_name=self.test_db, chunksize=2, global_dedup=True)
+            self.etl.run()
+            with sqlite3.connect(self.test_db) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+            self.assertEqual(count, 4, "Duplicates across chunks were loaded")
+            self.assertEqual(self.etl.deduplicator.dropped, 2, "Expected 2 duplicate rows dropped")
+
+            # Without a spill DB, keys beyond the memory limit go to a temporary file
+            os.remove(self.test_db)
+            self.etl = HealthcareETL(dedup_csv, db_name=self.test_db, chunksize=2, global_dedup=True, dedup_memory_keys=1)
+            self.etl.run()
+            deduplicator = self.etl.deduplicator
+            self.assertEqual(deduplicator.dropped, 2, "Spilled keys should still drop duplicates")
+            self.assertEqual(deduplicator.disk_keys, 4, "Keys over the memory limit should have spilled")
+            self.assertFalse(os.path.exists(deduplicator.temporary_db), "Temporary spill file should be removed")
+            logging.info("Global dedup test passed.")
+        except Exception as e:
+            logging.error(f"Global dedup test failed: {e}")
+            raise
+
+    def test_global_imputation_ignores_chunksize(self):
+        """Test missing values are filled with dataset-wide medians regardless of chunksize."""
+        try:
+            df = pd.read_csv(self.test_csv, dtype=str)
+            df.loc[df['Name'] == 'Bob Jones', 'Billing Amount'] = None
+            missing_csv = 'missing_test.csv'
+            df.to_csv(missing_csv, index=False)
+            filled = []
+            for chunksize in (1, 4):
+                HealthcareETL(missing_csv, db_name=self.test_db, chunksize=chunksize, global_imputation=True).run()
+                with sqlite3.connect(self.test_db) as conn:
+                    filled.append(conn.execute("SELECT billing_amount FROM healthcare WHERE name = 'Bob Jones'").fetchone()[0])
+            self.assertEqual(filled, [25000.50, 25000.50], "Imputed billing amount depends on chunksize")
+            logging.info("Global imputation test passed.")
+        except Exception as e:
+            logging.error(f"Global imputation test failed: {e}")
+            raise
+
+    def test_encoded_storage_keeps_queries_working(self):
+        """Test dictionary-encoded storage with the healthcare compatibility view."""
+        try:
+            self.etl = HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=2, storage='encoded')
+            self.etl.run()
+            setup_doctors_table(db_name=self.test_db)
+            df = query_inner_join(db_name=self.test_db, as_dataframe=True)
+            self.assertEqual(len(df), 4, "Expected 4 rows in INNER JOIN results over encoded storage")
+            self.assertIn('Cardiology', df['specialty'].values, "Expected specialty not found")
+            with sqlite3.connect(self.test_db) as conn:
+                doctors = conn.execute("SELECT COUNT(*) FROM dim_doctor").fetchone()[0]
+                genders = conn.execute("SELECT COUNT(*) FROM dim_gender").fetchone()[0]
+                fact_columns = [row[1] for row in conn.execute("PRAGMA table_info(healthcare_fact)")]
+            self.assertEqual(doctors, 4, "Expected one dim_doctor row per distinct doctor")
+            self.assertEqual(genders, 2, "Expected one dim_gender row per distinct gender")
+            self.assertIn('doctor_id', fact_columns, "Fact table should store doctor keys")
+            self.assertNotIn('doctor', fact_columns, "Fact table should not store doctor text")
+
+            # The doctor queries run unchanged through the view; results must match the plain table
+            plain_db = 'plain_test.db'
+            if os.path.exists(plain_db):
+                os.remove(plain_db)
+            HealthcareETL(self.test_csv, db_name=plain_db, chunksize=2).run()
+            setup_doctors_table(db_name=plain_db)
+            try:
+                for query in (query_inner_join, query_left_join, query_right_join, query_exists, query_full_join):
+                    plain, encoded = (query(db_name=db, as_dataframe=True) for db in (plain_db, self.test_db))
+                    pd.testing.assert_frame_equal(
+                        encoded.sort_values(list(encoded.columns)).reset_index(drop=True),
+                        plain.sort_values(list(plain.columns)).reset_index(drop=True),
+                        obj=query.__name__)
+            finally:
+                os.remove(plain_db)
+            query, params = keyed_aggregate_sql(['doctor', 'medical_condition'], {'patient_count': 'COUNT(*)'},
+                                                {'gender': 'Male'})
+            with sqlite3.connect(self.test_db) as conn:
+                keyed = pd.read_sql_query(query, conn, params=params)
+                expected = pd.read_sql_query("SELECT doctor, medical_condition, COUNT(*) AS patient_count FROM healthcare "
+                                             "WHERE gender = 'Male' GROUP BY doctor, medical_condition", conn)
+            conn.close()
+            self.assertGreater(len(expected), 0)
+            pd.testing.assert_frame_equal(keyed.sort_values('doctor').reset_index(drop=True),
+                                          expected.sort_values('doctor').reset_index(drop=True))
+
+            # A failed chunk rolls back its new dimension rows; the encoder must not keep their ids
+            chunk = self.etl.transform(self.etl.date_parser.parse_chunk(pd.read_csv(self.test_csv, nrows=1)))
+            chunk['doctor'] = 'Dr. New'
+            with self.assertRaises(sqlite3.Error):
+                self.etl.load(chunk.assign(unknown_column=1))
+            self.etl.load(chunk)
+            with sqlite3.connect(self.test_db) as conn:
+                orphans = conn.execute("SELECT COUNT(*) FROM healthcare_fact f LEFT JOIN dim_doctor d "
+                                       "ON f.doctor_id = d.id WHERE d.id IS NULL").fetchone()[0]
+                doctor = conn.execute("SELECT doctor FROM healthcare WHERE record_id = ?",
+                                      (chunk['record_id'].iloc[0],)).fetchone()[0]
+            conn.close()
+            self.assertEqual(orphans, 0, "Fact rows should not point at rolled back dimension rows")
+            self.assertEqual(doctor, 'Dr. New')
+            logging.info("Encoded storage test passed.")
+        except Exception as e:
+            logging.error(f"Encoded storage test failed: {e}")
+            raise
+
+    def test_columnar_snapshot_matches_table(self):
+        """Test the memory-mapped columnar snapshot reproduces the healthcare table."""
+        try:
+            self.etl.run()
+            manifest = export_snapshot(db_name=self.test_db, snapshot_dir='test_snapshot')
+            self.assertEqual(manifest['rows'], 4, "Snapshot should hold every row")
+            snapshot = load_snapshot('test_snapshot')
+            with sqlite3.connect(self.test_db) as conn:
+                expected = pd.read_sql_query("SELECT * FROM healthcare", conn, parse_dates=['date_of_admission'])
+            self.assertAlmostEqual(float(snapshot['billing_amount'].sum()), expected['billing_amount'].sum(), places=2)
+            self.assertEqual(list(snapshot.column('doctor')), expected['doctor'].tolist(), "Decoded text column differs")
+            self.assertEqual(list(snapshot.column('age')), expected['age'].tolist(), "Integer column differs")
+            self.assertTrue((snapshot['date_of_admission'] == expected['date_of_admission'].to_numpy('datetime64[s]')).all(),
+                            "Date column differs")
+            self.assertEqual(refresh_snapshot(db_name=self.test_db, snapshot_dir='test_snapshot')['version'],
+                             manifest['version'], "Unchanged database should not be re-exported")
+
+            # The encoded, day-number view has untyped datetime(...) columns; a stray text age becomes null
+            os.remove(self.test_db)
+            HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=2, storage='encoded', date_storage='days').run()
+            with sqlite3.connect(self.test_db) as conn:
+                conn.execute("UPDATE healthcare_fact SET age = 'unknown' WHERE name = 'John Doe'")
+                expected = pd.read_sql_query("SELECT * FROM healthcare", conn, parse_dates=['date_of_admission'])
+            conn.close()
+            manifest = export_snapshot(db_name=self.test_db, snapshot_dir='test_snapshot')
+            kinds = {entry['name']: entry['kind'] for entry in manifest['columns']}
+            self.assertEqual((kinds['date_of_admission'], kinds['discharge_date'], kinds['doctor']), ('date', 'date', 'text'))
+            snapshot = load_snapshot('test_snapshot')
+            self.assertTrue((snapshot['date_of_admission'] == expected['date_of_admission'].to_numpy('datetime64[s]')).all(),
+                            "Date column of the view differs")
+            self.assertEqual(list(snapshot.column('doctor')), expected['doctor'].tolist(), "Decoded text column differs")
+            self.assertEqual(int(snapshot.column('age').isna().sum()), 1, "Non-numeric age should be exported as null")
+            logging.info("Columnar snapshot test passed.")
+        except Exception as e:
+            logging.error(f"Columnar snapshot test failed: {e}")
+            raise
+
+    def test_columnar_snapshot_survives_reexport(self):
+        """Test an open snapshot stays readable across re-exports and failed exports leave no version behind."""
+        try:
+            self.etl.run()
+            first = export_snapshot(db_name=self.test_db, snapshot_dir='test_snapshot')
+            snapshot = load_snapshot('test_snapshot')
+            second = export_snapshot(db_name=self.test_db, snapshot_dir='test_snapshot')
+            self.assertEqual(set(os.listdir('test_snapshot')) - {'manifest.json'}, {first['version'], second['version']},
+                             "The replaced version should be kept until the next export")
+            third = export_snapshot(db_name=self.test_db, snapshot_dir='test_snapshot')
+            self.assertFalse(os.path.exists(os.path.join('test_snapshot', first['version'])))
+            self.assertEqual(len(snapshot.to_frame()), 4, "Columns of an open snapshot should stay readable")
+
+            with self.assertRaises(ValueError):
+                export_snapshot(db_name=self.test_db, snapshot_dir='test_snapshot', table='no_such_table')
+            self.assertEqual(set(os.listdir('test_snapshot')) - {'manifest.json'}, {second['version'], third['version']},
+                             "A failed export should remove its partial version")
+            self.assertEqual(load_snapshot('test_snapshot').manifest['version'], third['version'])
+            logging.info("Columnar snapshot re-export test passed.")
+        except Exception as e:
+            logging.error(f"Columnar snapshot re-export test failed: {e}")
+            raise
+
+    def test_extract_backends_yield_same_chunks(self):
+        """Test every available extract backend yields the pandas chunk schema and values."""
+        try:
+            for etl in (self.etl, CleaningETL(self.test_csv, db_name=self.test_db, chunksize=3)):
+                options = etl.csv_options()
+                expected = list(read_csv_chunks(self.test_csv, 3, options, 'pandas'))
+                for backend in available_backends():
+                    chunks = list(read_csv_chunks(self.test_csv, 3, options, backend))
+                    self.assertEqual(len(chunks), len(expected), f"{backend} yielded a different number of chunks")
+                    for chunk, expected_chunk in zip(chunks, expected):
+                        pd.testing.assert_frame_equal(chunk, expected_chunk)
+            self.assertIn(select_backend(self.test_csv, self.etl.csv_options()), available_backends())
+
+            # Short rows are padded with NaN and long rows skipped, whichever backend reads them
+            with open(self.test_csv) as f:
+                lines = [line.rstrip('\n') for line in f]
+            with open('invalid_test.csv', 'w') as f:
+                f.write('\n'.join([lines[0], lines[1], lines[2].rsplit(',', 2)[0], lines[3] + ',extra', lines[4]]) + '\n')
+            options = self.etl.csv_options()
+            expected = pd.concat(read_csv_chunks('invalid_test.csv', 10, options, 'pandas'))
+            self.assertEqual(len(expected), 3, "pandas should keep the short row and skip the long one")
+            self.assertTrue(expected.iloc[1, -2:].isna().all(), "Missing fields should be NaN")
+            for backend in available_backends():
+                pd.testing.assert_frame_equal(pd.concat(read_csv_chunks('invalid_test.csv', 10, options, backend)), expected)
+            HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=2, extract_backend='csv').run()
+            with sqlite3.connect(self.test_db) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+            self.assertEqual(count, 4, "csv backend run should load every row")
+            logging.info("Extract backends test passed.")
+        except Exception as e:
+            logging.error(f"Extract backends test failed: {e}")
+            raise
+
+    def test_day_number_date_storage(self):
+        """Test dates stored as day numbers keep the text view and allow integer date arithmetic."""
+        try:
+            parser = DateParser(columns=['d'], dayfirst=True)
+            parsed = parser.parse(pd.Series(['15-05-2023', '15-05-2023', None, 'not a date']))
+            self.assertEqual(parsed.iloc[0], pd.Timestamp('2023-05-15'), "Date parsed with wrong field order")
+            self.assertTrue(parsed.iloc[2:].isna().all(), "Missing and invalid dates should be NaT")
+            self.assertEqual(len(parser.cache), 2, "Each distinct date string should be parsed once")
+
+            self.etl = HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=2, date_storage='days')
+            self.etl.run()
+            first_day, last_day = year_day_range(2023)
+            with sqlite3.connect(self.test_db) as conn:
+                admitted = conn.execute("SELECT date_of_admission FROM healthcare WHERE name = 'John Doe'").fetchone()[0]
+                stay = conn.execute(f"SELECT {LENGTH_OF_STAY_SQL} FROM healthcare_fact WHERE name = 'John Doe'").fetchone()[0]
+                in_2023 = conn.execute("SELECT COUNT(*) FROM healthcare_fact WHERE date_of_admission BETWEEN ? AND ?",
+                                       (first_day, last_day)).fetchone()[0]
+            self.assertEqual(admitted, '2023-05-15 00:00:00', "View should expose dates as text")
+            self.assertEqual(stay, 5, "Length of stay should be a day-number difference")
+            self.assertEqual(in_2023, 4, "Year filter on day numbers should match every row")
+
+            # The fact table of a days-only database keeps text dimension columns
+            subprocess.run([sys.executable, 'etl_indexes.py', '--db', self.test_db, '--build'],
+                           check=True, capture_output=True)
+            with sqlite3.connect(self.test_db) as conn:
+                indexed = [row[2] for row in conn.execute("PRAGMA index_info(idx_healthcare_doctor)")]
+            conn.close()
+            self.assertEqual(indexed, ['doctor'], "Days-only databases should be indexed on their text columns")
+            logging.info("Day-number date storage test passed.")
+        except Exception as e:
+            logging.error(f"Day-number date storage test failed: {e}")
+            raise
+
+    def test_run_metrics_report(self):
+        """Test the per-stage JSON run report and the etl_runs table."""
+        try:
+            self.etl = HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=2,
+                                     metrics_report='etl_run_report.json', metrics_table=True)
+            self.etl.run()
+            with open('etl_run_report.json') as f:
+                report = json.load(f)
+            self.assertEqual(report['status'], 'succeeded')
+            self.assertEqual((report['rows_in'], report['rows_out']), (4, 4), "Report should count rows in and out")
+            self.assertEqual(report['bytes_read'], os.path.getsize(self.test_csv), "Report should count bytes read")
+            for stage in ('extract', 'transform.handle_missing_values', 'transform.add_record_id', 'load'):
+                self.assertIn(stage, report['stages'], f"Missing stage {stage} in run report")
+            self.assertEqual(report['stages']['load']['calls'], 2, "Expected one load per chunk")
+            with sqlite3.connect(self.test_db) as conn:
+                runs = conn.execute("SELECT status, rows_out FROM etl_runs").fetchall()
+            self.assertEqual(runs, [('succeeded', 4)], "Expected one etl_runs row for the run")
+            logging.info("Run metrics report test passed.")
+        except Exception as e:
+            logging.error(f"Run metrics report test failed: {e}")
+            raise
+
+    def test_memory_budget_adapts_chunksize(self):
+        """Test chunks are resized from measured per-row memory to fit the memory budget."""
+        try:
+            sizer = AdaptiveChunkSizer('1MB', initial_rows=1000)
+            sizer.observe(1000, peak_bytes=1000 * 1000)
+            self.assertEqual(sizer.next_rows(), int(2**20 * 0.8 / 1000), "Chunk should shrink to fit the budget")
+            sizer.observe(sizer.next_rows(), peak_bytes=sizer.next_rows() * 100)
+            self.assertEqual(sizer.next_rows(), int(2**20 * 0.8 / 550), "Cheaper rows should grow the chunk gradually")
+
+            self.etl = HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=1, memory_budget='1MB',
+                                     metrics_report='etl_run_report.json')
+            self.etl.run()
+            with open('etl_run_report.json') as f:
+                report = json.load(f)
+            self.assertEqual(report['memory_budget'], 2**20)
+            self.assertEqual(report['chunk_sizes'], [1, 3], "Expected the first chunk at chunksize, then a resized one")
+            self.assertEqual(report['rows_out'], 4, "Every row should be loaded")
+            logging.info("Memory budget test passed.")
+        except Exception as e:
+            logging.error(f"Memory budget test failed: {e}")
+            raise
+
+    def test_compact_dtypes_load_same_rows(self):
+        """Test compact dtypes shrink transformed chunks and load the same rows as the default dtypes."""
+        try:
+            with sqlite3.connect(self.test_db) as conn:
+                self.etl.run()
+                expected = pd.read_sql_query("SELECT * FROM healthcare ORDER BY record_id", conn)
+                conn.execute("DROP TABLE healthcare")
+
+            for etl_class in (HealthcareETL, CleaningETL):
+                compact_etl = etl_class(self.test_csv, db_name=self.test_db, chunksize=4, compact_dtypes=True)
+                compact_etl.extract()
+                chunk = compact_etl.transform(next(compact_etl.chunk_iter))
+                self.assertIsInstance(chunk['hospital'].dtype, pd.CategoricalDtype, "Expected categorical hospital")
+                self.assertEqual(chunk['age'].dtype, 'uint8', "Expected age downcast to uint8")
+                self.assertEqual(chunk['room_number'].dtype, 'int16', "Expected room_number downcast to int16")
+            compact_etl.close_connection()
+
+            HealthcareETL(self.test_csv, db_name=self.test_db, chunksize=2, compact_dtypes=True).run()
+            with sqlite3.connect(self.test_db) as conn:
+                actual = pd.read_sql_query("SELECT * FROM healthcare ORDER BY record_id", conn)
+            pd.testing.assert_frame_equal(actual, expected)
+            logging.info("Compact dtypes test passed.")
+        except Exception as e:
+            logging.error(f"Compact dtypes test failed: {e}")
+            raise
+
+    def test_multi_source_ingest_merges_staging_databases(self):
+        """Test a directory of CSVs is ingested through staging databases into one table."""
+        try:
+            os.makedirs('test_sources')
+            source = pd.read_csv(self.test_csv)
+            source.iloc[:3].to_csv(os.path.join('test_sources', 'day1.csv'), index=False)
+            # The second file repeats Bob Jones with a corrected bill, which should win
+            second = source.iloc[2:].copy()
+            second.loc[2, 'Billing Amount'] = 16000.0
+            second.to_csv(os.path.join('test_sources', 'day2.csv'), index=False)
+
+            etl = MultiSourceETL('test_sources', db_name=self.test_db, workers=2, chunksize=2, metrics_table=True)
+            self.assertEqual(etl.run(), 5, "Expected 3 + 2 rows written by the merge")
+            with sqlite3.connect(self.test_db) as conn:
+                df = pd.read_sql_query("SELECT * FROM healthcare ORDER BY name", conn)
+                runs = conn.execute("SELECT COUNT(*) FROM etl_runs").fetchone()[0]
+            self.assertEqual(len(df), 4, "Expected each record once after the merge")
+            self.assertEqual(df.loc[df['name'] == 'Bob Jones', 'billing_amount'].iloc[0], 16000.0,
+                             "The later file's row should win")
+            self.assertEqual(runs, 2, "Expected the per-file runs merged into etl_runs")
+            self.assertEqual(sorted(os.listdir('test_sources')), ['day1.csv', 'day2.csv'],
+                             "Staging databases should be removed")
+            logging.info("Multi-source ingest test passed.")
+        except Exception as e:
+            logging.error(f"Multi-source ingest test failed: {e}")
+            raise
+
+    def test_compressed_sources_stream(self):
+        """Test gzip and xz sources (with or without an extension) load like the plain CSV."""
+        try:
+            with open(self.test_csv, 'rb') as f:
+                data = f.read()
+            with open('compressed_test.csv.gz', 'wb') as f:
+                f.write(gzip.compress(data))
+            with open('compressed_test_xz', 'wb') as f:
+                f.write(lzma.compress(data))
+            for source in ('compressed_test.csv.gz', 'compressed_test_xz'):
+                if os.path.exists(self.test_db):
+                    os.remove(self.test_db)
+                self.etl = HealthcareETL(source, db_name=self.test_db, chunksize=2, resume=True,
+                                         metrics_report='etl_run_report.json')
+                self.etl.run()
+                with open('etl_run_report.json') as f:
+                    report = json.load(f)
+                with sqlite3.connect(self.test_db) as conn:
+                    count = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+                self.assertEqual(count, 4, f"Expected 4 rows loaded from {source}")
+                self.assertEqual(report['uncompressed_bytes_read'], len(data), "Report should count decompressed bytes")
+                self.assertEqual(report['bytes_read'], os.path.getsize(source), "Report should count compressed bytes")
+
+            # Resuming decompresses up to the checkpoint and finds nothing new
+            self.etl = HealthcareETL('compressed_test_xz', db_name=self.test_db, chunksize=2, resume=True,
+                                     metrics_report='etl_run_report.json')
+            self.etl.run()
+            with open('etl_run_report.json') as f:
+                report = json.load(f)
+            self.assertEqual(report['rows_in'], 0, "Expected no rows read when resuming a finished source")
+            logging.info("Compressed sources test passed.")
+        except Exception as e:
+            logging.error(f"Compressed sources test failed: {e}")
+            raise
+
+    def test_validation_rules_reject_invalid_rows(self):
+        """Test invalid rows are fixed by default and moved to healthcare_rejects with their bitmask."""
+        try:
+            df = pd.read_csv(self.test_csv)
+            df.loc[2, 'Age'] = -60
+            df.loc[3, 'Discharge Date'] = '19-08-2023'
+            df.to_csv('invalid_test.csv', index=False)
+
+            self.etl = HealthcareETL('invalid_test.csv', db_name=self.test_db, chunksize=2)
+            self.etl.run()
+            with sqlite3.connect(self.test_db) as conn:
+                age = conn.execute("SELECT age FROM healthcare WHERE name = 'Bob Jones'").fetchone()[0]
+            self.assertEqual(age, 0, "Negative age should be clipped by default")
+
+            os.remove(self.test_db)
+            self.etl = HealthcareETL('invalid_test.csv', db_name=self.test_db, chunksize=2, on_invalid='reject')
+            self.etl.run()
+            with sqlite3.connect(self.test_db) as conn:
+                loaded = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+                rejects = conn.execute("SELECT name, age, violations, violated_rules FROM healthcare_rejects "
+                                       "ORDER BY name").fetchall()
+            self.assertEqual(loaded, 2, "Expected only the valid rows loaded")
+            self.assertEqual(rejects, [('Alice Brown', 25, 4, 'discharge_before_admission'),
+                                       ('Bob Jones', -60, 1, 'negative_age')],
+                             "Expected rejected rows with their original values and violation bits")
+            logging.info("Validation rules test passed.")
+        except Exception as e:
+            logging.error(f"Validation rules test failed: {e}")
+            raise
+
+    def test_synthetic_data_generator(self):
+        """Test generated CSVs are reproducible from the seed and load through the ETL."""
+        try:
+            options = {'seed': 7, 'block_rows': 500, 'duplicate_rate': 0.05, 'null_rate': 0.01,
+                       'bad_date_rate': 0.01, 'negative_billing_rate': 0.02}
+            generate_csv('synthetic_test.csv', 2000, **options)
+            generate_csv('synthetic_test_2.csv', 2000, **options)
+            with open('synthetic_test.csv', 'rb') as f, open('synthetic_test_2.csv', 'rb') as g:
+                self.assertEqual(f.read(), g.read(), "Same seed should give the same bytes")
+
+            df = pd.read_csv('synthetic_test.csv')
+            self.assertEqual(list(df.columns), list(pd.read_csv(self.test_csv, nrows=0).columns),
+                             "Generated CSV should have the dataset's columns")
+            self.assertEqual(len(df), 2000)
+            self.assertGreater(df.duplicated().sum(), 0, "Expected duplicate rows")
+            self.assertGreater((df['Billing Amount'] < 0).sum(), 0, "Expected negative billing amounts")
+
+            self.etl = HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=500)
+            self.etl.run()
+            with sqlite3.connect(self.test_db) as conn:
+                loaded = conn.execute("SELECT COUNT(*), MIN(billing_amount) FROM healthcare").fetchone()
+            self.assertLess(loaded[0], 2000, "Duplicates should be removed by the ETL")
+            self.assertGreaterEqual(loaded[1], 0, "Negative billing amounts should be fixed by the ETL")
+            logging.info("Synthetic data generator test passed.")
+        except Exception as e:
+            logging.error(f"Synthetic data generator test failed: {e}")
+            raise
+
+    def test_etl_benchmark_flags_regressions(self):
+        """Test the ETL benchmark measures a run and flags regressions against a baseline."""
+        try:
+            results = run_suite(etls=['chunked'], sizes=[200], chunksizes=[100], data_dir='test_benchmark_data',
+                                db_name='test_benchmark_etl.db')
+            result = results['results'][0]
+            self.assertEqual((result['etl'], result['rows'], result['chunksize']), ('chunked', 200, 100))
+            self.assertGreater(result['rows_per_second'], 0)
+            self.assertGreater(result['db_bytes'], 0)
+            self.assertFalse(os.path.exists('test_benchmark_etl.db'), "Benchmark database should be removed")
+
+            self.assertEqual(compare_results(results, results), [], "A run should not regress against itself")
+            faster = {'results': [dict(result, rows_per_second=result['rows_per_second'] * 2)]}
+            regressions = compare_results(results, faster, tolerance=0.1)
+            self.assertEqual([r['metric'] for r in regressions], ['rows_per_second'],
+                             "Half the baseline throughput should be flagged")
+            logging.info("ETL benchmark test passed.")
+        except Exception as e:
+            logging.error(f"ETL benchmark test failed: {e}")
+            raise
+
+    def test_query_benchmark_captures_plans(self):
+        """Test the query benchmark times query functions and stores their query plans."""
+        try:
+            results = benchmark_queries.run_suite(queries=['group_by', 'stored_procedure'], sizes=[300], repeat=2,
+                                                  timeout=120, data_dir='test_benchmark_data')
+            by_query = {result['query']: result for result in results['results']}
+            for name, result in by_query.items():
+                self.assertEqual(result['status'], 'ok', f"{name} benchmark failed: {result.get('error')}")
+                self.assertEqual(result['runs'], 2)
+                self.assertLessEqual(result['median_seconds'], result['p95_seconds'])
+            group_by = by_query['group_by']['statements']
+            self.assertEqual(len(group_by), 1, "Expected the GROUP BY statement to be captured")
+            self.assertIn('SCAN healthcare', group_by[0]['full_scans'])
+            self.assertIn('USE TEMP B-TREE FOR GROUP BY', group_by[0]['temp_btrees'])
+            self.assertIn("'Diabetes'", by_query['stored_procedure']['statements'][0]['sql'],
+                          "Expected the parameterized statement with its bound value")
+
+            db_name = benchmark_queries.build_database(300, data_dir='test_benchmark_data')
+            stopped = benchmark_queries.benchmark_query('self_join', db_name, repeat=1, timeout=0.01)
+            self.assertEqual(stopped['status'], 'timeout', "A query over its time budget should be stopped")
+            logging.info("Query benchmark test passed.")
+        except Exception as e:
+            logging.error(f"Query benchmark test failed: {e}")
+            raise
+
+    def test_query_sink_streams_results(self):
+        """Test query results stream to CSV with a console preview, matching the opt-in DataFrame."""
+        try:
+            generate_csv('synthetic_test.csv', 500, seed=9)
+            HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=200).run()
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                rows = query_case(db_name=self.test_db)
+            with sqlite3.connect(self.test_db) as conn:
+                self.assertEqual(rows, conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0])
+            self.assertLess(len(output.getvalue().splitlines()), PREVIEW_ROWS + 10, "Console output should be a preview")
+            self.assertIn(f"{rows - PREVIEW_ROWS} more rows", output.getvalue())
+            streamed = pd.read_csv('case_results.csv')
+            pd.testing.assert_frame_equal(streamed, query_case(db_name=self.test_db, as_dataframe=True))
+
+            with sqlite3.connect(self.test_db) as conn:
+                sink = CsvSink('case_results.csv', preview_rows=5, batch_size=7)
+                self.assertEqual(sink.write(conn.execute("SELECT name, billing_amount FROM healthcare")), rows)
+            self.assertEqual(len(sink.preview), 5, "Only the preview rows should be kept in memory")
+            self.assertEqual(sink.columns, ['name', 'billing_amount'])
+            logging.info("Query sink test passed.")
+        except Exception as e:
+            logging.error(f"Query sink test failed: {e}")
+            raise
+
+    def test_query_cache_invalidated_by_data_version(self):
+        """Test repeat queries are served from the cache until an ETL load bumps the data version."""
+        cache_dir = 'test_query_cache'
+        try:
+            generate_csv('synthetic_test.csv', 500, seed=3)
+            HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=200).run()
+            with QueryCache(self.test_db, cache_dir=cache_dir) as cache, \
+                    contextlib.redirect_stdout(io.StringIO()):
+                first = query_group_by(db_name=cache)
+                with open('group_by_results.csv') as f:
+                    first_csv = f.read()
+                self.assertEqual(query_group_by(db_name=cache), first)
+                with open('group_by_results.csv') as f:
+                    self.assertEqual(f.read(), first_csv, "A cached result should write the same CSV")
+                self.assertEqual((cache.hits, cache.misses), (1, 1))
+                query = "SELECT name, age, billing_amount FROM healthcare WHERE billing_amount > ? ORDER BY record_id"
+                with sqlite3.connect(self.test_db) as conn:
+                    expected = pd.read_sql_query(query, conn, params=(1000.0,))
+                conn.close()
+                pd.testing.assert_frame_equal(cache.read_sql(query, (1000.0,)), expected)
+                pd.testing.assert_frame_equal(cache.read_sql(f"  {query}\n;", (1000.0,)), expected)
+                self.assertEqual(cache.hits, 2, "Whitespace and a trailing semicolon should not change the key")
+
+                generate_csv('synthetic_test_2.csv', 300, seed=4)
+                HealthcareETL('synthetic_test_2.csv', db_name=self.test_db, chunksize=200).run()
+                misses = cache.misses
+                reloaded = query_group_by(db_name=cache, as_dataframe=True)
+                self.assertEqual(cache.misses, misses + 1, "A load should invalidate cached results")
+                with sqlite3.connect(self.test_db) as conn:
+                    pd.testing.assert_frame_equal(reloaded, pd.read_sql_query(
+                        "SELECT medical_condition, ROUND(AVG(billing_amount), 2) AS average_billing FROM healthcare "
+                        "GROUP BY medical_condition ORDER BY average_billing DESC", conn))
+                conn.close()
+
+            with QueryCache(self.test_db, cache_dir=cache_dir) as cache, \
+                    contextlib.redirect_stdout(io.StringIO()):
+                pd.testing.assert_frame_equal(query_group_by(db_name=cache, as_dataframe=True), reloaded)
+                self.assertEqual(cache.disk_hits, 1, "A new process should reuse the on-disk results")
+            self.assertEqual(len(os.listdir(cache_dir)), 1, "Results of older data versions should be pruned")
+            logging.info("Query cache test passed.")
+        except Exception as e:
+            logging.error(f"Query cache test failed: {e}")
+            raise
+
+    def test_query_cache_sees_doctor_changes(self):
+        """Test cached join results expire when the doctors table changes, with or without a version bump."""
+        cache_dir = 'test_query_cache'
+        try:
+            self.etl.run()
+            with contextlib.redirect_stdout(io.StringIO()):
+                setup_doctors_table(db_name=self.test_db)
+                with QueryCache(self.test_db, cache_dir=cache_dir) as cache:
+                    first = query_inner_join(db_name=cache, as_dataframe=True)
+                    self.assertIn('Cardiology', first['specialty'].values)
+                    with sqlite3.connect(self.test_db) as conn:
+                        conn.execute("UPDATE doctors SET specialty = 'Surgery' WHERE specialty = 'Cardiology'")
+                    conn.close()
+                    updated = query_inner_join(db_name=cache, as_dataframe=True)
+                    self.assertIn('Surgery', updated['specialty'].values, "A commit should expire cached results")
+                    self.assertEqual(cache.hits, 0)
+
+                # setup_doctors_table bumps the data version, so a new process skips the disk tier entry
+                with sqlite3.connect(self.test_db) as conn:
+                    conn.execute("DELETE FROM doctors WHERE specialty = 'Surgery'")
+                conn.close()
+                setup_doctors_table(db_name=self.test_db)
+                with QueryCache(self.test_db, cache_dir=cache_dir) as cache:
+                    pd.testing.assert_frame_equal(query_inner_join(db_name=cache, as_dataframe=True), first)
+                    self.assertEqual(cache.disk_hits, 0, "Results from before the rewrite should not be reused")
+            logging.info("Query cache doctors test passed.")
+        except Exception as e:
+            logging.error(f"Query cache doctors test failed: {e}")
+            raise
+
+    def test_small_append_keeps_indexes(self):
+        """Test a resumed run appending a few rows keeps the indexes instead of rebuilding them."""
+        try:
+            generate_csv('synthetic_test.csv', 2000, seed=6)
+            etl = HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=500, resume=True, indexes=True)
+            etl.run()
+            self.assertEqual(set(etl.deferred_indexes), {index.name for index in HEALTHCARE_INDEXES},
+                             "A load into an empty table should defer its indexes")
+            generate_csv('synthetic_test_2.csv', 20, seed=7)
+            with open('synthetic_test_2.csv') as f:
+                appended = f.readlines()[1:]
+            with open('synthetic_test.csv', 'a') as f:
+                f.writelines(appended)
+            etl = HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=500, resume=True, indexes=True)
+            etl.run()
+            self.assertEqual(etl.deferred_indexes, [], "A small append should keep the indexes")
+            self.assertEqual(etl.metrics.extra['post_load']['deferred_indexes'], [])
+            with sqlite3.connect(self.test_db) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM healthcare").fetchone()[0]
+                indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            conn.close()
+            self.assertEqual(count, 2000 + len(appended))
+            self.assertTrue({index.name for index in HEALTHCARE_INDEXES} <= indexes)
+            logging.info("Small append index test passed.")
+        except Exception as e:
+            logging.error(f"Small append index test failed: {e}")
+            raise
+
+    def test_post_load_indexes_and_advisor(self):
+        """Test indexes are built and analyzed after the load, and the advisor suggests covering indexes."""
+        try:
+            # Enough rows for the planner statistics to tell the candidates apart
+            generate_csv('synthetic_test.csv', 3000, seed=5)
+            HealthcareETL('synthetic_test.csv', db_name=self.test_db, chunksize=1000).run()
+            query = benchmark_queries.traced_statements('stored_procedure', self.test_db)[0]
+            advisor = IndexAdvisor(self.test_db)
+            advisor.register('stored_procedure', query)
+            suggestions = advisor.advise()
+            self.assertEqual(len(suggestions), 1, "Expected one index suggestion for the stored procedure")
+            self.assertEqual(suggestions[0]['index'].columns, ['medical_condition', 'billing_amount', 'name'])
+            self.assertIn('SCAN healthcare', suggestions[0]['plan_before'])
+            self.assertEqual(suggestions[0]['plan_after'],
+                             [f"SEARCH healthcare USING COVERING INDEX {suggestions[0]['index'].name} (medical_condition=?)"],
+                             "The suggested index should cover the query without a sort")
+
+            for etl_class in (HealthcareETL, CleaningETL):
+                os.remove(self.test_db)
+                etl = etl_class(self.test_csv, db_name=self.test_db, chunksize=2, bulk_load=True,
+                                indexes=True, analyze=True)
+                etl.run()
+                with sqlite3.connect(self.test_db) as conn:
+                    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+                    self.assertTrue({index.name for index in HEALTHCARE_INDEXES} <= indexes)
+                    self.assertTrue(conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0,
+                                    "ANALYZE should store planner statistics")
+                    plan = ' '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}"))
+                    self.assertIn('USING INDEX idx_healthcare_condition_billing', plan)
+                conn.close()
+                self.assertEqual(set(etl.metrics.extra['post_load']['indexes']), {index.name for index in HEALTHCARE_INDEXES})
+            logging.info("Post-load index test passed.")
+        except Exception as e:
+            logging.error(f"Post-load index test failed: {e}")
+            raise
+
+    def test_queries_share_connection_pool(self):
+        """Test query functions run on a shared read-only pool with one connection per thread."""
+        try:
+            self.etl.run()
+            setup_doctors_table(db_name=self.test_db)
+            with ConnectionPool(self.test_db) as pool:
+                self.assertEqual(query_group_by(db_name=pool), 3, "Expected 3 conditions from pooled GROUP BY")
+                self.assertEqual(query_inner_join(db_name=pool), 4, "Expected 4 rows from pooled INNER JOIN")
+                self.assertEqual(len(pool.connections), 1, "Queries on one thread should reuse one connection")
+                thread = threading.Thread(target=lambda: query_group_by(db_name=pool))
+                thread.start()
+                thread.join()
+                self.assertEqual(len(pool.connections), 2, "Each thread should get its own connection")
+                self.assertEqual(pool.connection().execute("PRAGMA query_only").fetchone()[0], 1)
+                with self.assertRaises(sqlite3.Error):
+                    query_select_into(db_name=pool)
+            with sqlite3.connect(self.test_db) as conn:
+                self.assertEqual(query_select_into(db_name=conn), 2, "Writers should accept an open connection")
+                # A borrowed connection's open transaction is left to its owner
+                conn.execute("INSERT INTO healthcare (record_id, name) VALUES ('uncommitted', 'Pending Row')")
+                self.assertEqual(query_group_by(db_name=conn), 4)
+                conn.rollback()
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM healthcare WHERE record_id = 'uncommitted'").fetchone()[0], 0,
+                                 "A query function should not commit the caller's transaction")
+            conn.close()
+            logging.info("Connection pool test passed.")
+        except Exception as e:
+            logging.error(f"Connection pool test failed: {e}")
+            raise
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
\ No newline at end of file